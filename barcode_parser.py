@@ -0,0 +1,241 @@
+"""
+Barcode Parser Module
+Parses scanned barcode payloads into structured records
+
+Format handlers are registered with the prefixes their payloads start
+with, so each scan is dispatched straight to the right precompiled
+parser. Payloads without a known prefix fall through to the generic
+handlers in registration order.
+"""
+
+import re
+
+
+class ScanRecord:
+    """Structured result of parsing one scan"""
+
+    __slots__ = ("format", "serial", "pcb_serial", "revision", "firmware", "fields", "raw")
+
+    def __init__(self, format, serial, raw, pcb_serial=None, revision=None, firmware=None, fields=None):
+        """
+        Args:
+            format: Name of the parser that recognised the scan (None if unrecognised)
+            serial: Board / item serial number
+            raw: Original scanned text
+            pcb_serial: PCB serial number (EBD labels)
+            revision: PCB revision (EBD labels)
+            firmware: Firmware version (EBD labels)
+            fields: Any other fields, e.g. GS1 application identifiers
+        """
+        self.format = format
+        self.serial = serial
+        self.raw = raw
+        self.pcb_serial = pcb_serial
+        self.revision = revision
+        self.firmware = firmware
+        self.fields = fields or {}
+
+    @property
+    def recognised(self):
+        return self.format is not None
+
+    def __repr__(self):
+        return f"ScanRecord({self.format!r}, serial={self.serial!r})"
+
+
+# "EBD S/N: HAA02-2544-336PCB S/No: HB25390000142PCB Rev: HT_EBD_V25EBD FW: 14"
+EBD_PATTERN = re.compile(
+    r'EBD S/N:\s*(?P<serial>[A-Z0-9\-]+?)\s*'
+    r'PCB S/No:\s*(?P<pcb>[A-Z0-9\-]+?)\s*'
+    r'PCB Rev:\s*(?P<rev>\S+?)\s*'
+    r'EBD FW:\s*(?P<fw>\S+)\s*$'
+)
+
+# Pattern: "S/N: " followed by alphanumeric with hyphens, up to "PCB"
+EBD_SERIAL_PATTERN = re.compile(r'S/N:\s*([A-Z0-9\-]+)(?=PCB)')
+
+# Scanned text that is just a serial number
+PLAIN_SERIAL_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9\-_./]{3,39}')
+
+
+def parse_ebd(raw):
+    """EBD board label; falls back to the S/N alone if the rest is damaged"""
+    match = EBD_PATTERN.match(raw)
+    if match:
+        return ScanRecord(
+            "ebd", match.group("serial"), raw,
+            pcb_serial=match.group("pcb"),
+            revision=match.group("rev"),
+            firmware=match.group("fw")
+        )
+    return parse_serial_tag(raw)
+
+
+def parse_serial_tag(raw):
+    """Any payload carrying an EBD style 'S/N: ...PCB' tag"""
+    match = EBD_SERIAL_PATTERN.search(raw)
+    if match:
+        return ScanRecord("ebd", match.group(1), raw)
+    return None
+
+
+# GS1 application identifiers: AI -> fixed data length (None = variable,
+# ended by GS or end of data)
+GS1_AI_LENGTHS = {
+    "00": 18, "01": 14, "02": 14,
+    "10": None, "11": 6, "12": 6, "13": 6, "15": 6, "16": 6, "17": 6,
+    "20": 2, "21": None, "22": None, "240": None, "241": None, "250": None,
+    "30": None, "37": None, "400": None, "90": None,
+}
+GS1_SYMBOLOGY_PREFIXES = ("]C1", "]e0", "]d2", "]Q3", "]J1")
+GS = "\x1d"
+GS1_BRACKETED_PATTERN = re.compile(r'\((\d{2,4})\)([^(]*)')
+
+
+def parse_gs1(raw):
+    """GS1 element string, with symbology identifier or (AI) brackets"""
+    if raw.startswith("("):
+        fields = {ai: value for ai, value in GS1_BRACKETED_PATTERN.findall(raw)}
+    else:
+        data = raw[3:] if raw.startswith(GS1_SYMBOLOGY_PREFIXES) else raw
+        fields = _split_gs1(data.lstrip(GS))
+    if not fields:
+        return None
+    serial = fields.get("21") or fields.get("00") or fields.get("01")
+    if not serial:
+        return None
+    return ScanRecord("gs1", serial, raw, fields=fields)
+
+
+def parse_gs1_unprefixed(raw):
+    """GS1 data sent without symbology identifier (needs a GS separator)"""
+    if GS in raw:
+        return parse_gs1(raw)
+    return None
+
+
+def _split_gs1(data):
+    fields = {}
+    pos = 0
+    while pos < len(data):
+        for size in (2, 3, 4):
+            ai = data[pos:pos + size]
+            if ai in GS1_AI_LENGTHS:
+                break
+        else:
+            return None
+        pos += len(ai)
+        length = GS1_AI_LENGTHS[ai]
+        if length is None:
+            end = data.find(GS, pos)
+            end = len(data) if end < 0 else end
+            fields[ai] = data[pos:end]
+            pos = end + 1
+        else:
+            fields[ai] = data[pos:pos + length]
+            pos += length
+            if data[pos:pos + 1] == GS:
+                pos += 1
+    return fields
+
+
+def parse_plain(raw):
+    """Barcode that only holds a serial number"""
+    if PLAIN_SERIAL_PATTERN.fullmatch(raw):
+        return ScanRecord("plain", raw, raw)
+    return None
+
+
+class ParserRegistry:
+    """Prefix-dispatched collection of barcode format handlers"""
+
+    def __init__(self):
+        self._by_first_char = {}
+        self._fallbacks = []
+
+    def register(self, parser, prefixes=()):
+        """
+        Add a format handler
+
+        Args:
+            parser: Callable(raw) returning a ScanRecord or None
+            prefixes: Payload prefixes this handler owns; without prefixes
+                the handler is tried for every scan no prefix matched
+        """
+        if not prefixes:
+            self._fallbacks.append(parser)
+            return
+        for prefix in prefixes:
+            entries = self._by_first_char.setdefault(prefix[0], [])
+            entries.append((prefix, parser))
+            # Longest prefix first so specific formats win
+            entries.sort(key=lambda entry: -len(entry[0]))
+
+    def parse(self, raw):
+        """
+        Parse one scan
+
+        Args:
+            raw: Scanned text (already stripped)
+
+        Returns:
+            ScanRecord: Parsed record; unrecognised scans get format None
+            and the whole scan as serial
+        """
+        if raw:
+            for prefix, parser in self._by_first_char.get(raw[0], ()):
+                if raw.startswith(prefix):
+                    record = parser(raw)
+                    if record is not None:
+                        return record
+                    break
+            for parser in self._fallbacks:
+                record = parser(raw)
+                if record is not None:
+                    return record
+        return ScanRecord(None, raw, raw)
+
+    def extract_many(self, raws):
+        """
+        Parse a batch of scans
+
+        Args:
+            raws: Iterable of scanned strings
+
+        Returns:
+            list: ScanRecord per scan, in order
+        """
+        parse = self.parse
+        return [parse(raw) for raw in raws]
+
+
+def default_registry():
+    """Registry with the EBD, GS1 and plain serial formats"""
+    registry = ParserRegistry()
+    registry.register(parse_ebd, prefixes=("EBD ",))
+    registry.register(parse_gs1, prefixes=GS1_SYMBOLOGY_PREFIXES + ("(",))
+    registry.register(parse_serial_tag)
+    registry.register(parse_gs1_unprefixed)
+    registry.register(parse_plain)
+    return registry
+
+
+PARSERS = default_registry()
+parse_scan = PARSERS.parse
+extract_many = PARSERS.extract_many
+
+
+def extract_serial_number(barcode_string):
+    """
+    Extract S/N from barcode format:
+    "EBD S/N: HAA02-2544-336PCB S/No: HB25390000142PCB Rev: HT_EBD_V25EBD FW: 14"
+    Returns: "HAA02-2544-336"
+
+    Args:
+        barcode_string: Raw scanned text
+
+    Returns:
+        str: Serial number, or None if the format was not recognised
+    """
+    record = PARSERS.parse(barcode_string)
+    return record.serial if record.recognised else None
@@ -0,0 +1,227 @@
+"""
+End-to-end benchmark: scans in, labels out of a pty fake printer
+
+For 1, 20 and 200-item cartons it measures
+  - scan-to-print latency: last scan of a carton until the printer has the
+    whole label (cartons packed one at a time, median and worst)
+  - labels per minute with cartons closed back to back
+  - bytes per label as received by the printer
+  - serial extraction throughput on the carton's scans
+
+Results are compared with benchmarks/baseline.json; a metric more than
+--tolerance (--cpu-tolerance for parsing speed) worse than the baseline is
+reported and the exit code is 1.
+
+Usage:
+    python benchmarks/bench_e2e.py [--baud 115200] [--cartons 5] [--stored-form]
+    python benchmarks/bench_e2e.py --update-baseline
+
+Needs Linux or macOS (pseudo-terminals); no printer hardware.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from barcode_parser import parse_scan
+from carton_allocator import CartonIdAllocator
+from fake_printer import FakePrinter
+from label_form import StoredForm
+from label_template import load_template
+from packing_ledger import PackingLedger
+from packing_station import PackingStation
+from print_spooler import PrintSpooler
+from printer_session import PrinterSession
+from serial_index import PackedSerialIndex
+
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+DENSE_TEMPLATE = os.path.join(BENCH_DIR, "carton_200_dense.tspl")
+CARTON_SIZES = (1, 20, 200)
+
+# Metric name -> True if higher is better. The worst-case latency is
+# reported but not checked: one scheduler hiccup decides it.
+METRICS = {
+    "latency_p50_ms": False,
+    "labels_per_min": True,
+    "bytes_per_label": False,
+    "scans_per_sec": True,
+}
+
+# Metrics set by CPU speed rather than the emulated link; these vary more
+# between runs on a shared machine and get their own tolerance
+CPU_BOUND = {"scans_per_sec"}
+
+
+class ScanSource:
+    """Unique EBD board scans"""
+
+    def __init__(self):
+        self.count = 0
+
+    def take(self, n):
+        scans = []
+        for _ in range(n):
+            self.count += 1
+            scans.append(
+                f"EBD S/N: HAA02-2544-{self.count:06d}PCB S/No: HB2539{self.count:07d}"
+                f"PCB Rev: HT_EBD_V25EBD FW: 14"
+            )
+        return scans
+
+
+def build_station(items, port, baudrate, workdir):
+    """Station wired to a fresh session, spooler and state files"""
+    template = load_template(DENSE_TEMPLATE) if items > 20 else load_template()
+    session = PrinterSession(port=port, baudrate=baudrate)
+    spooler = PrintSpooler(session, max_pending=64)
+    station = PackingStation(
+        spooler,
+        template=template,
+        items_per_carton=items,
+        allocator=CartonIdAllocator(
+            shared_path=os.path.join(workdir, f"ids-{items}.json"),
+            local_path=os.path.join(workdir, f"station-{items}.json")
+        ),
+        serial_index=PackedSerialIndex(os.path.join(workdir, f"serials-{items}")),
+        ledger=PackingLedger(os.path.join(workdir, f"ledger-{items}.db"))
+    )
+    return session, spooler, station
+
+
+def pack(station, scans, form):
+    """Scan one carton and close it; returns the time of the last scan"""
+    for scan in scans[:-1]:
+        station.add_scan(scan)
+    last_scan = time.perf_counter()
+    station.add_scan(scans[-1])
+    station.close_carton(form=form, block=True)
+    return last_scan
+
+
+def run_scenario(items, cartons, baudrate, stored_form, workdir, source):
+    """Measure one carton size; returns a dict of METRICS"""
+    with FakePrinter(baudrate=baudrate) as printer:
+        session, spooler, station = build_station(items, printer.port, baudrate, workdir)
+        form = StoredForm(station.template) if stored_form else None
+        spooler.start()
+        try:
+            # Warm up: connect, and upload the stored form if used
+            pack(station, source.take(items), form)
+            printer.wait_labels(1)
+
+            # Latency: one carton at a time, printer idle when it closes
+            latencies = []
+            for _ in range(cartons):
+                done = len(printer.labels)
+                last_scan = pack(station, source.take(items), form)
+                if not printer.wait_labels(done + 1, timeout=120):
+                    raise RuntimeError(f"{items}-item label never reached the printer")
+                latencies.append(printer.labels[done].finished - last_scan)
+            sizes = [label.size for label in printer.labels[1:]]
+
+            # Throughput: cartons closed back to back
+            done = len(printer.labels)
+            batches = [source.take(items) for _ in range(cartons)]
+            started = time.perf_counter()
+            for scans in batches:
+                pack(station, scans, form)
+            if not printer.wait_labels(done + cartons, timeout=300):
+                raise RuntimeError(f"{items}-item labels never reached the printer")
+            elapsed = printer.labels[-1].finished - started
+        finally:
+            spooler.stop()
+            session.close()
+            station.serial_index.close()
+            station.ledger.close()
+
+    # Serial extraction on the same kind of scans; best of several repeats
+    # so a busy machine does not read as a regression
+    scans = source.take(items)
+    runs = max(1, 50000 // items)
+    parse_seconds = min(timeit.repeat(
+        lambda: [parse_scan(scan) for scan in scans], number=runs, repeat=7
+    ))
+
+    return {
+        "latency_p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "latency_max_ms": round(max(latencies) * 1000, 1),
+        "labels_per_min": round(cartons / elapsed * 60, 1),
+        "bytes_per_label": round(statistics.mean(sizes)),
+        "scans_per_sec": round(runs * items / parse_seconds),
+    }
+
+
+def compare(results, baseline, tolerance, cpu_tolerance):
+    """List metrics more than their tolerance worse than the baseline"""
+    regressions = []
+    for key, metrics in results.items():
+        for name, value in metrics.items():
+            reference = baseline.get(key, {}).get(name)
+            if not reference or name not in METRICS:
+                continue
+            higher_is_better = METRICS[name]
+            change = (value - reference) / reference
+            allowed = cpu_tolerance if name in CPU_BOUND else tolerance
+            if (-change if higher_is_better else change) > allowed:
+                regressions.append(f"{key} {name}: {value} vs baseline {reference} ({change:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end scan-to-print benchmark")
+    parser.add_argument("--baud", type=int, default=115200, help="emulated link speed")
+    parser.add_argument("--cartons", type=int, default=5, help="cartons per measurement")
+    parser.add_argument("--sizes", type=int, nargs="+", default=CARTON_SIZES, help="items per carton")
+    parser.add_argument("--stored-form", action="store_true", help="print through the stored form")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline results file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed fractional change before a metric counts as a regression")
+    parser.add_argument("--cpu-tolerance", type=float, default=0.5,
+                        help="allowed fractional change for CPU-bound metrics (parsing speed)")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    args = parser.parse_args(argv)
+
+    results = {}
+    source = ScanSource()
+    with tempfile.TemporaryDirectory() as workdir:
+        for items in args.sizes:
+            key = f"{items}-items@{args.baud}{'-form' if args.stored_form else ''}"
+            metrics = run_scenario(items, args.cartons, args.baud, args.stored_form, workdir, source)
+            results[key] = metrics
+            print(
+                f"{key:>22}: latency {metrics['latency_p50_ms']:8.1f} ms "
+                f"(max {metrics['latency_max_ms']:.1f}), {metrics['labels_per_min']:7.1f} labels/min, "
+                f"{metrics['bytes_per_label']:6d} B/label, {metrics['scans_per_sec']:,} scans/s"
+            )
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, args.cpu_tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print("No regressions against baseline" if baseline else "No baseline stored yet")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
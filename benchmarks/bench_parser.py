@@ -0,0 +1,44 @@
+"""
+Benchmark barcode payload parsing on a generated scan corpus
+
+Usage: python benchmarks/bench_parser.py [corpus_size]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from barcode_parser import extract_many
+
+
+def make_corpus(size):
+    """Mixed corpus: mostly EBD labels, some GS1 and plain serials"""
+    corpus = []
+    for i in range(size):
+        kind = i % 10
+        if kind < 7:
+            corpus.append(
+                f"EBD S/N: HAA02-2544-{i % 1000:03d}PCB S/No: HB2539{i:07d}PCB Rev: HT_EBD_V25EBD FW: 14"
+            )
+        elif kind < 9:
+            corpus.append(f"]C10109501101530003\x1d21SN{i:08d}\x1d10LOT{i % 97}")
+        else:
+            corpus.append(f"HAA02-2544-{i % 1000:03d}")
+    return corpus
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    corpus = make_corpus(size)
+    started = time.perf_counter()
+    records = extract_many(corpus)
+    seconds = time.perf_counter() - started
+    unrecognised = sum(1 for record in records if not record.recognised)
+    print(f"{size} scans in {seconds:.2f} s: {size / seconds:,.0f} scans/s, "
+          f"{seconds / size * 1e6:.2f} us/scan, {unrecognised} unrecognised")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Benchmark carton label rendering from the compiled template
+
+Usage: python benchmarks/bench_render.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from label_template import load_template
+
+
+def main():
+    template = load_template()
+    for count in (1, 10, template.max_rows):
+        serials = [f"HAA02-2544-{i:03d}" for i in range(count)]
+        runs = 20000
+        seconds = timeit.timeit(
+            lambda: template.render("C2544-001", "2025-10-30 14:05:00", serials),
+            number=runs
+        )
+        size = len(template.render("C2544-001", "2025-10-30 14:05:00", serials))
+        print(f"{count:3d} items: {seconds / runs * 1e6:8.2f} us/label, {size} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Pseudo-terminal stand-in for a TSC printer
+
+Opens a pty whose slave end is used as the printer port. A background
+thread reads TSPL from the master end at the speed of the emulated baud
+rate, answers <ESC>!? and ~!F queries, keeps DOWNLOADed files, and records
+every label (bytes received and completion time) when PRINT or RUN arrives.
+
+Linux/macOS only (needs the pty module).
+
+Example:
+    with FakePrinter(baudrate=9600) as printer:
+        session = PrinterSession(printer.port, baudrate=9600)
+        ...
+        printer.wait_labels(1)
+        print(printer.labels[0].size)
+"""
+
+import os
+import pty
+import re
+import threading
+import time
+import tty
+
+BITS_PER_BYTE = 10  # 8N1: start + 8 data + stop
+
+
+class LabelRecord:
+    """One label as the printer received it"""
+
+    def __init__(self, size, lines, finished):
+        """
+        Args:
+            size: Bytes received for the label (layout, data and any
+                program download that preceded it)
+            lines: TSPL command lines received for the label
+            finished: time.perf_counter() when the PRINT / RUN line arrived
+        """
+        self.size = size
+        self.lines = lines
+        self.finished = finished
+
+
+class FakePrinter:
+    """TSPL printer emulated on a pseudo-terminal"""
+
+    def __init__(self, baudrate=9600, status=0x00, chunk=64):
+        """
+        Args:
+            baudrate: Link speed to emulate (None for unthrottled)
+            status: Status byte returned to <ESC>!?
+            chunk: Bytes read per step of the link emulation
+        """
+        self.baudrate = baudrate
+        self.status = status
+        self.chunk = chunk
+        self.files = set()
+        self.labels = []
+        self.received = 0
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._running = False
+        self._label_cond = threading.Condition()
+
+    @property
+    def port(self):
+        """Device path to open as the printer port"""
+        return os.ttyname(self._slave)
+
+    def start(self):
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        for fd in (self._slave, self._master):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def wait_labels(self, count, timeout=30):
+        """
+        Wait until count labels have been received
+
+        Returns:
+            bool: False on timeout
+        """
+        with self._label_cond:
+            return self._label_cond.wait_for(lambda: len(self.labels) >= count, timeout)
+
+    def _run(self):
+        buffer = b''
+        label_size = 0
+        label_lines = 0
+        downloading = False
+        while self._running:
+            try:
+                data = os.read(self._master, self.chunk)
+            except OSError:
+                return
+            if self.baudrate:
+                time.sleep(len(data) * BITS_PER_BYTE / self.baudrate)
+            self.received += len(data)
+            buffer += data
+
+            while buffer:
+                if buffer.startswith(b'\x1b!?'):
+                    os.write(self._master, bytes([self.status]))
+                    buffer = buffer[3:]
+                    continue
+                if buffer.startswith(b'~!F'):
+                    listing = "".join(f"{name}\r" for name in sorted(self.files))
+                    os.write(self._master, listing.encode("ascii") + b'\x1a')
+                    buffer = buffer[3:]
+                    continue
+                end = buffer.find(b'\r\n')
+                if end < 0:
+                    break
+                line, buffer = buffer[:end], buffer[end + 2:]
+                label_size += end + 2
+                label_lines += 1
+
+                command = line.split(b' ', 1)[0].upper()
+                if downloading:
+                    downloading = command != b'EOP'
+                elif command == b'DOWNLOAD':
+                    match = re.search(rb'"([^"]+)"', line)
+                    if match:
+                        self.files.add(match.group(1).decode("ascii", "replace"))
+                    downloading = True
+                elif command == b'KILL':
+                    match = re.search(rb'"([^"]+)"', line)
+                    if match:
+                        self.files.discard(match.group(1).decode("ascii", "replace"))
+                elif command in (b'PRINT', b'RUN'):
+                    with self._label_cond:
+                        self.labels.append(LabelRecord(label_size, label_lines, time.perf_counter()))
+                        self._label_cond.notify_all()
+                    label_size = 0
+                    label_lines = 0
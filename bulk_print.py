@@ -0,0 +1,305 @@
+"""
+Bulk Carton Reprint
+Streams carton records from a CSV/JSONL export or the packing ledger and
+prints their labels, rendering the next label while the current one is
+being sent. Progress is checkpointed so an interrupted run resumes after
+the last carton the printer accepted.
+
+Input formats:
+    JSONL  {"carton_id": ..., "date_packed": ..., "serials": [...]} per line
+    CSV    header with carton_id, date_packed and either serial (one row per
+           serial, rows of a carton together) or serials (';' separated)
+    .db    packing ledger, optionally limited with --since / --until
+
+Example:
+    python packing_ledger.py export audit.jsonl 2025-10-01 2025-10-31
+    python bulk_print.py audit.jsonl --port COM7
+    python bulk_print.py audit.jsonl --port COM7 --resume   # after a jam
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import threading
+from carton_allocator import read_json, write_json_atomic
+from label_form import StoredForm
+from label_template import DEFAULT_TEMPLATE, load_template
+from packing_ledger import PackingLedger
+from printer_pool import PrinterPool, parse_printers
+from printer_transport import TRANSPORTS, make_address
+from print_spooler import PrintJob
+
+# Labels rendered ahead of the printer; bounds memory for any input size
+PIPELINE_DEPTH = 4
+
+
+class CartonRecord:
+    """One carton to print"""
+
+    __slots__ = ("carton_id", "date_packed", "serials")
+
+    def __init__(self, carton_id, date_packed, serials):
+        self.carton_id = carton_id
+        self.date_packed = date_packed
+        self.serials = serials
+
+
+def read_jsonl(path):
+    """Yield CartonRecords from a JSON-lines file"""
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                yield CartonRecord(item["carton_id"], item["date_packed"], list(item["serials"]))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{lineno}: bad carton record: {e}")
+
+
+def read_csv(path):
+    """Yield CartonRecords from a CSV file (see module docstring)"""
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        fields = set(reader.fieldnames or ())
+        if not {"carton_id", "date_packed"} <= fields or not fields & {"serial", "serials"}:
+            raise ValueError(f"{path}: CSV needs carton_id, date_packed and serial or serials columns")
+        if "serials" in fields:
+            for row in reader:
+                serials = [s.strip() for s in row["serials"].split(";") if s.strip()]
+                yield CartonRecord(row["carton_id"], row["date_packed"], serials)
+        else:
+            for (carton_id, date_packed), rows in itertools.groupby(
+                reader, key=lambda row: (row["carton_id"], row["date_packed"])
+            ):
+                yield CartonRecord(carton_id, date_packed, [row["serial"] for row in rows])
+
+
+def read_ledger(path, since=None, until=None):
+    """Yield CartonRecords from the packing ledger"""
+    ledger = PackingLedger(path)
+    try:
+        for carton_id, date_packed, serials in ledger.iter_cartons(since, until):
+            yield CartonRecord(carton_id, date_packed, serials)
+    finally:
+        ledger.close()
+
+
+def read_cartons(path, since=None, until=None):
+    """Pick the reader for path by its extension"""
+    lower = path.lower()
+    if lower.endswith(".csv"):
+        return read_csv(path)
+    if lower.endswith((".db", ".sqlite", ".sqlite3")):
+        return read_ledger(path, since, until)
+    return read_jsonl(path)
+
+
+def render_jobs(records, template, form=None, on_skip=None):
+    """
+    Turn carton records into print jobs, one at a time
+
+    Args:
+        records: Iterable of CartonRecords
+        template: LabelTemplate (the same layout the packing station uses)
+        form: StoredForm to print through, or None
+        on_skip: Called as on_skip(index, record, message) for a carton
+            that cannot be rendered; it is skipped
+
+    Yields:
+        tuple: (index in the input, PrintJob)
+    """
+    for index, record in enumerate(records):
+        try:
+            if form:
+                data = form.render(record.carton_id, record.date_packed, record.serials)
+            else:
+                data = template.render(record.carton_id, record.date_packed, record.serials)
+        except ValueError as e:
+            if on_skip:
+                on_skip(index, record, str(e))
+            continue
+        yield index, PrintJob(
+            record.carton_id, data, item_count=len(record.serials), form=form, stock=template.stock
+        )
+
+
+class Checkpoint:
+    """
+    Resume point of a bulk run: how many input records are finished
+
+    Labels can complete out of order on a printer pool, so the checkpoint
+    only advances over an unbroken run of finished records. Finished
+    records past a gap are kept in a set, which stays no larger than the
+    labels in flight.
+    """
+
+    def __init__(self, path, source, done=0):
+        self.path = path
+        self.source = source
+        self.done = done
+        self.last_carton = None
+        self._finished = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, source):
+        """Checkpoint saved for source, or a fresh one"""
+        state = read_json(path) or {}
+        if state.get("source") != os.path.abspath(source):
+            return cls(path, source)
+        checkpoint = cls(path, source, state.get("done", 0))
+        checkpoint.last_carton = state.get("last_carton")
+        return checkpoint
+
+    def finish(self, index, carton_id):
+        """Mark input record index as finished and save if the resume point moved"""
+        with self._lock:
+            self._finished.add(index)
+            moved = False
+            while self.done in self._finished:
+                self._finished.discard(self.done)
+                self.done += 1
+                moved = True
+            if not moved:
+                return
+            self.last_carton = carton_id
+            write_json_atomic(self.path, {
+                "source": os.path.abspath(self.source),
+                "done": self.done,
+                "last_carton": self.last_carton,
+            })
+
+    def clear(self):
+        """Remove the checkpoint once the whole input is printed"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bulk reprint carton labels from an export")
+    parser.add_argument("input", help="JSONL or CSV export, or the packing ledger (.db)")
+    parser.add_argument("--port", default="COM7",
+                        help="printer address, or several comma separated (see scanprint.py)")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="serial",
+                        help="transport for --port addresses given without a prefix")
+    parser.add_argument("--baud", type=int, default=9600, help="printer baud rate")
+    parser.add_argument("--flow-control", choices=("rtscts", "xonxoff"), help="serial flow control")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="label template file")
+    parser.add_argument("--stored-form", action="store_true", help="store the layout in printer memory")
+    parser.add_argument("--since", help="ledger input: first date packed (YYYY-MM-DD)")
+    parser.add_argument("--until", help="ledger input: last date packed (YYYY-MM-DD)")
+    parser.add_argument("--checkpoint", help="progress file (default: INPUT.progress.json)")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip cartons a previous run already printed")
+    parser.add_argument("--ledger", help="packing ledger to record 'reprinted' events in")
+    return parser
+
+
+def run(args):
+    """
+    Print every carton in args.input
+
+    Returns:
+        int: Process exit code
+    """
+    template = load_template(args.template)
+    form = StoredForm(template) if args.stored_form else None
+    checkpoint_path = args.checkpoint or f"{args.input}.progress.json"
+    if args.resume:
+        checkpoint = Checkpoint.load(checkpoint_path, args.input)
+        if checkpoint.done:
+            print(f"Resuming after {checkpoint.done} cartons (last: {checkpoint.last_carton})")
+    else:
+        checkpoint = Checkpoint(checkpoint_path, args.input)
+
+    ledger = PackingLedger(args.ledger) if args.ledger else None
+    failed = threading.Event()
+    # Input index of each job in flight, by job id
+    in_flight = {}
+    printed = [0]
+
+    def on_sent(job):
+        index = in_flight.pop(id(job))
+        printed[0] += 1
+        if ledger is not None:
+            ledger.record_print_event(job.carton_id, "reprinted", job.printer)
+        checkpoint.finish(index, job.carton_id)
+        print(f"Printed carton {job.carton_id} ({job.item_count} items)", flush=True)
+
+    def on_failed(job):
+        in_flight.pop(id(job), None)
+        print(f"Failed to print carton {job.carton_id}; stopping", flush=True)
+        failed.set()
+
+    def on_held(job, status):
+        print(f"Carton {job.carton_id} held: {job.printer} {status.describe()}", flush=True)
+
+    printers = parse_printers(args.port)
+    for printer in printers:
+        printer["port"] = make_address(printer["port"], args.transport)
+    pool = PrinterPool(
+        printers,
+        baudrate=args.baud,
+        flow_control=args.flow_control,
+        max_pending=PIPELINE_DEPTH,
+        on_sent=on_sent,
+        on_failed=on_failed,
+        on_held=on_held
+    )
+
+    errors = []
+    skipped = checkpoint.done
+
+    def on_skip(offset, record, message):
+        # Nothing to print; reported at the end and not retried on resume
+        errors.append((record.carton_id, message))
+        checkpoint.finish(skipped + offset, record.carton_id)
+
+    records = itertools.islice(read_cartons(args.input, args.since, args.until), skipped, None)
+    pool.start()
+    try:
+        for offset, job in render_jobs(records, template, form, on_skip):
+            if failed.is_set():
+                break
+            in_flight[id(job)] = skipped + offset
+            # Blocks while PIPELINE_DEPTH labels are waiting: the next label
+            # is rendered while this one is on the wire
+            if not pool.submit(job, block=True):
+                in_flight.pop(id(job), None)
+                print(f"No printer takes {job.stock} labels for carton {job.carton_id}; stopping")
+                failed.set()
+    except KeyboardInterrupt:
+        print("Interrupted, finishing labels already sent to the printer...")
+        failed.set()
+    finally:
+        pool.stop()
+        pool.close()
+        if ledger is not None:
+            ledger.close()
+
+    for carton_id, message in errors:
+        print(f"Skipped carton {carton_id}: {message}")
+    print(f"Printed {printed[0]} cartons")
+    if failed.is_set() or in_flight:
+        print(f"Stopped; run again with --resume to continue after carton {checkpoint.last_carton}")
+        return 1
+    checkpoint.clear()
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return run(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,224 @@
+"""
+Carton ID Allocator Module
+Hands out carton IDs that are never reused, even across stations and crashes
+
+All stations share one allocation file (for example on a network share)
+holding the next free carton number of the current ISO week. A station
+reserves a block of numbers from it under a file lock, then allocates
+from that block locally without touching the shared file. Every change
+is written to a temporary file and atomically renamed into place, and
+the local position is saved before an ID is handed out, so a crash can
+skip numbers but never repeat one.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from carton_ids import MAX_CARTON_NUMBER, carton_prefix, iso_week_key
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+SHARED_FILE = 'carton_ids.json'
+LOCAL_FILE = 'station_ids.json'
+
+
+class FileLock:
+    """Exclusive lock on path + '.lock', usable across processes and hosts"""
+
+    def __init__(self, path, timeout=10.0):
+        """
+        Args:
+            path: File to protect
+            timeout: Seconds to wait for the lock before TimeoutError
+        """
+        self.lock_path = path + '.lock'
+        self.timeout = timeout
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if os.name == 'nt':
+                    msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except OSError:
+                if time.monotonic() >= deadline:
+                    os.close(self._fd)
+                    self._fd = None
+                    raise TimeoutError(f"Could not lock {self.lock_path}")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        try:
+            if os.name == 'nt':
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+def read_json(path):
+    """Read a JSON state file (None if it does not exist)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temporary file, flush it to disk and rename it over path"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if os.name != 'nt':
+        # Make the rename itself durable
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class CartonIdAllocator:
+    """Block-reserving carton ID allocator (CYYWW-XXX, reset every ISO week)"""
+
+    def __init__(self, shared_path=SHARED_FILE, local_path=LOCAL_FILE, block_size=10,
+                 seed=None, lock_timeout=10.0):
+        """
+        Args:
+            shared_path: Allocation file shared by all stations
+            local_path: This station's reserved block (keep on local disk)
+            block_size: Carton numbers reserved per trip to the shared file
+            seed: First number to use when the shared file does not exist
+                yet (e.g. the old carton counter), so earlier IDs are not reused
+            lock_timeout: Seconds to wait for the shared file lock
+        """
+        self.shared_path = shared_path
+        self.local_path = local_path
+        self.block_size = block_size
+        self.seed = seed
+        self.lock_timeout = lock_timeout
+        self._block = read_json(local_path)
+
+    def allocate(self, when=None):
+        """
+        Hand out the next carton ID
+
+        Args:
+            when: datetime deciding the week (defaults to now)
+
+        Returns:
+            str: Carton ID, e.g. 'C2544-001'
+
+        Raises:
+            ValueError: All MAX_CARTON_NUMBER numbers of the week are used
+        """
+        when = when or datetime.now()
+        week = iso_week_key(when)
+        block = self._block
+        if not block or block["week"] != week or block["next"] >= block["end"]:
+            # Near the end of the week the last block may be short
+            first, count = self._reserve(week, self.block_size, partial=True)
+            block = {"week": week, "next": first, "end": first + count}
+        number = block["next"]
+        block = dict(block, next=number + 1)
+        # Persist before handing the ID out: after a crash it is skipped, not reused
+        write_json_atomic(self.local_path, block)
+        self._block = block
+        return f"{carton_prefix(when)}{number:03d}"
+
+    def release(self, carton_id, when=None):
+        """
+        Give back the ID just allocated if it was never used (e.g. the
+        print queue was full). Only the most recent ID can be released.
+
+        Returns:
+            bool: True if the ID will be handed out again
+        """
+        when = when or datetime.now()
+        block = self._block
+        if not block or block["week"] != iso_week_key(when):
+            return False
+        if carton_id != f"{carton_prefix(when)}{block['next'] - 1:03d}":
+            return False
+        block = dict(block, next=block["next"] - 1)
+        write_json_atomic(self.local_path, block)
+        self._block = block
+        return True
+
+    def allocate_run(self, count, when=None):
+        """
+        Reserve count consecutive carton numbers straight from the shared file
+
+        Args:
+            count: Number of IDs
+            when: datetime deciding the week (defaults to now)
+
+        Returns:
+            tuple: (prefix, first number), e.g. ('C2544-', 12)
+
+        Raises:
+            ValueError: The run would go past MAX_CARTON_NUMBER (nothing
+                is reserved)
+        """
+        when = when or datetime.now()
+        first, _ = self._reserve(iso_week_key(when), count)
+        return carton_prefix(when), first
+
+    def peek(self, when=None):
+        """
+        Next ID from the local block, without allocating it
+
+        Returns:
+            str: Carton ID, or None if a new block has to be reserved first
+        """
+        when = when or datetime.now()
+        block = self._block
+        if not block or block["week"] != iso_week_key(when) or block["next"] >= block["end"]:
+            return None
+        return f"{carton_prefix(when)}{block['next']:03d}"
+
+    def _reserve(self, week, count, partial=False):
+        """
+        Take count numbers from the shared file
+
+        Args:
+            week: YYWW the numbers belong to
+            count: Numbers wanted
+            partial: Take what is left of the week if fewer than count remain
+
+        Returns:
+            tuple: (first number, numbers reserved)
+        """
+        with FileLock(self.shared_path, self.lock_timeout):
+            state = read_json(self.shared_path)
+            if state is None:
+                state = {"week": week, "next": self.seed or 1}
+            elif state["week"] != week:
+                state = {"week": week, "next": 1}
+            first = state["next"]
+            left = max(MAX_CARTON_NUMBER - first + 1, 0)
+            if count > left and not (partial and left):
+                # Checked under the lock, before anything is written
+                raise ValueError(
+                    f"Not enough carton numbers left in week {week}: "
+                    f"{count} wanted, {left} left (last is {MAX_CARTON_NUMBER:03d})"
+                )
+            count = min(count, left)
+            write_json_atomic(self.shared_path, {"week": week, "next": first + count})
+        return first, count
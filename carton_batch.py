@@ -0,0 +1,108 @@
+"""
+Carton Run Printing
+Pre-prints a run of consecutive carton labels (CYYWW-XXX) in a single job
+"""
+
+import argparse
+import os
+from carton_allocator import SHARED_FILE, CartonIdAllocator
+from carton_ids import MAX_CARTON_NUMBER
+from label_template import TEMPLATE_DIR, load_template
+from packing_ledger import PackingLedger
+from packing_station import legacy_counter
+from printer_session import PrinterSession
+
+RUN_TEMPLATE = os.path.join(TEMPLATE_DIR, "carton_run_100x150.tspl")
+
+
+def build_run_job(first, count, prefix, template_path=RUN_TEMPLATE):
+    """
+    Build one TSPL job printing count labels numbered from first
+
+    The printer increments the carton number itself (SET COUNTER / PRINT n),
+    so the job size does not depend on count.
+
+    Args:
+        first: First carton number
+        count: Number of labels
+        prefix: Carton ID prefix (CYYWW-)
+        template_path: Run template file
+
+    Returns:
+        bytes
+    """
+    if count < 1:
+        raise ValueError("Carton run must print at least 1 label")
+    if first + count - 1 > MAX_CARTON_NUMBER:
+        raise ValueError(
+            f"Carton run {first:03d}..{first + count - 1:03d} goes past {MAX_CARTON_NUMBER:03d}"
+        )
+    template = load_template(
+        template_path,
+        prefix=prefix,
+        first=f"{first:03d}",
+        count=count
+    )
+    return template.render("", "", [])
+
+
+def print_carton_run(session, count, allocator):
+    """
+    Reserve count consecutive carton IDs and print their labels
+
+    The IDs are reserved before sending, so a failed job leaves a gap
+    rather than risking the same IDs being handed out twice.
+
+    Args:
+        session: PrinterSession to print on
+        count: Number of labels
+        allocator: CartonIdAllocator
+
+    Returns:
+        tuple: (first, last) carton IDs printed, or None on failure
+
+    Raises:
+        ValueError: Bad count, or the run does not fit in the week's
+            numbers (nothing is reserved)
+    """
+    if not 1 <= count <= MAX_CARTON_NUMBER:
+        raise ValueError(f"Carton run must print 1 to {MAX_CARTON_NUMBER} labels")
+    prefix, first = allocator.allocate_run(count)
+    job = build_run_job(first, count, prefix)
+    if not session.send_job(job):
+        print(f"Carton IDs {prefix}{first:03d}..{prefix}{first + count - 1:03d} were reserved but not printed")
+        return None
+    return f"{prefix}{first:03d}", f"{prefix}{first + count - 1:03d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-print consecutive carton labels")
+    parser.add_argument("count", type=int, help="number of labels to print")
+    parser.add_argument("--port", default="COM7", help="printer serial port")
+    parser.add_argument("--baud", type=int, default=9600, help="printer baud rate")
+    parser.add_argument("--carton-id-file", default=SHARED_FILE,
+                        help="carton ID allocation file shared by all stations")
+    args = parser.parse_args()
+
+    session = PrinterSession(port=args.port, baudrate=args.baud)
+    ledger = PackingLedger()
+    try:
+        allocator = CartonIdAllocator(shared_path=args.carton_id_file, seed=legacy_counter(ledger))
+        result = print_carton_run(session, args.count, allocator)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        session.close()
+        ledger.close()
+
+    if result is None:
+        print("Failed to print carton run")
+        return 1
+    first, last = result
+    print(f"Printed {args.count} labels: {first} .. {last}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,67 @@
+"""
+Carton ID Module
+Carton numbering (CYYWW-XXX) and the legacy carton counter file
+"""
+
+from datetime import datetime
+
+COUNTER_FILE = 'carton_counter.txt'
+
+# XXX part of the carton ID
+MAX_CARTON_NUMBER = 999
+
+
+def iso_week_key(when=None):
+    """
+    ISO year and week as YYWW (e.g. '2544'); carton numbers restart each week
+
+    Args:
+        when: datetime to use (defaults to now)
+    """
+    year, week, _ = (when or datetime.now()).isocalendar()
+    return f"{year % 100:02d}{week:02d}"
+
+
+def carton_prefix(when=None):
+    """
+    Week part of the carton ID: CYYWW- (e.g. C2544-)
+
+    Args:
+        when: datetime to use (defaults to now)
+    """
+    return f"C{iso_week_key(when)}-"
+
+
+def format_carton_id(counter, when=None):
+    """
+    Format: CYYWW-XXX (e.g. C2544-001)
+
+    Args:
+        counter: Carton number within the week
+        when: datetime to use (defaults to now)
+    """
+    return f"{carton_prefix(when)}{counter:03d}"
+
+
+def read_counter_file(path=COUNTER_FILE):
+    """
+    Next carton number from the old carton_counter.txt
+
+    Args:
+        path: Counter file path
+
+    Returns:
+        int: Counter value (1 if the file is missing, empty or invalid)
+    """
+    try:
+        with open(path, 'r') as f:
+            text = f.read().strip()
+    except FileNotFoundError:
+        return 1
+    if not text:
+        return 1
+    try:
+        return int(text)
+    except ValueError:
+        print(f"Warning: invalid carton counter in {path}: {text!r}")
+        return 1
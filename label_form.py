@@ -0,0 +1,105 @@
+"""
+Stored Label Form Module
+Keeps the carton layout in printer memory so each carton only sends its data
+"""
+
+import hashlib
+from label_template import FORM_VARIABLES, FORM_ROW_COUNT, escape_tspl
+
+# Program names are FORM_PREFIX plus a layout hash, so a changed template
+# gets a new name and older versions can be recognised and removed
+FORM_PREFIX = "CTN"
+
+
+class StoredForm:
+    """
+    Label template stored on the printer as a TSPL BASIC program
+
+    The program is uploaded with DOWNLOAD once per session and only when
+    the printer does not already hold this exact version. Each carton
+    then sends its variables and a RUN of the stored program.
+    """
+
+    def __init__(self, template, storage="flash"):
+        """
+        Args:
+            template: LabelTemplate to store
+            storage: 'flash' (survives power off) or 'ram'
+        """
+        if storage not in ("flash", "ram"):
+            raise ValueError(f"Unknown form storage: {storage}")
+        self.template = template
+        self.storage = storage
+        self.program = template.program_lines()
+        digest = hashlib.sha1("\n".join(self.program).encode("utf-8")).hexdigest()
+        # 8.3 file name: CTN + 5 hex digits of the layout hash
+        self.filename = f"{FORM_PREFIX}{digest[:5].upper()}.BAS"
+
+    @property
+    def version(self):
+        """Hash part of the program name"""
+        return self.filename[len(FORM_PREFIX):-len(".BAS")]
+
+    def download_job(self):
+        """
+        TSPL commands that store the program in printer memory
+
+        Returns:
+            bytes
+        """
+        target = 'F,' if self.storage == "flash" else ''
+        lines = [f'DOWNLOAD {target}"{self.filename}"'] + self.program + ["EOP"]
+        return ("\r\n".join(lines) + "\r\n").encode("utf-8")
+
+    def render(self, carton_id, date_packed, serials):
+        """
+        Per-carton job: set the form variables and run the stored program
+
+        Args:
+            carton_id: Carton ID
+            date_packed: Date packed text
+            serials: Sequence of serial numbers
+
+        Returns:
+            bytes
+        """
+        if len(serials) > self.template.max_rows:
+            raise ValueError(
+                f"{self.template.name}: {len(serials)} items but layout only has "
+                f"{self.template.max_rows} rows"
+            )
+        out = bytearray()
+        out += FORM_VARIABLES["carton_id"].encode() + b'="' + escape_tspl(carton_id) + b'"\r\n'
+        out += FORM_VARIABLES["date_packed"].encode() + b'="' + escape_tspl(date_packed) + b'"\r\n'
+        out += f"{FORM_ROW_COUNT}={len(serials)}\r\n".encode()
+        for index, serial in enumerate(serials, 1):
+            out += f'S{index}$="'.encode() + escape_tspl(serial) + b'"\r\n'
+        out += f'RUN "{self.filename}"\r\n'.encode()
+        return bytes(out)
+
+    def ensure_loaded(self, printer):
+        """
+        Upload the program unless the printer already stores this version
+
+        Older versions of the carton form are deleted. When the printer
+        does not answer the file list query the program is uploaded.
+
+        Args:
+            printer: Connected TSCPrinter
+
+        Returns:
+            bool: True if the printer holds the current program
+        """
+        files = printer.list_files()
+        if files is not None:
+            if self.filename in files:
+                return True
+            target = 'F,' if self.storage == "flash" else ''
+            stale = [
+                f'KILL {target}"{name}"'
+                for name in files
+                if name.startswith(FORM_PREFIX) and name.endswith(".BAS")
+            ]
+            if stale and not printer.send_job(stale):
+                return False
+        return printer.send_job(self.download_job())
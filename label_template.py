@@ -0,0 +1,311 @@
+"""
+Label Template Module
+Compiles TSPL label layouts once and renders cartons by splicing in data
+"""
+
+import os
+import string
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+DEFAULT_TEMPLATE = os.path.join(TEMPLATE_DIR, "carton_100x150.tspl")
+
+# Values filled in per carton; everything else is resolved at compile time
+HEADER_SLOTS = ("carton_id", "date_packed")
+ROW_SLOT = "serial"
+
+# TSPL BASIC variables holding the slot values when the layout runs as a
+# program stored in printer memory
+FORM_VARIABLES = {"carton_id": "CID$", "date_packed": "DTE$"}
+FORM_ROW_COUNT = "N"
+
+
+def escape_tspl(value):
+    """
+    Make a value safe inside a double-quoted TSPL string
+
+    Double quotes become the TSPL escape \\["] and line breaks, which would
+    end the command early, are dropped.
+
+    Args:
+        value: Text to escape
+
+    Returns:
+        bytes: UTF-8 encoded, escaped value
+    """
+    value = str(value)
+    if '"' in value:
+        value = value.replace('"', '\\["]')
+    if '\r' in value or '\n' in value:
+        value = value.replace('\r', '').replace('\n', '')
+    return value.encode('utf-8')
+
+
+class RowGrid:
+    """Position of the item rows on the label"""
+
+    def __init__(self, x=50, y=200, dx=380, dy=85, cols=2, max_rows=20):
+        self.x = int(x)
+        self.y = int(y)
+        self.dx = int(dx)
+        self.dy = int(dy)
+        self.cols = int(cols)
+        self.max_rows = int(max_rows)
+
+    def position(self, index):
+        """Return (x, y) in dots of the zero-based row index"""
+        row = index // self.cols
+        col = index % self.cols
+        return self.x + col * self.dx, self.y + row * self.dy
+
+
+class LabelTemplate:
+    """
+    Label layout compiled into pre-encoded byte segments and slots
+
+    Rendering a carton only joins the stored segments with the escaped
+    carton ID, date and serials, so no layout maths or formatting runs
+    per label.
+    """
+
+    def __init__(self, source, name="template", **params):
+        """
+        Args:
+            source: Template text (see templates/carton_100x150.tspl)
+            name: Name used in error messages
+            **params: Compile-time values overriding @PARAM defaults
+        """
+        self.name = name
+        self.source = source
+        self.params = {}
+        self.grid = None
+        self._head = []
+        self._rows = []
+        self._tail = []
+        self._compile(params)
+
+    @property
+    def max_rows(self):
+        """Maximum number of items the layout has room for"""
+        return len(self._rows)
+
+    @property
+    def stock(self):
+        """Label size as 'WIDTHxHEIGHT' in mm, or None if not declared"""
+        if "width" in self.params and "height" in self.params:
+            return f"{self.params['width']}x{self.params['height']}"
+        return None
+
+    def render(self, carton_id, date_packed, serials):
+        """
+        Render one carton label
+
+        Args:
+            carton_id: Carton ID
+            date_packed: Date packed text
+            serials: Sequence of serial numbers, one per row
+
+        Returns:
+            bytes: Complete TSPL job
+        """
+        if len(serials) > len(self._rows):
+            raise ValueError(
+                f"{self.name}: {len(serials)} items but layout only has {len(self._rows)} rows"
+            )
+        values = {
+            "carton_id": escape_tspl(carton_id),
+            "date_packed": escape_tspl(date_packed),
+        }
+        out = bytearray()
+        for literal, slot in self._head:
+            out += literal
+            if slot:
+                out += values[slot]
+        for (prefix, suffix), serial in zip(self._rows, serials):
+            out += prefix
+            out += escape_tspl(serial)
+            out += suffix
+        for literal, slot in self._tail:
+            out += literal
+            if slot:
+                out += values[slot]
+        return bytes(out)
+
+    def render_head(self, carton_id, date_packed):
+        """
+        Render the part of the label before the item rows
+
+        With render_row() and render_tail() this sends a label in pieces
+        while its items are still being scanned; the pieces joined are the
+        same bytes render() returns.
+
+        Returns:
+            bytes: TSPL commands (the template's CLS, SIZE, header fields)
+        """
+        return self._fill(self._head, carton_id, date_packed)
+
+    def render_row(self, index, serial):
+        """Render item row index (zero-based) of the grid"""
+        prefix, suffix = self._rows[index]
+        return prefix + escape_tspl(serial) + suffix
+
+    def render_tail(self, carton_id, date_packed):
+        """Render the part of the label after the item rows, ending in PRINT"""
+        return self._fill(self._tail, carton_id, date_packed)
+
+    def erase_rows(self, index, count):
+        """
+        TSPL ERASE clearing grid rows from item index onward
+
+        Whole grid lines are cleared, from the one holding item index to
+        the one holding the last of count items, so text running into the
+        next column is cleared too. The caller redraws the items from the
+        start of that grid line.
+
+        Args:
+            index: First item (zero-based) to clear
+            count: Items currently drawn
+
+        Returns:
+            tuple: (bytes with the ERASE command, first item to redraw)
+        """
+        grid = self.grid
+        first_line = index // grid.cols
+        last_line = (count - 1) // grid.cols
+        x, y = grid.position(first_line * grid.cols)
+        width = grid.cols * grid.dx
+        height = (last_line - first_line + 1) * grid.dy
+        return f"ERASE {x},{y},{width},{height}\r\n".encode("ascii"), first_line * grid.cols
+
+    def _fill(self, parts, carton_id, date_packed):
+        values = {
+            "carton_id": escape_tspl(carton_id),
+            "date_packed": escape_tspl(date_packed),
+        }
+        out = bytearray()
+        for literal, slot in parts:
+            out += literal
+            if slot:
+                out += values[slot]
+        return bytes(out)
+
+    def program_lines(self):
+        """
+        Express the layout as TSPL BASIC lines that read their data from
+        variables (see FORM_VARIABLES), for storing in printer memory
+
+        Row i is drawn only when the row count variable N is at least i,
+        and its serial is read from S<i>$.
+
+        Returns:
+            list: Program lines without line endings
+        """
+        lines = []
+        lines += self._program_text(self._head, FORM_VARIABLES)
+        for index, (prefix, suffix) in enumerate(self._rows, 1):
+            parts = [(prefix, ROW_SLOT), (suffix, None)]
+            row_lines = self._program_text(parts, {ROW_SLOT: f"S{index}$"})
+            lines += [f"IF {FORM_ROW_COUNT}>={index} THEN {line}" for line in row_lines]
+        lines += self._program_text(self._tail, FORM_VARIABLES)
+        return lines
+
+    def _program_text(self, parts, variables):
+        """Join compiled parts, turning each slot into string concatenation"""
+        text = ""
+        for literal, slot in parts:
+            text += literal.decode("utf-8")
+            if slot:
+                line = text.rpartition("\r\n")[2]
+                if line.replace('\\["]', "").count('"') % 2 == 0:
+                    raise ValueError(
+                        f"{self.name}: {{{slot}}} must be inside a quoted string to store the layout as a program"
+                    )
+                text += f'"+{variables[slot]}+"'
+        text = text.replace('+""', "").replace('""+', "")
+        return [line for line in text.split("\r\n") if line]
+
+    def _compile(self, overrides):
+        head, row_lines, tail = [], [], []
+        section = head
+        grid_args = None
+
+        for lineno, raw in enumerate(self.source.splitlines(), 1):
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("@PARAM"):
+                key, value = self._split_assignment(line[len("@PARAM"):].strip(), lineno)
+                self.params[key] = value
+            elif line.startswith("@ROWS"):
+                if grid_args is not None:
+                    raise ValueError(f"{self.name}:{lineno}: only one @ROWS block is allowed")
+                grid_args = dict(
+                    self._split_assignment(item, lineno) for item in line[len("@ROWS"):].split()
+                )
+                section = row_lines
+            elif line == "@END":
+                section = tail
+            else:
+                section.append((lineno, line))
+
+        self.params.update(overrides)
+        if grid_args is None:
+            self.grid = RowGrid(max_rows=0)
+        else:
+            grid_args["max_rows"] = grid_args.pop("max", 20)
+            self.grid = RowGrid(**grid_args)
+
+        self._head = self._compile_lines(head, self.params, HEADER_SLOTS)
+        self._tail = self._compile_lines(tail, self.params, HEADER_SLOTS)
+
+        for index in range(self.grid.max_rows):
+            x, y = self.grid.position(index)
+            values = dict(self.params, x=x, y=y, index=index + 1)
+            parts = self._compile_lines(row_lines, values, (ROW_SLOT,))
+            slots = [slot for _, slot in parts if slot]
+            if slots != [ROW_SLOT]:
+                raise ValueError(f"{self.name}: @ROWS block must use {{{ROW_SLOT}}} exactly once")
+            prefix = b"".join(literal for literal, _ in parts[:1])
+            suffix = b"".join(literal for literal, _ in parts[1:])
+            self._rows.append((prefix, suffix))
+
+    def _compile_lines(self, lines, values, slots):
+        """Turn template lines into (literal bytes, slot name or None) pairs"""
+        parts = []
+        literal = []
+        for lineno, line in lines:
+            for text, field, spec, conversion in string.Formatter().parse(line):
+                literal.append(text)
+                if field is None:
+                    continue
+                if field in slots:
+                    parts.append(("".join(literal).encode("utf-8"), field))
+                    literal = []
+                elif field in values:
+                    literal.append(format(values[field], spec or ""))
+                else:
+                    raise ValueError(f"{self.name}:{lineno}: unknown placeholder {{{field}}}")
+            literal.append("\r\n")
+        parts.append(("".join(literal).encode("utf-8"), None))
+        return parts
+
+    def _split_assignment(self, text, lineno):
+        key, sep, value = text.partition("=")
+        if not sep or not key.strip():
+            raise ValueError(f"{self.name}:{lineno}: expected name=value, got {text!r}")
+        value = value.strip()
+        return key.strip(), int(value) if value.lstrip("-").isdigit() else value
+
+
+def load_template(path=DEFAULT_TEMPLATE, **params):
+    """
+    Load and compile a label template file
+
+    Args:
+        path: Path to a .tspl template file
+        **params: Compile-time values overriding @PARAM defaults
+
+    Returns:
+        LabelTemplate
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return LabelTemplate(f.read(), name=os.path.basename(path), **params)
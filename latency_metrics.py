@@ -0,0 +1,229 @@
+"""
+Latency Metrics Module
+In-process histograms of where time goes between a scan and a printed label
+
+Stages recorded (seconds):
+    scan     add_scan: scan received until it is in the open carton
+    extract  serial number extraction (part of scan)
+    build    rendering the carton label
+    queue    label waiting in the spooler before it is sent
+    write    bytes written to the printer link and drained
+    drained  carton closed until the whole label has left this machine
+
+The printer never confirms a label, so "drained" ends when the local
+output buffer is empty (serial driver or socket), not when the label
+is printed or even fully received by the printer.
+
+Collection is off until enable() is called. Disabled hooks cost one
+attribute check: start() returns None and stop() ignores it.
+
+Example:
+    from latency_metrics import metrics
+    metrics.enable()
+    ...
+    metrics.write("stats.prom")   # or stats.csv
+"""
+
+import bisect
+import csv
+import os
+import threading
+import time
+
+STAGES = ("scan", "extract", "build", "queue", "write", "drained")
+
+# Bucket upper bounds in seconds: 50 us to 60 s, roughly 1-2-5 steps
+BUCKETS = (
+    0.00005, 0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+    0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 60.0,
+)
+
+
+class Histogram:
+    """Fixed-bucket histogram with approximate quantiles"""
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        # One extra bucket for values above the last bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        Estimate the q-quantile (0..1) by interpolating inside its bucket
+
+        Returns:
+            float: Seconds, or 0.0 with no observations
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+class Metrics:
+    """Per-stage histograms plus label and byte counters"""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self, enabled=True):
+        """Turn collection on (or off); counters start from zero when turned on"""
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.stages = {stage: Histogram() for stage in STAGES}
+            self.labels = 0
+            self.bytes = 0
+            self.started = time.monotonic()
+
+    def start(self):
+        """Timestamp for stop(), or None when collection is off"""
+        return time.perf_counter() if self.enabled else None
+
+    def stop(self, stage, started):
+        """Record the time since start() under stage"""
+        if started is not None:
+            self.observe(stage, time.perf_counter() - started)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    def add_bytes(self, count):
+        if self.enabled:
+            with self._lock:
+                self.bytes += count
+
+    def add_label(self):
+        if self.enabled:
+            with self._lock:
+                self.labels += 1
+
+    def summary(self):
+        """
+        Figures for the stats panel and the exports
+
+        Returns:
+            dict: 'stages' maps stage -> dict(count, p50, p95, mean, max) in
+            seconds; 'labels', 'bytes', 'labels_per_hour' and
+            'bytes_per_sec' (link rate while writing)
+        """
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": h.count,
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                    "mean": h.mean,
+                    "max": h.max,
+                }
+                for stage, h in self.stages.items()
+            }
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            write_seconds = self.stages["write"].sum
+            return {
+                "stages": stages,
+                "labels": self.labels,
+                "bytes": self.bytes,
+                "labels_per_hour": self.labels / elapsed * 3600,
+                "bytes_per_sec": self.bytes / write_seconds if write_seconds else 0.0,
+            }
+
+    def to_prometheus(self, prefix="scanprint"):
+        """Render all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                f"# HELP {prefix}_stage_seconds Time spent in each scan-to-print stage",
+                f"# TYPE {prefix}_stage_seconds histogram",
+            ]
+            for stage, h in self.stages.items():
+                cumulative = 0
+                for bound, count in zip(h.bounds, h.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {h.count}')
+            lines += [
+                f"# HELP {prefix}_labels_total Labels accepted by the printer",
+                f"# TYPE {prefix}_labels_total counter",
+                f"{prefix}_labels_total {self.labels}",
+                f"# HELP {prefix}_bytes_total Bytes written to the printer",
+                f"# TYPE {prefix}_bytes_total counter",
+                f"{prefix}_bytes_total {self.bytes}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Export to path: CSV when it ends in .csv, Prometheus text otherwise
+
+        The file is replaced atomically, so a node_exporter textfile
+        collector never reads half a file.
+        """
+        tmp = f"{path}.tmp"
+        if path.lower().endswith(".csv"):
+            summary = self.summary()
+            with open(tmp, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["metric", "stage", "value"])
+                for stage, figures in summary["stages"].items():
+                    writer.writerow(["count", stage, figures["count"]])
+                    for name in ("p50", "p95", "mean", "max"):
+                        writer.writerow([f"{name}_ms", stage, round(figures[name] * 1000, 3)])
+                for name in ("labels", "bytes", "labels_per_hour", "bytes_per_sec"):
+                    writer.writerow([name, "", round(summary[name], 1)])
+        else:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def start_export(self, path, interval=15.0):
+        """
+        Write the export file every interval seconds from a daemon thread
+
+        Returns:
+            (thread, stop_event): set stop_event and join the thread to stop;
+            the file is written once more on the way out
+        """
+        stop_event = threading.Event()
+
+        def run():
+            while not stop_event.wait(interval):
+                self.write(path)
+            self.write(path)
+
+        thread = threading.Thread(target=run, name="metrics-export", daemon=True)
+        thread.start()
+        return thread, stop_event
+
+
+# Shared by every module in the process
+metrics = Metrics()
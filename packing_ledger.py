@@ -0,0 +1,339 @@
+"""
+Packing Ledger Module
+SQLite record of cartons, the serials packed in them and their print events
+
+Writes are queued and committed in batches by a background thread, so
+the scan and print paths never wait on the disk. Queries use their own
+connection and the serial / carton indexes.
+
+Usage: python packing_ledger.py find <serial>
+       python packing_ledger.py carton <carton_id>
+       python packing_ledger.py export <file.jsonl|file.csv> [from_date [to_date]]
+"""
+
+import csv
+import itertools
+import json
+import queue
+import socket
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+LEDGER_PATH = 'packing_ledger.db'
+
+USAGE = """Usage: python packing_ledger.py find <serial>
+       python packing_ledger.py carton <carton_id>
+       python packing_ledger.py export <file.jsonl|file.csv> [from_date [to_date]]"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cartons (
+    carton_id   TEXT PRIMARY KEY,
+    date_packed TEXT NOT NULL,
+    station     TEXT,
+    item_count  INTEGER NOT NULL,
+    created_at  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS serials (
+    serial      TEXT NOT NULL,
+    carton_id   TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    pcb_serial  TEXT,
+    revision    TEXT,
+    firmware    TEXT,
+    raw         TEXT
+);
+CREATE INDEX IF NOT EXISTS serials_by_serial ON serials (serial);
+CREATE INDEX IF NOT EXISTS serials_by_carton ON serials (carton_id);
+CREATE TABLE IF NOT EXISTS print_events (
+    id          INTEGER PRIMARY KEY,
+    carton_id   TEXT NOT NULL,
+    ts          TEXT NOT NULL,
+    event       TEXT NOT NULL,
+    detail      TEXT
+);
+CREATE INDEX IF NOT EXISTS print_events_by_carton ON print_events (carton_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key         TEXT PRIMARY KEY,
+    value       TEXT NOT NULL
+);
+"""
+
+
+def _timestamp():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class PackingLedger:
+    """Carton / serial / print event ledger in an SQLite database (WAL mode)"""
+
+    def __init__(self, path=LEDGER_PATH, station=None, batch_size=200):
+        """
+        Args:
+            path: SQLite database file
+            station: Name recorded with each carton (defaults to the host name)
+            batch_size: Most queued writes committed in one transaction
+        """
+        self.path = path
+        self.station = station or socket.gethostname()
+        self.batch_size = batch_size
+        self._writes = queue.Queue()
+        self._local = threading.local()
+
+        conn = _connect(path)
+        with conn:
+            conn.executescript(SCHEMA)
+        conn.close()
+
+        self._writer = threading.Thread(target=self._run, daemon=True)
+        self._writer.start()
+
+    # ---- writes (queued) ----
+
+    def record_carton(self, carton_id, date_packed, records):
+        """
+        Queue a packed carton and its serials
+
+        Args:
+            carton_id: Carton ID
+            date_packed: Date packed text printed on the label
+            records: ScanRecord per item, in label order
+        """
+        rows = [
+            (r.serial, carton_id, position, r.pcb_serial, r.revision, r.firmware, r.raw)
+            for position, r in enumerate(records, 1)
+        ]
+        self._writes.put((
+            "INSERT OR REPLACE INTO cartons VALUES (?, ?, ?, ?, ?)",
+            [(carton_id, date_packed, self.station, len(rows), _timestamp())]
+        ))
+        self._writes.put(("DELETE FROM serials WHERE carton_id = ?", [(carton_id,)]))
+        self._writes.put(("INSERT INTO serials VALUES (?, ?, ?, ?, ?, ?, ?)", rows))
+
+    def record_print_event(self, carton_id, event, detail=None):
+        """
+        Queue a print event (e.g. 'queued', 'sent', 'failed', 'held')
+
+        Args:
+            carton_id: Carton ID
+            event: Event name
+            detail: Optional text
+        """
+        self._writes.put((
+            "INSERT INTO print_events (carton_id, ts, event, detail) VALUES (?, ?, ?, ?)",
+            [(carton_id, _timestamp(), event, detail)]
+        ))
+
+    def set_meta(self, key, value):
+        """Queue a key/value setting (e.g. the carton counter)"""
+        self._writes.put((
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)", [(key, str(value))]
+        ))
+
+    def flush(self):
+        """Block until every queued write is committed"""
+        self._writes.join()
+
+    def close(self):
+        """Commit queued writes and stop the writer thread"""
+        if self._writer.is_alive():
+            self._writes.put(None)
+            self._writer.join()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _run(self):
+        conn = _connect(self.path)
+        running = True
+        while running:
+            batch = [self._writes.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    for item in batch:
+                        if item is None:
+                            running = False
+                            continue
+                        sql, rows = item
+                        conn.executemany(sql, rows)
+            except sqlite3.Error as e:
+                print(f"Ledger write error: {e}")
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+        conn.close()
+
+    # ---- queries ----
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    def get_meta(self, key, default=None):
+        """Read a committed key/value setting"""
+        row = self._reader().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def carton_for_serial(self, serial):
+        """
+        Which carton holds a serial?
+
+        Args:
+            serial: Serial number
+
+        Returns:
+            str: Most recent carton ID containing the serial, or None
+        """
+        row = self._reader().execute(
+            "SELECT carton_id FROM serials WHERE serial = ? ORDER BY rowid DESC LIMIT 1",
+            (serial,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def carton(self, carton_id):
+        """
+        Look up a carton
+
+        Returns:
+            dict: carton_id, date_packed, station, created_at, serials and
+            print events, or None if unknown
+        """
+        conn = self._reader()
+        row = conn.execute(
+            "SELECT carton_id, date_packed, station, created_at FROM cartons WHERE carton_id = ?",
+            (carton_id,)
+        ).fetchone()
+        if not row:
+            return None
+        serials = [r[0] for r in conn.execute(
+            "SELECT serial FROM serials WHERE carton_id = ? ORDER BY position", (carton_id,)
+        )]
+        events = conn.execute(
+            "SELECT ts, event, detail FROM print_events WHERE carton_id = ? ORDER BY id",
+            (carton_id,)
+        ).fetchall()
+        return {
+            "carton_id": row[0],
+            "date_packed": row[1],
+            "station": row[2],
+            "created_at": row[3],
+            "serials": serials,
+            "events": events,
+        }
+
+    def iter_cartons(self, since=None, until=None):
+        """
+        Stream packed cartons in packing order
+
+        Rows are read from one cursor and grouped as they arrive, so memory
+        use does not grow with the size of the ledger.
+
+        Args:
+            since: First date_packed to include (e.g. '2025-10-30'), or None
+            until: Last date_packed to include (whole day if only a date)
+
+        Yields:
+            tuple: (carton_id, date_packed, [serials])
+        """
+        query = (
+            "SELECT c.carton_id, c.date_packed, s.serial FROM cartons c "
+            "JOIN serials s ON s.carton_id = c.carton_id"
+        )
+        where, params = [], []
+        if since:
+            where.append("c.date_packed >= ?")
+            params.append(since)
+        if until:
+            where.append("c.date_packed <= ?")
+            params.append(until if len(until) > 10 else until + " 23:59:59")
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY c.rowid, s.position"
+
+        # A separate connection keeps the cursor independent of other reads
+        conn = _connect(self.path)
+        try:
+            rows = conn.execute(query, params)
+            for (carton_id, date_packed), group in itertools.groupby(rows, key=lambda r: r[:2]):
+                yield carton_id, date_packed, [r[2] for r in group]
+        finally:
+            conn.close()
+
+
+def export(path, since=None, until=None, ledger_path=LEDGER_PATH):
+    """
+    Write packed cartons to a JSONL or CSV file (for bulk_print.py)
+
+    JSONL has one {"carton_id", "date_packed", "serials"} object per line;
+    CSV has one row per serial with carton_id, date_packed and serial.
+    """
+    ledger = PackingLedger(ledger_path)
+    count = 0
+    try:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            if path.lower().endswith(".csv"):
+                writer = csv.writer(f)
+                writer.writerow(["carton_id", "date_packed", "serial"])
+                for carton_id, date_packed, serials in ledger.iter_cartons(since, until):
+                    writer.writerows([carton_id, date_packed, serial] for serial in serials)
+                    count += 1
+            else:
+                for carton_id, date_packed, serials in ledger.iter_cartons(since, until):
+                    f.write(json.dumps({
+                        "carton_id": carton_id, "date_packed": date_packed, "serials": serials
+                    }) + "\n")
+                    count += 1
+    finally:
+        ledger.close()
+    print(f"Exported {count} cartons to {path}")
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["export"] and 2 <= len(argv) <= 4:
+        return export(*argv[1:])
+    if len(argv) != 2 or argv[0] not in ("find", "carton"):
+        print(USAGE)
+        return 2
+    ledger = PackingLedger()
+    try:
+        if argv[0] == "find":
+            carton_id = ledger.carton_for_serial(argv[1])
+            if carton_id is None:
+                print(f"S/N {argv[1]} not found")
+                return 1
+            argv = ["carton", carton_id]
+        carton = ledger.carton(argv[1])
+        if carton is None:
+            print(f"Carton {argv[1]} not found")
+            return 1
+        print(f"Carton {carton['carton_id']} packed {carton['date_packed']} at {carton['station']}")
+        for position, serial in enumerate(carton["serials"], 1):
+            print(f"  {position:02d}. {serial}")
+        for ts, event, detail in carton["events"]:
+            print(f"  [{ts}] {event}{': ' + detail if detail else ''}")
+        return 0
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,384 @@
+"""
+Packing Station Module
+Scan-to-carton workflow shared by the GUI and the headless scanprint tool
+"""
+
+from datetime import datetime
+from barcode_parser import parse_scan
+from carton_allocator import CartonIdAllocator
+from carton_ids import read_counter_file
+from label_template import load_template
+from latency_metrics import metrics
+from print_spooler import PrintJob
+
+
+def legacy_counter(ledger=None):
+    """
+    Carton counter from before block allocation, used to seed the shared
+    allocation file so IDs already printed are not handed out again
+
+    Args:
+        ledger: PackingLedger that may hold the counter
+    """
+    if ledger is not None:
+        stored = ledger.get_meta("carton_counter")
+        if stored is not None:
+            return int(stored)
+    return read_counter_file()
+
+
+class DuplicateSerialError(ValueError):
+    """Scanned serial is already in the open carton or a packed carton"""
+
+    def __init__(self, serial, carton_id=None):
+        """
+        Args:
+            serial: Duplicate serial number
+            carton_id: Carton it was packed in (None = the open carton)
+        """
+        self.serial = serial
+        self.carton_id = carton_id
+        if carton_id:
+            message = f"S/N {serial} was already packed in carton {carton_id}"
+        else:
+            message = f"S/N {serial} is already in this carton"
+        super().__init__(message)
+
+
+class CartonFullError(ValueError):
+    """Scan arrived after the open carton already holds items_per_carton items"""
+
+
+class LabelStream:
+    """
+    Label of the open carton, sent to the printer while it is being scanned
+
+    The header goes out when the carton opens and one row per scan, so at
+    close only the tail (PRINT) is left to send. All pieces go to the
+    printer that took the header. If any piece cannot be queued or sent
+    the stream is broken and the whole label is sent at close instead;
+    it starts with CLS, so the half-drawn image is discarded.
+    """
+
+    def __init__(self, carton_id, date_packed, allocated):
+        """
+        Args:
+            carton_id: Carton ID drawn in the header
+            date_packed: Date drawn in the header
+            allocated: True if carton_id came from the allocator
+        """
+        self.carton_id = carton_id
+        self.date_packed = date_packed
+        self.allocated = allocated
+        # Pool printer the pieces are pinned to (None with a single spooler)
+        self.printer = None
+        self.broken = False
+
+
+class LabelPiece(PrintJob):
+    """Part of a streamed label: header, rows or an ERASE and redrawn rows"""
+
+    partial = True
+    pinned = True
+
+    def __init__(self, stream, data, stock=None):
+        super().__init__(stream.carton_id, data, stock=stock)
+        self.stream = stream
+        self.printer = stream.printer
+
+
+class StreamedLabel(PrintJob):
+    """
+    Closing job of a streamed label
+
+    Sends only the tail while the stream is intact, and the whole label on
+    any printer once a piece has failed (decided when the job is sent).
+    """
+
+    def __init__(self, stream, tail, full, item_count=0, stock=None):
+        super().__init__(stream.carton_id, tail, item_count=item_count, stock=stock)
+        self.stream = stream
+        self.full = full
+        self.printer = stream.printer
+
+    @property
+    def data(self):
+        return self.full if self.stream.broken else self._tail
+
+    @data.setter
+    def data(self, value):
+        self._tail = value
+
+    @property
+    def pinned(self):
+        return not self.stream.broken
+
+
+class PackingStation:
+    """
+    Open carton, carton numbering and label printing for one station
+
+    Scans are reduced to serial numbers and collected in the open carton.
+    Closing the carton allocates its carton ID, renders its label and
+    queues it on the spooler.
+
+    With streaming on, the carton ID is allocated at the first scan and
+    the label is sent piece by piece as items are scanned (LabelStream);
+    removing an item erases the affected grid lines and redraws them.
+    Stored forms are not streamed.
+
+    A carton counts as packed (serial index and ledger) once its label has
+    been sent. While the label is queued its serials are still refused as
+    duplicates; if it fails they are released so the items can be scanned
+    into a new carton.
+    """
+
+    def __init__(self, spooler, template=None, items_per_carton=20, allocator=None,
+                 serial_index=None, ledger=None, streaming=False):
+        """
+        Args:
+            spooler: PrintSpooler or PrinterPool that sends the labels
+            template: LabelTemplate (defaults to the 100x150 mm carton label)
+            items_per_carton: Items that fill a carton
+            allocator: CartonIdAllocator (defaults to one using files in the
+                working directory)
+            serial_index: PackedSerialIndex of serials in earlier cartons,
+                or None to only check the open carton for duplicates
+            ledger: PackingLedger recording cartons and print events
+            streaming: Send the label while the carton is being scanned
+        """
+        self.spooler = spooler
+        self.template = template or load_template()
+        if items_per_carton > self.template.max_rows:
+            raise ValueError(
+                f"{items_per_carton} items per carton but {self.template.name} "
+                f"only has {self.template.max_rows} rows"
+            )
+        self.items_per_carton = items_per_carton
+        self.ledger = ledger
+        self.allocator = allocator or CartonIdAllocator(seed=legacy_counter(ledger))
+        # Serial numbers on the label, and the parsed scan behind each one
+        self.items = []
+        self.records = []
+        self.open_serials = set()
+        self.serial_index = serial_index
+        self.streaming = streaming
+        self.stream = None
+        # Queued labels by id(job): (date packed, scan records), and the
+        # carton each of their serials is in
+        self._queued = {}
+        self._queued_serials = {}
+
+    def add_scan(self, raw):
+        """
+        Add a scanned barcode to the open carton
+
+        Args:
+            raw: Scanned text
+
+        Returns:
+            ScanRecord: Parsed scan. When the format is not recognised the
+            whole scan is stored as the serial.
+
+        Raises:
+            DuplicateSerialError: The serial is already in this carton or
+                was packed in an earlier one
+            CartonFullError: The carton already holds items_per_carton items
+        """
+        if self.is_full():
+            raise CartonFullError(f"Carton is full ({self.items_per_carton} items), print it first")
+        started = metrics.start()
+        record = parse_scan(raw)
+        metrics.stop("extract", started)
+        serial = record.serial
+        if serial in self.open_serials:
+            raise DuplicateSerialError(serial)
+        queued_in = self._queued_serials.get(serial)
+        if queued_in is not None:
+            raise DuplicateSerialError(serial, queued_in)
+        if self.serial_index is not None:
+            packed_in = self.serial_index.lookup(serial)
+            if packed_in is not None:
+                raise DuplicateSerialError(serial, packed_in)
+        self.items.append(serial)
+        self.records.append(record)
+        self.open_serials.add(serial)
+        if self.streaming:
+            self._stream_rows(len(self.items) - 1)
+        elif self.stream is not None:
+            # Streaming was switched off mid-carton: this row was not sent,
+            # so the whole label goes out at close
+            self.stream.broken = True
+        metrics.stop("scan", started)
+        return record
+
+    def remove(self, index):
+        """Remove and return the serial at index"""
+        count = len(self.items)
+        self.records.pop(index)
+        serial = self.items.pop(index)
+        self.open_serials.discard(serial)
+        if self.stream and not self.stream.broken:
+            # Back to the state before the grid line holding index, then
+            # redraw the items that moved up
+            erase, first = self.template.erase_rows(index, count)
+            self._stream_rows(first, prefix=erase)
+        return serial
+
+    def clear(self):
+        """Empty the open carton, giving back a carton ID taken for streaming"""
+        if self.stream:
+            # Abandoned: a printer holding its pieces is free for other labels
+            self.stream.broken = True
+            if self.stream.allocated:
+                self.allocator.release(self.stream.carton_id)
+        self._reset()
+
+    def _reset(self):
+        self.items.clear()
+        self.records.clear()
+        self.open_serials.clear()
+        self.stream = None
+
+    def _stream_rows(self, first, prefix=b''):
+        """Send rows from item first onward, opening the stream if needed"""
+        if self.stream is None:
+            try:
+                carton_id = self.allocator.allocate()
+            except ValueError:
+                # Week's numbers used up; closing the carton reports it
+                return
+            date_packed = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.stream = LabelStream(carton_id, date_packed, allocated=True)
+            # Items scanned before streaming was switched on are drawn too
+            prefix = self.template.render_head(carton_id, date_packed)
+            first = 0
+        if self.stream.broken:
+            return
+        data = prefix + b"".join(
+            self.template.render_row(index, serial)
+            for index, serial in enumerate(self.items[first:], first)
+        )
+        piece = LabelPiece(self.stream, data, stock=self.template.stock)
+        if not self.spooler.submit(piece):
+            self.stream.broken = True
+        elif self.stream.printer is None:
+            self.stream.printer = piece.printer
+
+    def is_full(self):
+        """True once the open carton holds items_per_carton items"""
+        return len(self.items) >= self.items_per_carton
+
+    def next_carton_id(self):
+        """Carton ID the next carton will get, if already reserved (else None)"""
+        return self.allocator.peek()
+
+    def build_job(self, carton_id, date_packed, items, form=None):
+        """Render a carton label from the template or the stored form"""
+        if form:
+            return form.render(carton_id, date_packed, items)
+        return self.template.render(carton_id, date_packed, items)
+
+    def close_carton(self, carton_id=None, date_packed=None, form=None, block=False):
+        """
+        Queue the open carton's label and start a new carton
+
+        Args:
+            carton_id: Override carton ID (no ID is allocated)
+            date_packed: Override date packed text (defaults to now)
+            form: StoredForm to print with, or None for the full label
+            block: Wait for room in the print queue instead of failing
+
+        Returns:
+            PrintJob: The queued job, or None if the print queue is full
+        """
+        if len(self.items) > self.template.max_rows:
+            raise ValueError(
+                f"{self.template.name}: {len(self.items)} items but layout only has "
+                f"{self.template.max_rows} rows"
+            )
+        stream = self.stream
+        if stream is not None:
+            # An override or a stored form makes the streamed header wrong
+            if form or carton_id not in (None, stream.carton_id) or \
+                    date_packed not in (None, stream.date_packed):
+                stream.broken = True
+            if carton_id is None:
+                carton_id = stream.carton_id
+            if date_packed is None:
+                date_packed = stream.date_packed
+        allocated = carton_id is None
+        if allocated:
+            carton_id = self.allocator.allocate()
+        if date_packed is None:
+            date_packed = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        started = metrics.start()
+        data = self.build_job(carton_id, date_packed, self.items, form)
+        if stream is not None and not stream.broken:
+            job = StreamedLabel(
+                stream,
+                self.template.render_tail(carton_id, date_packed),
+                data,
+                item_count=len(self.items),
+                stock=self.template.stock
+            )
+        else:
+            job = PrintJob(
+                carton_id,
+                data,
+                item_count=len(self.items),
+                form=form,
+                stock=self.template.stock
+            )
+        metrics.stop("build", started)
+        # Registered first: the spooler can send the job before submit returns
+        self._queued[id(job)] = (date_packed, list(self.records))
+        for serial in self.items:
+            self._queued_serials[serial] = carton_id
+        if not self.spooler.submit(job, block=block):
+            self._unqueue(job)
+            if allocated:
+                self.allocator.release(carton_id)
+            return None
+        if stream is not None and stream.allocated and carton_id != stream.carton_id:
+            # Override used: the ID taken when the carton opened is not printed
+            self.allocator.release(stream.carton_id)
+
+        if self.ledger is not None:
+            self.ledger.record_print_event(carton_id, "queued")
+        self._reset()
+        return job
+
+    def _unqueue(self, job):
+        """Forget a queued label, returning its (date packed, records)"""
+        date_packed, records = self._queued.pop(id(job), (None, []))
+        for record in records:
+            self._queued_serials.pop(record.serial, None)
+        return date_packed, records
+
+    # Spooler callbacks: record what happened to each label
+
+    def job_sent(self, job):
+        if job.partial:
+            return
+        date_packed, records = self._unqueue(job)
+        if self.serial_index is not None:
+            self.serial_index.add_carton(job.carton_id, [record.serial for record in records])
+        if self.ledger is not None:
+            self.ledger.record_carton(job.carton_id, date_packed, records)
+            self.ledger.record_print_event(job.carton_id, "sent")
+
+    def job_failed(self, job):
+        if job.partial:
+            # The rest of the label goes out whole when the carton closes
+            job.stream.broken = True
+            return
+        # Not packed: its items can be scanned into a new carton
+        self._unqueue(job)
+        if self.ledger is not None:
+            self.ledger.record_print_event(job.carton_id, "failed")
+
+    def job_held(self, job, status):
+        if self.ledger is not None:
+            self.ledger.record_print_event(job.carton_id, "held", status.describe())
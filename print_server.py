@@ -0,0 +1,544 @@
+"""
+Local Print Server
+One process owns the printers; packing stations send it carton scans over
+HTTP (TCP or a Unix socket) instead of opening the COM port themselves.
+
+The server parses the scans, rejects serials already packed, allocates
+the carton ID, renders the label and queues it on a PrinterPool, whose
+per-printer spoolers keep each printer's labels in arrival order. Several
+cartons can be sent in one request. A POST repeated with the same
+request_id (a client retrying after a dropped connection) gets the answer
+to the first one instead of queuing the cartons again.
+
+Endpoints (JSON in and out):
+    POST /jobs        {"scans": [...], "carton_id": opt, "date_packed": opt,
+                       "station": opt}, or {"cartons": [carton, ...]},
+                      with an optional "request_id"
+                      -> job, or {"jobs": [job or {"error": ...}, ...]}
+    GET  /jobs/<id>   -> job: job_id, carton_id, printer, status
+                         ('queued', 'held', 'sent', 'failed'), detail
+    GET  /status      -> depth, printers (per-printer stats)
+
+Example:
+    python print_server.py --port COM7,COM8 --listen 127.0.0.1:8631
+    python print_server.py --port COM7 --unix /tmp/scanprint.sock
+
+    from print_server import PrintClient
+    job = PrintClient("http://127.0.0.1:8631").submit(scans)
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import http.client
+import json
+import socket
+import threading
+import uuid
+from carton_allocator import LOCAL_FILE, SHARED_FILE, CartonIdAllocator
+from label_form import StoredForm
+from label_template import DEFAULT_TEMPLATE, load_template
+from packing_ledger import LEDGER_PATH, PackingLedger
+from packing_station import CartonFullError, DuplicateSerialError, PackingStation, legacy_counter
+from printer_pool import PrinterPool, parse_printers
+from printer_transport import TRANSPORTS, make_address
+from serial_index import INDEX_PATH, PackedSerialIndex
+
+DEFAULT_LISTEN = "127.0.0.1:8631"
+DEFAULT_URL = f"http://{DEFAULT_LISTEN}"
+
+# Finished jobs remembered for GET /jobs/<id>
+MAX_JOBS = 10000
+MAX_BODY = 1 << 20
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+class PrintServerError(Exception):
+    """Request refused by the print server"""
+
+    def __init__(self, status, message):
+        """
+        Args:
+            status: HTTP status (409 duplicate, 503 queue full, ...)
+            message: Reason given by the server
+        """
+        self.status = status
+        super().__init__(message)
+
+
+class PrintServer:
+    """
+    Carton jobs from many stations onto one PrinterPool
+
+    Requests are handled on the asyncio loop; the packing work (parsing,
+    duplicate check, ID allocation, ledger) runs on one worker thread, so
+    cartons are taken strictly in arrival order without blocking the loop.
+    """
+
+    def __init__(self, pool, station, form=None):
+        """
+        Args:
+            pool: PrinterPool created with this server's job callbacks
+                (see on_sent, on_failed, on_held)
+            station: PackingStation on the pool, used for every carton
+            form: StoredForm to print through, or None
+        """
+        self.pool = pool
+        self.station = station
+        self.form = form
+        self.jobs = collections.OrderedDict()
+        self._job_ids = {}
+        self._next_id = 1
+        # Answers to POST /jobs by request_id (asyncio futures, loop only)
+        self._requests = collections.OrderedDict()
+        # Addresses being served ('http://host:port', 'unix://path')
+        self.addresses = []
+        self._lock = threading.Lock()
+        self._worker = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="cartons")
+
+    # Spooler callbacks (spooler threads)
+
+    def on_sent(self, job):
+        self.station.job_sent(job)
+        self._update(job, "sent")
+
+    def on_failed(self, job):
+        self.station.job_failed(job)
+        self._update(job, "failed")
+
+    def on_held(self, job, status):
+        self.station.job_held(job, status)
+        self._update(job, "held", status.describe())
+
+    def _update(self, job, status, detail=None):
+        with self._lock:
+            job_id = self._job_ids.get(id(job))
+            if status in ("sent", "failed"):
+                self._job_ids.pop(id(job), None)
+            record = self.jobs.get(job_id)
+            if record is None:
+                return
+            record["status"] = status
+            record["printer"] = job.printer
+            record["detail"] = detail
+
+    def submit_carton(self, carton):
+        """
+        Pack and queue one carton (worker thread)
+
+        Args:
+            carton: dict with 'scans' and optional 'carton_id',
+                'date_packed' and 'station'
+
+        Returns:
+            dict: Job record
+
+        Raises:
+            PrintServerError: Bad request, duplicate serial or queue full
+        """
+        scans = carton.get("scans")
+        if not isinstance(scans, list) or not scans or not all(isinstance(s, str) for s in scans):
+            raise PrintServerError(400, "'scans' must be a non-empty list of strings")
+        station = self.station
+        try:
+            for scan in scans:
+                station.add_scan(scan)
+            # Held until the job is registered, so a spooler callback for
+            # it cannot run first
+            with self._lock:
+                job = station.close_carton(carton.get("carton_id"), carton.get("date_packed"), self.form)
+                if job is not None:
+                    return self._register(job, carton.get("station"))
+        except DuplicateSerialError as e:
+            station.clear()
+            raise PrintServerError(409, str(e))
+        except (CartonFullError, ValueError) as e:
+            station.clear()
+            raise PrintServerError(400, str(e))
+        station.clear()
+        raise PrintServerError(503, "print queue is full, try again")
+
+    def _register(self, job, station):
+        job_id = self._next_id
+        self._next_id += 1
+        record = {
+            "job_id": job_id,
+            "carton_id": job.carton_id,
+            "printer": job.printer,
+            "items": job.item_count,
+            "station": station,
+            "status": "queued",
+            "detail": None,
+        }
+        self.jobs[job_id] = record
+        self._job_ids[id(job)] = job_id
+        while len(self.jobs) > MAX_JOBS:
+            self.jobs.popitem(last=False)
+        return dict(record)
+
+    def status(self):
+        return {"depth": self.pool.depth(), "printers": self.pool.stats()}
+
+    async def handle(self, method, path, body):
+        """
+        Route one request
+
+        Returns:
+            tuple: (HTTP status, JSON-able payload)
+        """
+        if path == "/status":
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            return 200, self.status()
+        if path.startswith("/jobs/"):
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            try:
+                job_id = int(path[len("/jobs/"):])
+            except ValueError:
+                return 404, {"error": "no such job"}
+            with self._lock:
+                record = self.jobs.get(job_id)
+                record = dict(record) if record else None
+            if record is None:
+                return 404, {"error": "no such job"}
+            return 200, record
+        if path == "/jobs":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            try:
+                request = json.loads(body or b"null")
+            except ValueError:
+                return 400, {"error": "body is not JSON"}
+            if not isinstance(request, dict):
+                return 400, {"error": "expected a JSON object"}
+            request_id = request.get("request_id")
+            if request_id is None:
+                return await self._post_jobs(request)
+            if not isinstance(request_id, str):
+                return 400, {"error": "'request_id' must be a string"}
+            answer = self._requests.get(request_id)
+            if answer is not None:
+                # Retry of a request already taken (or still in progress)
+                return await asyncio.shield(answer)
+            answer = asyncio.get_running_loop().create_future()
+            self._requests[request_id] = answer
+            while len(self._requests) > MAX_JOBS:
+                self._requests.popitem(last=False)
+            result = await self._post_jobs(request)
+            answer.set_result(result)
+            return result
+        return 404, {"error": f"unknown path {path}"}
+
+    async def _post_jobs(self, request):
+        """Queue the carton or cartons of a POST /jobs body"""
+        loop = asyncio.get_running_loop()
+        if "cartons" not in request:
+            try:
+                return 200, await loop.run_in_executor(self._worker, self.submit_carton, request)
+            except PrintServerError as e:
+                return e.status, {"error": str(e)}
+        if not isinstance(request["cartons"], list):
+            return 400, {"error": "'cartons' must be a list"}
+        results = []
+        for carton in request["cartons"]:
+            if not isinstance(carton, dict):
+                results.append({"error": "expected a JSON object", "status_code": 400})
+                continue
+            try:
+                results.append(await loop.run_in_executor(self._worker, self.submit_carton, carton))
+            except PrintServerError as e:
+                results.append({"error": str(e), "status_code": e.status})
+        return 200, {"jobs": results}
+
+    async def serve_client(self, reader, writer):
+        """HTTP/1.1 on one connection, with keep-alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": "request too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.handle(method, path.split("?", 1)[0], body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        data = json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+    async def serve(self, listen=DEFAULT_LISTEN, unix_path=None, ready=None):
+        """
+        Accept clients until cancelled
+
+        Args:
+            listen: 'HOST:PORT' for TCP, or None
+            unix_path: Unix socket path, or None
+            ready: threading.Event set once the sockets are listening
+        """
+        servers = []
+        if listen:
+            host, _, port = listen.rpartition(":")
+            server = await asyncio.start_server(self.serve_client, host or "127.0.0.1", int(port))
+            servers.append(server)
+            # Port 0 picks a free port; report the one actually bound
+            bound_host, bound_port = server.sockets[0].getsockname()[:2]
+            self.addresses.append(f"http://{bound_host}:{bound_port}")
+        if unix_path:
+            servers.append(await asyncio.start_unix_server(self.serve_client, unix_path))
+            self.addresses.append(f"unix://{unix_path}")
+        if ready is not None:
+            ready.set()
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in servers))
+        finally:
+            for server in servers:
+                server.close()
+            self._worker.shutdown(wait=True)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class PrintClient:
+    """
+    Station side of the print server (blocking, thread-safe)
+
+    The connection is kept open between requests and reopened once if the
+    server closed it. A repeated POST carries the first one's request_id,
+    so the server does not queue its cartons twice.
+    """
+
+    def __init__(self, url=DEFAULT_URL, timeout=5):
+        """
+        Args:
+            url: 'http://HOST:PORT' or 'unix:///path/to/socket'
+            timeout: Seconds to wait for the server
+        """
+        self.url = url
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def submit(self, scans, carton_id=None, date_packed=None, station=None):
+        """
+        Queue one carton
+
+        Args:
+            scans: Scanned text of each item, in label order
+            carton_id: Override carton ID (else the server allocates one)
+            date_packed: Override date packed text
+            station: Station name recorded with the job
+
+        Returns:
+            dict: Job record with job_id, carton_id and printer
+
+        Raises:
+            PrintServerError: Refused (duplicate serial, queue full...)
+            OSError: Server unreachable
+        """
+        carton = {"scans": list(scans), "station": station}
+        if carton_id is not None:
+            carton["carton_id"] = carton_id
+        if date_packed is not None:
+            carton["date_packed"] = date_packed
+        carton["request_id"] = uuid.uuid4().hex
+        return self._request("POST", "/jobs", carton)
+
+    def submit_many(self, cartons):
+        """
+        Queue several cartons in one request
+
+        Args:
+            cartons: dicts as taken by submit() ('scans', ...)
+
+        Returns:
+            list: Job record, or {'error', 'status_code'}, per carton
+        """
+        request = {"cartons": list(cartons), "request_id": uuid.uuid4().hex}
+        return self._request("POST", "/jobs", request)["jobs"]
+
+    def job(self, job_id):
+        """Current state of a job"""
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def status(self):
+        """Queue depth and per-printer stats"""
+        return self._request("GET", "/status")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self):
+        if self.url.startswith("unix://"):
+            return _UnixHTTPConnection(self.url[len("unix://"):], self.timeout)
+        address = self.url.split("://", 1)[-1].rstrip("/")
+        return http.client.HTTPConnection(address, timeout=self.timeout)
+
+    def _request(self, method, path, payload=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        with self._lock:
+            for attempt in (1, 2):
+                if self._conn is None:
+                    self._conn = self._connect()
+                try:
+                    self._conn.request(method, path, body=body, headers=headers)
+                    response = self._conn.getresponse()
+                    data = response.read()
+                    break
+                except (http.client.HTTPException, ConnectionError):
+                    # Kept-alive connection closed by the server; retry fresh
+                    self._conn.close()
+                    self._conn = None
+                    # Only GETs and POSTs the server de-duplicates are repeated
+                    if attempt == 2 or not (method == "GET" or "request_id" in (payload or {})):
+                        raise
+                except OSError:
+                    self._conn.close()
+                    self._conn = None
+                    raise
+        result = json.loads(data or b"null")
+        if response.status != 200:
+            raise PrintServerError(response.status, result.get("error", response.reason))
+        return result
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Local print server shared by packing stations")
+    parser.add_argument("--port", default="COM7",
+                        help="printer address, or several comma separated (see scanprint.py)")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="serial",
+                        help="transport for --port addresses given without a prefix")
+    parser.add_argument("--baud", type=int, default=9600, help="printer baud rate")
+    parser.add_argument("--flow-control", choices=("rtscts", "xonxoff"), help="serial flow control")
+    parser.add_argument("--listen", default=DEFAULT_LISTEN,
+                        help="HOST:PORT to accept HTTP on ('' for none)")
+    parser.add_argument("--unix", metavar="PATH", help="also accept HTTP on this Unix socket")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="label template file")
+    parser.add_argument("--stored-form", action="store_true", help="store the layout in printer memory")
+    parser.add_argument("--max-pending", type=int, default=16, help="labels queued per printer")
+    parser.add_argument("--serial-index", default=INDEX_PATH,
+                        help="index of packed serials used to reject duplicates")
+    parser.add_argument("--ledger", default=LEDGER_PATH, help="packing ledger database")
+    parser.add_argument("--station", help="name recorded in the ledger (default: host name)")
+    parser.add_argument("--carton-id-file", default=SHARED_FILE,
+                        help="carton ID allocation file")
+    parser.add_argument("--station-id-file", default=LOCAL_FILE,
+                        help="this server's reserved block of carton IDs")
+    parser.add_argument("--carton-id-block", type=int, default=10,
+                        help="carton IDs reserved per visit to the allocation file")
+    return parser
+
+
+def run(args, ready=None):
+    """
+    Serve until interrupted
+
+    Args:
+        args: Parsed command line arguments
+        ready: threading.Event set once the server is listening
+
+    Returns:
+        int: Process exit code
+    """
+    template = load_template(args.template)
+    printers = parse_printers(args.port)
+    for printer in printers:
+        printer["port"] = make_address(printer["port"], args.transport)
+    serial_index = PackedSerialIndex(args.serial_index)
+    ledger = PackingLedger(args.ledger, station=args.station)
+    allocator = CartonIdAllocator(
+        shared_path=args.carton_id_file,
+        local_path=args.station_id_file,
+        block_size=args.carton_id_block,
+        seed=legacy_counter(ledger)
+    )
+
+    server = None
+    pool = PrinterPool(
+        printers,
+        baudrate=args.baud,
+        flow_control=args.flow_control,
+        max_pending=args.max_pending,
+        on_sent=lambda job: server.on_sent(job),
+        on_failed=lambda job: server.on_failed(job),
+        on_held=lambda job, status: server.on_held(job, status)
+    )
+    station = PackingStation(
+        pool,
+        template=template,
+        items_per_carton=template.max_rows,
+        allocator=allocator,
+        serial_index=serial_index,
+        ledger=ledger
+    )
+    server = PrintServer(pool, station, StoredForm(template) if args.stored_form else None)
+    pool.start()
+    where = ", ".join(filter(None, [args.listen and f"http://{args.listen}", args.unix and f"unix://{args.unix}"]))
+    print(f"Print server on {where}, printers: {', '.join(p['port'] for p in printers)}", flush=True)
+    try:
+        asyncio.run(server.serve(args.listen, args.unix, ready))
+    except KeyboardInterrupt:
+        print("Stopping, finishing queued labels...")
+    finally:
+        pool.stop()
+        pool.close()
+        serial_index.close()
+        ledger.close()
+    return 0
+
+
+def main(argv=None):
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,216 @@
+"""
+Print Spooler Module
+Sends rendered carton labels to the printer from a single background worker
+"""
+
+import queue
+import threading
+import time
+from latency_metrics import metrics
+
+
+class PrintJob:
+    """A rendered carton label waiting to be sent to the printer"""
+
+    # A piece of a label streamed ahead of its PRINT, not a label itself
+    partial = False
+    # Must go to the printer named in .printer (a PrinterPool never moves it)
+    pinned = False
+    # LabelStream the job draws or closes (streamed labels only)
+    stream = None
+
+    def __init__(self, carton_id, data, item_count=0, form=None, stock=None):
+        """
+        Args:
+            carton_id: Carton ID printed on the label
+            data: TSPLJob or bytes buffer for the whole label
+            item_count: Number of scanned items on the label
+            form: StoredForm the data runs, if the layout is stored on the printer
+            stock: Label stock the job needs (e.g. '100x150'), None for any
+        """
+        self.carton_id = carton_id
+        self.data = data
+        self.item_count = item_count
+        self.form = form
+        self.stock = stock
+        # Name of the printer the job was dispatched to (set by PrinterPool)
+        self.printer = None
+        # Carton closed, for the queue and print latency metrics
+        self.created = time.perf_counter()
+
+
+class PrintSpooler:
+    """
+    Bounded FIFO of print jobs drained by one worker thread
+
+    Jobs are sent in the order they were submitted, one at a time, so
+    labels never interleave on the port. Before each job the printer
+    status is checked; while it reports an error (paper out, head open...)
+    or is paused, the job is held at the front of the queue, not dropped.
+    """
+
+    def __init__(self, session, max_pending=8, on_sent=None, on_failed=None,
+                 on_held=None, hold_poll=1.0):
+        """
+        Args:
+            session: PrinterSession used to send jobs
+            max_pending: Maximum number of jobs waiting in the queue
+            on_sent: Callback(job) run after a job was sent
+            on_failed: Callback(job) run after a job could not be sent
+            on_held: Callback(job, status) run when a job is held because
+                the printer is not ready; returning True releases the job
+                (the caller has queued it elsewhere)
+            hold_poll: Seconds between status checks while a job is held
+        """
+        self.session = session
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self.on_held = on_held
+        self.hold_poll = hold_poll
+        self._stopping = threading.Event()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def start(self):
+        """Start the worker thread"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the worker once the jobs already queued have been sent
+
+        A job held for a printer error is left unsent, and so are the jobs
+        queued behind it (take_pending() collects them).
+
+        Args:
+            timeout: Seconds to wait for the worker to finish
+        """
+        if not self._worker:
+            return
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            # The worker stops on _stopping once the queue is empty
+            pass
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            # Still sending; it exits on its own once the queue is empty
+            return
+        self._worker = None
+        self._stopping.clear()
+
+    def submit(self, job, block=False):
+        """
+        Queue a job for printing
+
+        Args:
+            job: PrintJob to send
+            block: Wait for room in the queue instead of failing when full
+
+        Returns:
+            bool: True if the job was queued
+        """
+        with self._lock:
+            self._pending += 1
+        try:
+            self._queue.put(job, block=block)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._pending -= 1
+            return False
+
+    def take_pending(self):
+        """
+        Remove the jobs still waiting in the queue
+
+        The job currently being sent or held is not included.
+
+        Returns:
+            list: PrintJobs in submission order
+        """
+        jobs = []
+        stop = False
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                stop = True
+                continue
+            jobs.append(job)
+        if stop:
+            self._queue.put(None)
+        with self._lock:
+            self._pending -= len(jobs)
+        return jobs
+
+    def depth(self):
+        """Number of jobs queued or currently being sent"""
+        with self._lock:
+            return self._pending
+
+    def _run(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=self.hold_poll)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    break
+                continue
+            if job is None:
+                if self._stopping.is_set():
+                    break
+                # Left over from a stop that ended on a held job
+                continue
+            ready = self._wait_until_ready(job)
+            if ready is None:
+                # Released by on_held; another printer has it now
+                with self._lock:
+                    self._pending -= 1
+                continue
+            if not ready:
+                break
+            if metrics.enabled and not job.partial:
+                metrics.stop("queue", job.created)
+            try:
+                ok = self.session.send_job(job.data, form=job.form)
+            except Exception as e:
+                print(f"Spooler error: {e}")
+                ok = False
+            with self._lock:
+                self._pending -= 1
+            if ok and metrics.enabled and not job.partial:
+                metrics.stop("drained", job.created)
+                metrics.add_label()
+            callback = self.on_sent if ok else self.on_failed
+            if callback:
+                callback(job)
+
+    def _wait_until_ready(self, job):
+        """
+        Hold the job while the printer reports it cannot print
+
+        Returns:
+            bool: True to send, False when stopping, or None if on_held
+            released the job
+        """
+        reported = None
+        while True:
+            status = self.session.status()
+            if status is None or status.ready:
+                return True
+            if self.on_held and status.code != reported:
+                if self.on_held(job, status):
+                    return None
+            if self._stopping.is_set():
+                return False
+            reported = status.code
+            self._stopping.wait(self.hold_poll)
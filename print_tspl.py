@@ -3,8 +3,7 @@ Simple TSPL printing script for TSC TTP-244 Pro
 Using COM7 at 9600 baud, 8N1
 """
 
-from tsc_printer import TSCPrinter
-import time
+from tsc_printer import TSCPrinter, TSPLJob
 
 def print_label():
     """Print a simple label using TSPL commands"""
@@ -20,52 +19,50 @@ def print_label():
     print("\nSending TSPL commands...")
     
     try:
+        job = TSPLJob()
+
         # Clear buffer
-        printer.send_command("CLS")
-        time.sleep(0.1)
+        job.add("CLS")
         
         # Set label size (adjust to your label size)
         # Format: SIZE width_mm, height_mm, gap_mm
-        printer.send_command("SIZE 110 mm, 80 mm, 2 mm")
-        time.sleep(0.1)
+        job.add("SIZE 110 mm, 80 mm, 2 mm")
         
         # Set print speed (0-14, default 4)
-        printer.send_command("SPEED 4")
-        time.sleep(0.1)
+        job.add("SPEED 4")
         
         # Set print density (0-15, default 8)
-        printer.send_command("DENSITY 8")
-        time.sleep(0.1)
+        job.add("DENSITY 8")
         
         # Set direction (0=normal, 1=180° rotated)
-        printer.send_command("DIRECTION 0")
-        time.sleep(0.1)
+        job.add("DIRECTION 0")
         
         # Print text
         # Format: TEXT x, y, "font", rotation, x_mult, y_mult, "text"
         # x, y in dots (203 DPI = ~8 dots/mm)
-        printer.send_command('TEXT 50,50,"3",0,1,1,"Hello World"')
-        time.sleep(0.1)
+        job.add('TEXT 50,50,"3",0,1,1,"Hello World"')
         
         # Print QR code next to "Hello World"
         # Format: QRCODE x, y, error_level, cell_size, rotation, mask, model, "data"
         # error_level: L=Low, M=Medium, Q=Quartile, H=High
         # cell_size: 1-10 (size of each QR code cell)
         # rotation: 0, 90, 180, 270
-        printer.send_command('QRCODE 300,50,M,4,A,0,M2,S3,"Hello World"')
-        time.sleep(0.1)
+        job.add('QRCODE 300,50,M,4,A,0,M2,S3,"Hello World"')
         
-        printer.send_command('TEXT 50,100,"3",0,2,2,"TSC TTP-244 Pro"')
-        time.sleep(0.1)
+        job.add('TEXT 50,100,"3",0,2,2,"TSC TTP-244 Pro"')
         
         # Print barcode (optional)
         # Format: BARCODE x, y, "type", height, readable, rotation, narrow, wide, "data"
-        printer.send_command('BARCODE 50,150,"128",50,"B",0,2,4,"123456789012"')
-        time.sleep(0.1)
+        job.add('BARCODE 50,150,"128",50,"B",0,2,4,"123456789012"')
         
         # Print the label
         # Format: PRINT quantity, copies
-        printer.send_command("PRINT 1,1")
+        job.add("PRINT 1,1")
+
+        # Whole label goes out in one write
+        if not printer.send_job(job):
+            print("Failed to send label")
+            return
         
         print("Print command sent!")
         print("\nThe label should print now.")
@@ -88,13 +85,12 @@ def print_simple_text(text):
         return
     
     try:
-        printer.send_command("CLS")
-        time.sleep(0.1)
-        printer.send_command("SIZE 110 mm, 80 mm, 2 mm")
-        time.sleep(0.1)
-        printer.send_command('TEXT 50,50,"3",0,2,2,"' + text + '"')
-        time.sleep(0.1)
-        printer.send_command("PRINT 1,1")
+        printer.send_job([
+            "CLS",
+            "SIZE 110 mm, 80 mm, 2 mm",
+            'TEXT 50,50,"3",0,2,2,"' + text + '"',
+            "PRINT 1,1",
+        ])
     finally:
         printer.disconnect()
 
@@ -0,0 +1,174 @@
+"""
+Printer Discovery Module
+Finds the serial port a TSC printer is attached to
+
+Every serial port on the machine is probed in parallel: the port is
+opened and asked for its TSPL status (<ESC>!?) at each supported baud
+rate with a short timeout. Only a port that answers counts as a printer,
+so a scanner or modem that merely opens is not mistaken for one.
+
+The last port and rate that answered are kept in the station config, so
+a normal start checks that one port and is done; the full scan only runs
+when the printer has moved.
+
+Example:
+    from printer_discovery import find_printer
+    found = find_printer()
+    if found:
+        print(found.port, found.baudrate)
+"""
+
+import concurrent.futures
+from station_config import CONFIG_FILE, load_config, save_config
+from tsc_printer import TSCPrinter
+
+# Seconds to wait for a status reply at each rate
+PROBE_TIMEOUT = 0.3
+
+# Ports probed at once
+PROBE_WORKERS = 8
+
+
+class ProbeResult:
+    """A port where a TSC printer answered"""
+
+    __slots__ = ("port", "baudrate", "status")
+
+    def __init__(self, port, baudrate, status):
+        """
+        Args:
+            port: Serial port
+            baudrate: Rate the printer answered at
+            status: PrinterStatus it returned
+        """
+        self.port = port
+        self.baudrate = baudrate
+        self.status = status
+
+    def __repr__(self):
+        return f"ProbeResult({self.port!r}, {self.baudrate}, {self.status.describe()!r})"
+
+
+def list_serial_ports():
+    """
+    Serial ports present on this machine
+
+    Returns:
+        list: Device names (e.g. 'COM7', '/dev/ttyUSB0'), USB adapters first
+    """
+    from serial.tools import list_ports
+
+    ports = list_ports.comports()
+    # USB-serial adapters are where printers usually sit; built-in ports last
+    ports.sort(key=lambda p: (p.vid is None, p.device))
+    return [p.device for p in ports]
+
+
+def probe(port, rates=None, timeout=PROBE_TIMEOUT):
+    """
+    Ask port whether a TSC printer is listening
+
+    The port is opened exclusively, so a port another program (or this
+    one's own printer session) holds is skipped rather than disturbed.
+
+    Args:
+        port: Serial port to open
+        rates: Baud rates to try in order (default: TSCPrinter.BAUDRATE_CODES)
+        timeout: Seconds to wait for a reply at each rate
+
+    Returns:
+        ProbeResult, or None if nothing answered (or the port is busy)
+    """
+    rates = list(rates or TSCPrinter.BAUDRATE_CODES)
+    printer = TSCPrinter(
+        port=port,
+        baudrate=rates[0],
+        timeout=timeout,
+        init_delay=0,
+        status_timeout=timeout,
+        exclusive=True
+    )
+    try:
+        if not printer.connect():
+            return None
+        rate = printer.probe_baudrate(rates)
+        if rate is None:
+            return None
+        status = printer.status()
+        if status is None:
+            return None
+        return ProbeResult(port, rate, status)
+    except Exception as e:
+        print(f"Probe error on {port}: {e}")
+        return None
+    finally:
+        printer.disconnect()
+
+
+def discover(ports=None, rates=None, timeout=PROBE_TIMEOUT, exclude=(), workers=PROBE_WORKERS):
+    """
+    Probe ports in parallel
+
+    Args:
+        ports: Ports to try (default: list_serial_ports())
+        rates: Baud rates to try on each port
+        timeout: Reply timeout per rate
+        exclude: Ports never to touch (e.g. the scanners' ports)
+        workers: Ports probed at once
+
+    Returns:
+        list: ProbeResult for every port that answered, in port order
+    """
+    if ports is None:
+        ports = list_serial_ports()
+    ports = [port for port in ports if port not in set(exclude)]
+    if not ports:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(workers, len(ports)), thread_name_prefix="probe"
+    ) as executor:
+        results = executor.map(lambda port: probe(port, rates, timeout), ports)
+        return [result for result in results if result]
+
+
+def find_printer(rates=None, timeout=PROBE_TIMEOUT, exclude=(), full_scan=True, config_path=CONFIG_FILE):
+    """
+    Locate the printer, trying the last known good port first
+
+    Args:
+        rates: Baud rates to try when scanning
+        timeout: Reply timeout per rate
+        exclude: Ports never to touch
+        full_scan: Scan all ports if the saved one does not answer
+        config_path: Station config holding the last good port
+
+    Returns:
+        ProbeResult, or None if no printer answered
+    """
+    config = load_config(config_path)
+    cached = config.get("last_good_port")
+    if cached and cached not in exclude:
+        # Saved rate first, so a normal start is a single status query
+        cached_rates = [config.get("last_good_baudrate")] + list(rates or TSCPrinter.BAUDRATE_CODES)
+        found = probe(cached, [rate for rate in dict.fromkeys(cached_rates) if rate], timeout)
+        if found:
+            remember(found, config_path)
+            return found
+        print(f"No printer on last known port {cached}")
+    if not full_scan:
+        return None
+    skip = set(exclude)
+    if cached:
+        skip.add(cached)
+    found = discover(rates=rates, timeout=timeout, exclude=skip)
+    if not found:
+        return None
+    remember(found[0], config_path)
+    return found[0]
+
+
+def remember(result, config_path=CONFIG_FILE):
+    """Save result as the last known good port and rate"""
+    config = load_config(config_path)
+    if (config.get("last_good_port"), config.get("last_good_baudrate")) != (result.port, result.baudrate):
+        save_config({"last_good_port": result.port, "last_good_baudrate": result.baudrate}, config_path)
@@ -0,0 +1,392 @@
+"""
+Printer Pool Module
+Spreads carton labels over several printers and fails over between them
+"""
+
+import threading
+from printer_session import PrinterSession
+from print_spooler import PrintSpooler
+
+
+def parse_printers(text):
+    """
+    Parse a comma separated printer list, e.g. 'COM7,COM8=100x150'
+
+    Each entry is a port, optionally followed by '=' and the label stock
+    loaded in that printer.
+
+    Returns:
+        list: Printer dicts for PrinterPool.configure
+    """
+    printers = []
+    for entry in text.split(","):
+        port, _, stock = entry.strip().partition("=")
+        if port.strip():
+            printers.append({"port": port.strip(), "stock": stock.strip() or None})
+    return printers
+
+
+def format_printers(printers):
+    """Inverse of parse_printers"""
+    return ",".join(
+        f"{p['port']}={p['stock']}" if p.get("stock") else p["port"] for p in printers
+    )
+
+
+class PoolPrinter:
+    """One printer in a pool: its session, spooler and health"""
+
+    def __init__(self, name, session, spooler, stock=None):
+        """
+        Args:
+            name: Name shown in logs (defaults to the port)
+            session: PrinterSession for this printer
+            spooler: PrintSpooler feeding this printer
+            stock: Label stock loaded (e.g. '100x150'), None for any
+        """
+        self.name = name
+        self.session = session
+        self.spooler = spooler
+        self.stock = stock
+        self.healthy = True
+        self.problem = None
+        self.sent = 0
+        self.failed = 0
+        # Link speed after the last job, read without taking the session lock
+        self.rate = 0.0
+        # LabelStream half drawn on this printer, until its closing job is queued
+        self.stream = None
+
+    def streaming_other(self, job):
+        """True if another label is being streamed to this printer"""
+        stream = self.stream
+        return stream is not None and not stream.broken and stream is not job.stream
+
+    def accepts(self, job):
+        """True if the job's label stock matches this printer"""
+        return job.stock is None or self.stock is None or job.stock == self.stock
+
+    def stats(self):
+        """
+        Snapshot for the per-printer view
+
+        Returns:
+            dict: name, port, stock, healthy, problem, depth, sent, failed
+            and rate (bytes per second measured by the last job)
+        """
+        return {
+            "name": self.name,
+            "port": self.session.port,
+            "stock": self.stock,
+            "healthy": self.healthy,
+            "problem": self.problem,
+            "depth": self.spooler.depth(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "rate": self.rate,
+        }
+
+
+class PrinterPool:
+    """
+    Several printers behind the PrintSpooler interface
+
+    Each printer has its own session and spooler, so labels on one printer
+    never wait for another. A submitted job goes to the healthy printer with
+    the fewest labels waiting. A printer that fails a write, or reports an
+    error while holding a job, is marked down: its job and queue move to the
+    other printers, and it rejoins once a background check finds it ready.
+    With no healthy printer left, jobs wait on the least busy one as they
+    would with a single spooler.
+    """
+
+    def __init__(self, printers=(), baudrate=9600, flow_control=None, max_pending=8,
+                 on_sent=None, on_failed=None, on_held=None, hold_poll=1.0, recheck=5.0,
+                 log=print):
+        """
+        Args:
+            printers: Port names or dicts with 'port' and optional 'name',
+                'stock', 'baudrate' and 'flow_control'
+            baudrate: Default communication speed
+            flow_control: Default flow control (None, 'rtscts' or 'xonxoff')
+            max_pending: Queue length of each printer's spooler
+            on_sent: Callback(job) run after a job was sent
+            on_failed: Callback(job) run when no printer could send a job
+            on_held: Callback(job, status) run when a job waits for a printer
+                error and there is nowhere else to send it
+            hold_poll: Seconds between status checks while a job is held
+            recheck: Seconds between health checks of printers marked down
+            log: Callback(message) for failover and recovery messages; it
+                runs on spooler and monitor threads
+        """
+        self.baudrate = baudrate
+        self.flow_control = flow_control
+        self.max_pending = max_pending
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self.on_held = on_held
+        self.hold_poll = hold_poll
+        self.recheck = recheck
+        self.log = log
+        self.printers = []
+        # Printers each job has already failed on, by job id
+        self._tried = {}
+        self._lock = threading.RLock()
+        self._running = False
+        self._stopping = threading.Event()
+        self._monitor = None
+        self.configure(printers, baudrate, flow_control)
+
+    @property
+    def session(self):
+        """Session of the first printer, for single-printer tools"""
+        with self._lock:
+            return self.printers[0].session if self.printers else None
+
+    def configure(self, printers, baudrate=None, flow_control=None):
+        """
+        Set the printers in the pool
+
+        Printers already in the pool keep their connection (reconfigured if
+        the settings changed). Jobs waiting on a removed printer move to the
+        remaining ones.
+
+        Args:
+            printers: Port names or printer dicts (see __init__)
+            baudrate: Default communication speed (unchanged if None)
+            flow_control: Default flow control
+        """
+        if baudrate is not None:
+            self.baudrate = baudrate
+        self.flow_control = flow_control
+        specs = [{"port": p} if isinstance(p, str) else dict(p) for p in printers]
+
+        with self._lock:
+            current = {member.session.port: member for member in self.printers}
+            members = []
+            for spec in specs:
+                port = spec["port"]
+                rate = spec.get("baudrate", self.baudrate)
+                flow = spec.get("flow_control", self.flow_control)
+                member = current.pop(port, None)
+                if member is None:
+                    member = self._create(port, rate, flow)
+                else:
+                    member.session.configure(port, rate, flow)
+                member.name = spec.get("name") or port
+                member.stock = spec.get("stock")
+                members.append(member)
+            self.printers = members
+            removed = list(current.values())
+
+        for member in removed:
+            for job in member.spooler.take_pending():
+                self._requeue(job)
+            member.spooler.stop(timeout=5)
+            member.session.close()
+
+    def _create(self, port, baudrate, flow_control):
+        session = PrinterSession(port=port, baudrate=baudrate, flow_control=flow_control)
+        member = PoolPrinter(port, session, None)
+        member.spooler = PrintSpooler(
+            session,
+            max_pending=self.max_pending,
+            on_sent=lambda job: self._job_sent(member, job),
+            on_failed=lambda job: self._job_failed(member, job),
+            on_held=lambda job, status: self._job_held(member, job, status),
+            hold_poll=self.hold_poll
+        )
+        if self._running:
+            member.spooler.start()
+        return member
+
+    def start(self):
+        """Start every printer's spooler and the health check"""
+        with self._lock:
+            self._running = True
+            for member in self.printers:
+                member.spooler.start()
+        if not self._monitor or not self._monitor.is_alive():
+            self._stopping.clear()
+            self._monitor = threading.Thread(target=self._check_health, daemon=True)
+            self._monitor.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop all spoolers once their queued jobs have been sent
+
+        Args:
+            timeout: Seconds to wait for each spooler
+        """
+        self._stopping.set()
+        with self._lock:
+            self._running = False
+            members = list(self.printers)
+        # Jobs can move to a printer that has already stopped, so stop again
+        # until none are left stranded in a queue
+        for _ in range(len(members) + 1):
+            for member in members:
+                member.spooler.stop(timeout)
+            stranded = [job for member in members for job in member.spooler.take_pending()]
+            if not stranded:
+                break
+            for member in members:
+                member.spooler.start()
+            for job in stranded:
+                if not self.submit(job, block=True):
+                    self._finish(job, self.on_failed)
+        if self._monitor:
+            self._monitor.join(timeout)
+            self._monitor = None
+
+    def close(self):
+        """Close every printer connection"""
+        with self._lock:
+            for member in self.printers:
+                member.session.close()
+
+    def submit(self, job, block=False):
+        """
+        Queue a job on the least busy printer that can take it
+
+        A pinned job that already names its printer only goes to that one.
+
+        Args:
+            job: PrintJob to send
+            block: Wait for room on the chosen printer when all are full
+
+        Returns:
+            bool: True if the job was queued
+        """
+        if job.pinned and job.printer is not None:
+            member = self.printer(job.printer)
+            return member is not None and self._submit_to(member, job, block)
+        candidates = self._candidates(job)
+        if not candidates:
+            return False
+        for member in candidates:
+            if self._submit_to(member, job, block=False):
+                return True
+        return block and self._submit_to(candidates[0], job, block=True)
+
+    def depth(self):
+        """Number of jobs queued or being sent on all printers"""
+        with self._lock:
+            return sum(member.spooler.depth() for member in self.printers)
+
+    def printer(self, name):
+        """PoolPrinter with the given name, or None"""
+        with self._lock:
+            for member in self.printers:
+                if member.name == name:
+                    return member
+        return None
+
+    def stats(self):
+        """
+        Per-printer throughput and queue view
+
+        Returns:
+            list: PoolPrinter.stats() dict for each printer
+        """
+        with self._lock:
+            members = list(self.printers)
+        return [member.stats() for member in members]
+
+    def _candidates(self, job, exclude=()):
+        """Printers that can take the job, best first"""
+        with self._lock:
+            members = [m for m in self.printers if m.accepts(job) and m.name not in exclude]
+        healthy = [m for m in members if m.healthy]
+        pool = healthy or members
+        # Printers not in the middle of a streamed label, then fewest labels
+        # waiting, then fastest link
+        return sorted(pool, key=lambda m: (m.streaming_other(job), m.spooler.depth(), -m.rate))
+
+    def _submit_to(self, member, job, block):
+        job.printer = member.name
+        if not member.spooler.submit(job, block=block):
+            return False
+        with self._lock:
+            if member.streaming_other(job):
+                # This label's CLS wipes the half-drawn one; that carton's
+                # label is sent whole when it closes
+                member.stream.broken = True
+            member.stream = job.stream if job.partial else None
+        return True
+
+    def _reroute(self, job, exclude):
+        """Queue a job on another healthy printer; False if there is none"""
+        if job.pinned:
+            return False
+        for member in self._candidates(job, exclude):
+            if member.healthy and self._submit_to(member, job, block=False):
+                return True
+        return False
+
+    def _requeue(self, job):
+        """Move a job off a removed printer, failing it if nothing can take it"""
+        if not self.submit(job):
+            self._finish(job, self.on_failed)
+
+    def _mark_down(self, member, problem):
+        with self._lock:
+            member.healthy = False
+            member.problem = problem
+
+    def _finish(self, job, callback, *args):
+        self._tried.pop(id(job), None)
+        if callback:
+            callback(job, *args)
+
+    def _job_sent(self, member, job):
+        rate, _, _ = member.session.throughput()
+        with self._lock:
+            member.sent += 1
+            member.rate = rate
+            member.healthy = True
+            member.problem = None
+        self._finish(job, self.on_sent)
+
+    def _job_failed(self, member, job):
+        with self._lock:
+            member.failed += 1
+        self._mark_down(member, "write failed")
+        tried = self._tried.setdefault(id(job), set())
+        tried.add(member.name)
+        if self._reroute(job, tried):
+            self.log(f"Printer {member.name} failed, carton {job.carton_id} moved to {job.printer}")
+            return
+        self._finish(job, self.on_failed)
+
+    def _job_held(self, member, job, status):
+        self._mark_down(member, status.describe())
+        if self._reroute(job, {member.name}):
+            self.log(f"Printer {member.name} {status.describe()}, carton {job.carton_id} moved to {job.printer}")
+            # Send the rest of this printer's queue elsewhere too
+            for queued in member.spooler.take_pending():
+                if not self._reroute(queued, {member.name}) and \
+                        not self._submit_to(member, queued, block=False):
+                    self._finish(queued, self.on_failed)
+            return True
+        if self.on_held:
+            self.on_held(job, status)
+        return False
+
+    def _check_health(self):
+        """Bring printers marked down back once they answer ready"""
+        while not self._stopping.wait(self.recheck):
+            with self._lock:
+                down = [m for m in self.printers if not m.healthy]
+            for member in down:
+                # A busy spooler is already probing this printer itself
+                if member.spooler.depth():
+                    continue
+                if not member.session.ensure_connected():
+                    continue
+                status = member.session.status()
+                if status is None or status.ready:
+                    with self._lock:
+                        member.healthy = True
+                        member.problem = None
+                    self.log(f"Printer {member.name} is back")
@@ -0,0 +1,211 @@
+"""
+Printer Session Module
+Keeps one printer connection open for the lifetime of the application
+"""
+
+import threading
+import time
+from tsc_printer import TSCPrinter
+
+# Unanswered status queries in a row before the printer is taken not to
+# answer them, and seconds until it is asked again after that
+STATUS_MISS_LIMIT = 3
+STATUS_RETRY = 30.0
+
+
+class PrinterSession:
+    """
+    Long-lived connection to a TSC printer shared by all print paths
+
+    The port is opened on first use and kept open between jobs. It is
+    only closed and reopened after a failed write or a settings change.
+    """
+
+    def __init__(self, port="COM7", baudrate=9600, timeout=2, flow_control=None):
+        """
+        Args:
+            port: Printer address: serial port (e.g., 'COM7' on Windows),
+                'tcp://host[:9100]' or 'file://path'
+            baudrate: Communication speed
+            timeout: Serial timeout in seconds
+            flow_control: None, 'rtscts' or 'xonxoff'
+        """
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.flow_control = flow_control
+        self.printer = None
+        # None until the first status query shows whether the printer
+        # answers, False after STATUS_MISS_LIMIT misses in a row
+        self.status_supported = None
+        self._status_misses = 0
+        self._status_retry_at = 0.0
+        # File name of the stored form known to be on the printer
+        self.loaded_form = None
+        self._lock = threading.RLock()
+
+    def configure(self, port, baudrate, flow_control=None):
+        """
+        Update port settings, closing the current connection if they changed
+
+        Args:
+            port: Printer address
+            baudrate: Communication speed
+            flow_control: None, 'rtscts' or 'xonxoff'
+        """
+        with self._lock:
+            if (port, baudrate, flow_control) == (self.port, self.baudrate, self.flow_control):
+                return
+            self._drop()
+            self.port = port
+            self.baudrate = baudrate
+            self.flow_control = flow_control
+
+    def ensure_connected(self):
+        """
+        Open the port if it is not already open
+
+        Returns:
+            bool: True if the printer is connected
+        """
+        with self._lock:
+            if self.printer and self.printer.is_connected():
+                return True
+            self._drop()
+            printer = TSCPrinter(
+                port=self.port,
+                baudrate=self.baudrate,
+                timeout=self.timeout,
+                flow_control=self.flow_control
+            )
+            if not printer.connect():
+                return False
+            self.printer = printer
+            return True
+
+    def send_job(self, job, form=None):
+        """
+        Send a TSPL job over the shared connection
+
+        A failed write drops the connection so the next job reconnects.
+
+        Args:
+            job: TSPLJob, bytes buffer, or iterable of TSPL command strings
+            form: StoredForm the job runs, uploaded first if needed
+
+        Returns:
+            bool: True if the job was sent
+        """
+        with self._lock:
+            if not self.ensure_connected():
+                return False
+            if form and not self.load_form(form):
+                return False
+            if self.printer.send_job(job):
+                return True
+            self._drop()
+            return False
+
+    def load_form(self, form):
+        """
+        Make sure the printer holds the given stored form
+
+        The check runs once per connection and again when the form changes.
+
+        Args:
+            form: StoredForm
+
+        Returns:
+            bool: True if the form is loaded
+        """
+        with self._lock:
+            if not self.ensure_connected():
+                return False
+            if self.loaded_form == form.filename:
+                return True
+            if not form.ensure_loaded(self.printer):
+                self._drop()
+                return False
+            self.loaded_form = form.filename
+            return True
+
+    def negotiate_baudrate(self):
+        """
+        Switch the link to the fastest rate the printer supports
+
+        Returns:
+            int: Rate in use afterwards, or None if the printer never answered
+        """
+        with self._lock:
+            if not self.ensure_connected():
+                return None
+            rate = self.printer.negotiate_baudrate()
+            if rate is not None:
+                self.baudrate = rate
+            return rate
+
+    def throughput(self):
+        """
+        Measured link speed of the current connection
+
+        Returns:
+            tuple: (bytes per second over all jobs, last job bytes, last job seconds)
+        """
+        with self._lock:
+            if not self.printer:
+                return 0.0, 0, 0.0
+            return self.printer.throughput(), self.printer.last_job_bytes, self.printer.last_job_seconds
+
+    def status(self, force=False):
+        """
+        Query printer status over the shared connection
+
+        A printer that misses STATUS_MISS_LIMIT queries in a row is taken
+        not to answer them, so jobs do not wait for a reply that will not
+        come; it is asked again every STATUS_RETRY seconds, and any reply
+        clears that.
+
+        Args:
+            force: Ask even if the printer is taken not to answer (e.g. a
+                connection test after the printer was switched on)
+
+        Returns:
+            PrinterStatus, or None if unavailable
+        """
+        with self._lock:
+            if self.status_supported is False and not force and \
+                    time.monotonic() < self._status_retry_at:
+                return None
+            if not self.ensure_connected():
+                return None
+            status = self.printer.status()
+            if status is not None:
+                self.status_supported = True
+                self._status_misses = 0
+            else:
+                self._status_misses += 1
+                if self._status_misses >= STATUS_MISS_LIMIT:
+                    self.status_supported = False
+                    self._status_retry_at = time.monotonic() + STATUS_RETRY
+            return status
+
+    def is_connected(self):
+        """Check if the session currently holds an open port"""
+        with self._lock:
+            return bool(self.printer and self.printer.is_connected())
+
+    def close(self):
+        """Close the printer connection"""
+        with self._lock:
+            self._drop()
+
+    def _drop(self):
+        if self.printer:
+            try:
+                self.printer.disconnect()
+            except Exception as e:
+                print(f"Disconnect error: {e}")
+            self.printer = None
+        self.status_supported = None
+        self._status_misses = 0
+        self.loaded_form = None
@@ -0,0 +1,388 @@
+"""
+Printer Transport Module
+Byte links a TSCPrinter can talk TSPL over: serial port, raw TCP (port 9100)
+or a file/spool sink
+
+A printer address picks the transport:
+    COM7, /dev/ttyUSB0           serial port
+    tcp://192.168.1.50[:9100]    raw TSPL over TCP
+    file://labels.prn            append every job to one file
+    file://spool/                write each job to its own file in a directory
+"""
+
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+
+import serial
+
+RAW_TCP_PORT = 9100
+TRANSPORTS = ("serial", "tcp", "file")
+
+
+def split_address(address, default="serial"):
+    """
+    Split a printer address into (transport, target)
+
+    Args:
+        address: Printer address, with or without a 'tcp://' / 'file://' prefix
+        default: Transport used when the address has no prefix
+
+    Returns:
+        tuple: (transport name, address without the prefix)
+    """
+    scheme, sep, rest = address.partition("://")
+    if sep and scheme.lower() in TRANSPORTS:
+        return scheme.lower(), rest
+    return default, address
+
+
+def make_address(target, transport="serial"):
+    """Add the transport prefix to a bare address (serial ports stay bare)"""
+    if transport == "serial" or "://" in target:
+        return target
+    return f"{transport}://{target}"
+
+
+def open_transport(address, baudrate=9600, timeout=2, flow_control=None, exclusive=False):
+    """
+    Create and open the transport for a printer address
+
+    Args:
+        exclusive: Refuse a serial port another process holds open
+            (for probing ports that may be in use)
+
+    Raises:
+        OSError / serial.SerialException: if the link cannot be opened
+    """
+    kind, target = split_address(address)
+    if kind == "tcp":
+        host, _, port = target.rpartition(":")
+        if not host or not port.isdigit():
+            host, port = target, RAW_TCP_PORT
+        transport = TcpTransport(host, int(port), timeout=timeout)
+    elif kind == "file":
+        transport = FileTransport(target)
+    else:
+        transport = SerialTransport(
+            target, baudrate, timeout=timeout, flow_control=flow_control, exclusive=exclusive
+        )
+    transport.open()
+    return transport
+
+
+class Transport(ABC):
+    """
+    Byte link to a printer
+
+    Subclasses must provide open/close/is_open/write and override read and
+    the rest as needed; the defaults here describe a write-only link that
+    never answers queries.
+    """
+
+    # Seconds the printer needs after the link opens
+    settle_time = 0.0
+    # Whether the link speed can be changed (serial only)
+    supports_baudrate = False
+    # Whether the printer can reply to status and file list queries
+    answers_queries = True
+
+    @abstractmethod
+    def open(self):
+        """Open the link"""
+
+    @abstractmethod
+    def close(self):
+        """Close the link (no-op if already closed)"""
+
+    @property
+    @abstractmethod
+    def is_open(self):
+        """True while the link is open"""
+
+    @abstractmethod
+    def write(self, data):
+        """Send bytes to the printer"""
+
+    def flush(self):
+        """Push buffered bytes towards the printer"""
+
+    def drain(self, timeout):
+        """
+        Wait until all written bytes have left this machine
+
+        Returns:
+            bool: False if they were still queued after timeout seconds
+        """
+        return True
+
+    def reset_input(self):
+        """Discard unread reply bytes"""
+
+    def read(self, size, timeout):
+        """Read up to size reply bytes (empty if the printer does not answer)"""
+        return b''
+
+    def read_until(self, terminator, timeout):
+        """Read reply bytes up to and including terminator"""
+        return b''
+
+    def set_baudrate(self, rate):
+        """Change the link speed; only called when supports_baudrate is True"""
+
+
+class SerialTransport(Transport):
+    """RS-232 / USB-serial link via pyserial"""
+
+    settle_time = 0.5
+    supports_baudrate = True
+
+    def __init__(self, port, baudrate=9600, timeout=2, flow_control=None, exclusive=False):
+        """
+        Args:
+            port: Serial port (e.g., 'COM7' on Windows)
+            baudrate: Communication speed
+            timeout: Serial timeout in seconds
+            flow_control: None, 'rtscts' (hardware) or 'xonxoff' (software)
+            exclusive: Lock the port against other openers (POSIX; Windows
+                ports are always exclusive)
+        """
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.flow_control = flow_control
+        self.exclusive = exclusive
+        self.conn = None
+
+    def open(self):
+        self.conn = serial.Serial(
+            port=self.port,
+            baudrate=self.baudrate,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            timeout=self.timeout,
+            rtscts=self.flow_control == 'rtscts',
+            xonxoff=self.flow_control == 'xonxoff',
+            exclusive=True if self.exclusive else None
+        )
+
+    def close(self):
+        if self.conn and self.conn.is_open:
+            self.conn.close()
+
+    @property
+    def is_open(self):
+        return bool(self.conn and self.conn.is_open)
+
+    def write(self, data):
+        self.conn.write(data)
+
+    def flush(self):
+        self.conn.flush()
+
+    def drain(self, timeout):
+        deadline = time.monotonic() + timeout
+        while self.conn.out_waiting:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def reset_input(self):
+        self.conn.reset_input_buffer()
+
+    def read(self, size, timeout):
+        self.conn.timeout = timeout
+        try:
+            return self.conn.read(size)
+        finally:
+            self.conn.timeout = self.timeout
+
+    def read_until(self, terminator, timeout):
+        self.conn.timeout = timeout
+        try:
+            return self.conn.read_until(terminator)
+        finally:
+            self.conn.timeout = self.timeout
+
+    def set_baudrate(self, rate):
+        self.conn.baudrate = rate
+        self.baudrate = rate
+
+
+class TcpTransport(Transport):
+    """
+    Raw TSPL over TCP, as accepted by TSC Ethernet interfaces on port 9100
+
+    The socket stays open between jobs with TCP keep-alive enabled. If the
+    printer dropped an idle connection, the next write reconnects before
+    sending. A write that fails partway is never resent: the printer may
+    already have printed part of it, so the error goes to the caller.
+    """
+
+    def __init__(self, host, port=RAW_TCP_PORT, timeout=2, keepalive_idle=30):
+        """
+        Args:
+            host: Printer host name or IP address
+            port: TCP port (9100 for raw printing)
+            timeout: Connect / send timeout in seconds
+            keepalive_idle: Idle seconds before keep-alive probes start
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.keepalive_idle = keepalive_idle
+        self.sock = None
+
+    def open(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle)
+        self.sock = sock
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+    @property
+    def is_open(self):
+        return self.sock is not None
+
+    def write(self, data):
+        if self.sock is None or self._peer_closed():
+            self.close()
+            self.open()
+        try:
+            self.sock.sendall(data)
+        except OSError:
+            # Unknown how much arrived; reconnect on the next write only
+            self.close()
+            raise
+
+    def _peer_closed(self):
+        """True if the printer has closed its end of an idle connection"""
+        self.sock.setblocking(False)
+        try:
+            return self.sock.recv(1, socket.MSG_PEEK) == b''
+        except (BlockingIOError, InterruptedError):
+            return False
+        except OSError:
+            return True
+        finally:
+            self.sock.settimeout(self.timeout)
+
+    def reset_input(self):
+        if self.sock is None:
+            return
+        self.sock.setblocking(False)
+        try:
+            while self.sock.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        finally:
+            self.sock.settimeout(self.timeout)
+
+    def read(self, size, timeout):
+        return self._read(timeout, lambda data: len(data) >= size)[:size]
+
+    def read_until(self, terminator, timeout):
+        data = self._read(timeout, lambda data: terminator in data)
+        end = data.find(terminator)
+        return data if end < 0 else data[:end + len(terminator)]
+
+    def _read(self, timeout, complete):
+        data = b''
+        deadline = time.monotonic() + timeout
+        try:
+            while self.sock is not None and not complete(data):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.sock.settimeout(remaining)
+                chunk = self.sock.recv(4096)
+                if not chunk:
+                    # Printer closed the connection; reopen on next use
+                    self.close()
+                    break
+                data += chunk
+        except socket.timeout:
+            pass
+        finally:
+            if self.sock:
+                self.sock.settimeout(self.timeout)
+        return data
+
+
+class FileTransport(Transport):
+    """
+    Writes jobs to disk instead of a printer
+
+    A path ending in a separator (or an existing directory) is a spool
+    directory: each job goes to its own numbered .prn file, written to a
+    temporary name and renamed when complete. Any other path is a file that
+    every job is appended to. Status queries are never answered.
+    """
+
+    answers_queries = False
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Output file, or spool directory
+        """
+        self.path = path
+        self.spool = path.endswith(("/", os.sep)) or os.path.isdir(path)
+        self._file = None
+        self._open = False
+        self._buffer = bytearray()
+        self._count = 0
+
+    def open(self):
+        if self.spool:
+            os.makedirs(self.path, exist_ok=True)
+        else:
+            self._file = open(self.path, "ab")
+        self._open = True
+
+    def close(self):
+        if not self._open:
+            return
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._open = False
+
+    @property
+    def is_open(self):
+        return self._open
+
+    def write(self, data):
+        if self.spool:
+            self._buffer += data
+        else:
+            self._file.write(data)
+
+    def flush(self):
+        if not self.spool:
+            if self._file:
+                self._file.flush()
+            return
+        if not self._buffer:
+            return
+        # One file per flushed job, named so the spool sorts in print order
+        self._count += 1
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._count:06d}.prn"
+        target = os.path.join(self.path, name)
+        with open(target + ".tmp", "wb") as f:
+            f.write(self._buffer)
+        os.replace(target + ".tmp", target)
+        self._buffer.clear()
@@ -0,0 +1,237 @@
+"""
+Scanner Input Module
+Reads serial / USB-CDC barcode scanners directly in background threads, and
+separates keyboard-wedge scans from typing by keystroke timing
+"""
+
+import queue
+import threading
+import time
+import serial
+
+# Keyboard-wedge defaults: scanners type a character every few ms, people
+# take 80 ms or more between keys
+WEDGE_MAX_GAP = 0.04
+WEDGE_MIN_LENGTH = 6
+WEDGE_TERMINATORS = "\r\n\t"
+
+
+class SerialScannerReader:
+    """
+    Reads one serial-attached scanner and queues each complete scan
+
+    Scans are framed on CR and/or LF. Complete scans are put on a shared
+    queue as (scanner name, text) so several scanners can feed one app.
+    The port is reopened automatically if the scanner is unplugged.
+    """
+
+    def __init__(self, port, scans, baudrate=9600, name=None, max_length=4096, retry_delay=2.0):
+        """
+        Args:
+            port: Scanner serial port (e.g., 'COM5' or '/dev/ttyACM0')
+            scans: queue.Queue receiving (name, scan) tuples
+            baudrate: Scanner baud rate (ignored by most USB-CDC scanners)
+            name: Label for scans from this scanner (defaults to the port)
+            max_length: Longest scan kept; longer runs without a terminator are dropped
+            retry_delay: Seconds between attempts to reopen the port
+        """
+        self.port = port
+        self.scans = scans
+        self.baudrate = baudrate
+        self.name = name or port
+        self.max_length = max_length
+        self.retry_delay = retry_delay
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+
+    def start(self):
+        """Start the reader thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        """Stop the reader thread and close the port"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._conn = serial.Serial(port=self.port, baudrate=self.baudrate, timeout=0.2)
+            except Exception as e:
+                print(f"Scanner {self.name}: cannot open port: {e}")
+                self._stop.wait(self.retry_delay)
+                continue
+            try:
+                self._read_scans()
+            except Exception as e:
+                print(f"Scanner {self.name}: read error: {e}")
+                self._stop.wait(self.retry_delay)
+            finally:
+                self._conn.close()
+                self._conn = None
+
+    def _read_scans(self):
+        buffer = bytearray()
+        while not self._stop.is_set():
+            chunk = self._conn.read(self._conn.in_waiting or 1)
+            if not chunk:
+                continue
+            buffer += chunk
+            if b'\r' not in chunk and b'\n' not in chunk:
+                if len(buffer) > self.max_length:
+                    print(f"Scanner {self.name}: dropped {len(buffer)} bytes without terminator")
+                    buffer.clear()
+                continue
+            *frames, rest = buffer.replace(b'\r\n', b'\n').replace(b'\r', b'\n').split(b'\n')
+            buffer = bytearray(rest)
+            for frame in frames:
+                scan = frame.decode('utf-8', 'replace').strip()
+                if scan:
+                    self.scans.put((self.name, scan))
+
+
+class WedgeDecoder:
+    """
+    Splits keystrokes from a keyboard-wedge scanner into scans
+
+    Characters are collected in a preallocated buffer while they keep
+    arriving within max_gap of each other. A terminator (Enter, Tab) or a
+    longer pause ends the run: a run of at least min_length characters is
+    a scan, anything shorter is typing and is handed back to be inserted
+    as normal. Timestamps should come from the key events themselves
+    (Tk's event.time), so a busy UI loop does not distort the gaps.
+
+    Not thread-safe; feed it from the thread that receives the keys.
+    """
+
+    def __init__(self, max_gap=WEDGE_MAX_GAP, min_length=WEDGE_MIN_LENGTH,
+                 terminators=WEDGE_TERMINATORS, max_length=4096, clock=time.monotonic):
+        """
+        Args:
+            max_gap: Longest pause in seconds between keys of one scan
+            min_length: Shortest run of fast keys accepted as a scan
+            terminators: Characters the scanner sends after each scan
+            max_length: Buffer size; a longer run is cut into pieces
+            clock: Time source for poll()
+        """
+        self.max_gap = max_gap
+        self.min_length = min_length
+        self.terminators = terminators
+        self.max_length = max_length
+        self.clock = clock
+        # poll() waits a little longer than max_gap, as key events can
+        # reach the UI loop late
+        self.hold = max(3 * max_gap, 0.1)
+        self._chars = [""] * max_length
+        self._count = 0
+        self._last = 0.0
+        self._arrived = 0.0
+
+    def key(self, char, timestamp):
+        """
+        Feed one key press
+
+        Args:
+            char: Character the key produced ('' for keys that produce none)
+            timestamp: Seconds at which the key was pressed
+
+        Returns:
+            list: (kind, text) pairs in order: 'scan' for a complete scan,
+            'typed' for text to insert as if typed, and 'key' when this key
+            itself should go through to the widget (a terminator or other
+            control key that was not part of a scan)
+        """
+        if not char:
+            # Shift and other modifiers: scanners press Shift before each
+            # capital letter, so these neither end a run nor count as a key
+            return [("key", char)]
+        events = []
+        if self._count and timestamp - self._last > self.max_gap:
+            events += self._end()
+        if char in self.terminators or not char.isprintable():
+            if char in self.terminators and self._is_scan():
+                events.append(("scan", self._take()))
+                return events
+            events += self._end()
+            events.append(("key", char))
+            return events
+        self._chars[self._count] = char
+        self._count += 1
+        self._last = timestamp
+        self._arrived = self.clock()
+        if self._count == self.max_length:
+            events += self._end()
+        return events
+
+    def poll(self):
+        """
+        End a run once keys have stopped arriving
+
+        Call every few tens of ms from the UI loop; a scanner without a
+        terminator is split on the pause, and typing is released.
+
+        Returns:
+            list: (kind, text) pairs as for key()
+        """
+        if self._count and self.clock() - self._arrived > self.hold:
+            return self._end()
+        return []
+
+    def _is_scan(self):
+        return self._count >= self.min_length
+
+    def _end(self):
+        if not self._count:
+            return []
+        kind = "scan" if self._is_scan() else "typed"
+        return [(kind, self._take())]
+
+    def _take(self):
+        text = "".join(self._chars[:self._count])
+        self._count = 0
+        return text
+
+
+def start_scanners(ports, scans=None, baudrate=9600):
+    """
+    Start a reader for each scanner port
+
+    Args:
+        ports: Iterable of scanner ports
+        scans: Shared queue (a new one is created if omitted)
+        baudrate: Scanner baud rate
+
+    Returns:
+        tuple: (queue, list of SerialScannerReader)
+    """
+    scans = scans if scans is not None else queue.Queue()
+    readers = []
+    for port in ports:
+        reader = SerialScannerReader(port, scans, baudrate=baudrate)
+        reader.start()
+        readers.append(reader)
+    return scans, readers
+
+
+def iter_scans(scans, stop_event=None, poll=0.5):
+    """
+    Yield scan text from the queue until stop_event is set
+
+    Args:
+        scans: Queue filled by SerialScannerReader
+        stop_event: threading.Event that ends the iteration
+        poll: Seconds between stop checks while idle
+    """
+    while not (stop_event and stop_event.is_set()):
+        try:
+            _, scan = scans.get(timeout=poll)
+        except queue.Empty:
+            continue
+        yield scan
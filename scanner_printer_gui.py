@@ -4,10 +4,46 @@ Scanner input is automatically captured and can be printed
 """
 
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-from tsc_printer import TSCPrinter
+from tkinter import ttk, scrolledtext, messagebox, filedialog
+from label_form import StoredForm
+from latency_metrics import STAGES, metrics
+from packing_station import CartonFullError, DuplicateSerialError, PackingStation, legacy_counter
+from carton_allocator import SHARED_FILE, CartonIdAllocator
+from serial_index import PackedSerialIndex
+from packing_ledger import PackingLedger
+from print_server import PrintClient, PrintServerError
+from printer_discovery import ProbeResult, discover, find_printer, remember
+from printer_pool import PrinterPool, format_printers, parse_printers
+from printer_transport import TRANSPORTS, make_address
+from station_config import load_config, save_config
+from scanner_input import WEDGE_MIN_LENGTH, SerialScannerReader, WedgeDecoder
+from ui_events import (
+    UI_TICK_MS, BaudrateEvent, DialogEvent, EventBus, JobEvent, LogEvent, PrinterFoundEvent,
+    QueueDepthEvent, ServerSubmitEvent
+)
+import collections
+import logging
+import logging.handlers
+import queue
+import socket
 import threading
-import time
+from datetime import datetime
+
+# Status log: the window keeps the most recent lines, the file keeps everything
+LOG_FILE = "scanner_printer.log"
+LOG_VIEW_LINES = 500
+LOG_FLUSH_MS = 100
+
+# Timing stats panel refresh
+STATS_REFRESH_MS = 1000
+
+# Keyboard-wedge scans: bind tag put in front of every widget so keys are
+# seen before the focused widget inserts them, and the release tick
+WEDGE_TAG = "ScanWedge"
+WEDGE_POLL_MS = 20
+
+# Print server mode: seconds between queue / job status checks
+SERVER_POLL_SECONDS = 1.0
 
 class ScannerPrinterApp:
     def __init__(self, root):
@@ -15,29 +51,141 @@ class ScannerPrinterApp:
         self.root.title("TSC TTP-244 Pro - Scanner Printer")
         self.root.geometry("600x500")
         
-        # Printer settings
-        self.port = "COM10"
-        self.baudrate = 9600
+        # Printer settings (last saved values, if any)
+        self.config = load_config()
+
+        # Per-stage timings for the stats panel (and the metrics file, if set)
+        metrics.enable()
+        self.metrics_export = None
+        if self.config.get("metrics_file"):
+            self.metrics_export = metrics.start_export(
+                self.config["metrics_file"], self.config.get("metrics_interval", 15.0)
+            )
+        self.port = self.config.get("port") or self.config.get("last_good_port", "COM7")
+        self.baudrate = self.config.get("baudrate", 9600)
+        # Printers sharing the line, e.g. two TTP-244s at peak
+        self.printers = self.config.get("printers") or [{"port": self.port}]
+        # Rates found by negotiation, kept until the baudrate field changes
+        self.printer_rates = {
+            p["port"]: p["baudrate"] for p in self.printers if p.get("baudrate")
+        }
+
+        # Worker threads report to the Tk loop only through this bus
+        self.events = EventBus()
+
+        # Client mode: a print server (print_server.py) owns the printers and
+        # this station only sends it the scans of each carton
+        self.client = None
+        self.server_jobs = {}
+        self.server_jobs_lock = threading.Lock()
+        self.server_poll = None
+        # A carton is on its way to the server; scans wait until it answers
+        self.submitting = False
+        if self.config.get("print_server"):
+            self.client = PrintClient(self.config["print_server"])
+
+        # One connection and background worker per printer; labels go to the
+        # least busy one and move on if a printer fails
+        self.pool = PrinterPool(
+            [] if self.client else self.printers,
+            baudrate=self.baudrate,
+            on_sent=self.on_job_sent,
+            on_failed=self.on_job_failed,
+            on_held=self.on_job_held,
+            log=self.events.log
+        )
+        self.pool.start()
         
-        # Storage for multiple barcodes
-        self.scanned_barcodes = []
+        # Open carton, carton numbering and label layout
         self.max_barcodes = 20
-
-        # carton counter
-        self.carton_counter = self.load_carton_counter()
+        self.serial_index = PackedSerialIndex()
+        self.ledger = PackingLedger(station=self.config.get("station"))
+        # Carton IDs come in blocks from a file that can be shared by stations
+        self.allocator = CartonIdAllocator(
+            shared_path=self.config.get("carton_id_file", SHARED_FILE),
+            block_size=self.config.get("carton_id_block", 10),
+            seed=legacy_counter(self.ledger)
+        )
+        self.station = PackingStation(
+            self.pool,
+            items_per_carton=self.max_barcodes,
+            allocator=self.allocator,
+            serial_index=self.serial_index,
+            ledger=self.ledger
+        )
+        # Same layout stored in printer memory (used when enabled)
+        self.form = StoredForm(self.station.template)
 
         # Override flags
         self.override_carton_id = False
         self.override_date = False
 
+        # Log lines waiting to be shown, and the rotating history file
+        self.pending_log = collections.deque()
+        self.setup_log_history()
+
         # Create UI
         self.create_widgets()
+        self.flush_log()
+        self.pump_events()
+        self.refresh_stats()
         
         # # Bind Enter key to print button
         # self.root.bind('<Return>', lambda e: self.print_label())
         
         # Focus on scanner input for automatic capture
         self.scanner_input.focus_set()
+
+        # Scans from serial scanners arrive on a queue polled by the Tk loop
+        self.scans = queue.Queue()
+        self.scanner_readers = []
+        self.poll_scans()
+
+        # Keyboard-wedge scans are told apart from typing by key timing and
+        # join the same queue, wherever the focus is
+        self.wedge = WedgeDecoder(
+            max_gap=self.config.get("wedge_max_gap_ms", 40) / 1000,
+            min_length=self.config.get("wedge_min_length", WEDGE_MIN_LENGTH)
+        )
+        self.install_wedge(self.root)
+        self.poll_wedge()
+        if self.config.get("scanner_ports"):
+            self.connect_scanners()
+
+        # Check the printer is still where it was last seen, scanning the
+        # serial ports if it moved
+        if self.client is not None:
+            self.log(f"Printing through the print server at {self.client.url}")
+            self.server_poll = self.start_server_poll()
+        elif self.single_serial_printer():
+            self.find_printer()
+
+        # Release the printer port when the window closes
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    @property
+    def scanned_barcodes(self):
+        """Serial numbers in the open carton"""
+        return self.station.items
+
+    def on_close(self):
+        """Close the printer session and exit"""
+        self.stop_scanners()
+        if self.server_poll:
+            thread, stop_event = self.server_poll
+            stop_event.set()
+            thread.join(timeout=5)
+            self.client.close()
+        self.pool.stop(timeout=5)
+        self.pool.close()
+        self.serial_index.close()
+        self.ledger.close()
+        self.history_listener.stop()
+        if self.metrics_export:
+            thread, stop_event = self.metrics_export
+            stop_event.set()
+            thread.join(timeout=5)
+        self.root.destroy()
         
     def create_widgets(self):
         """Create all UI widgets"""
@@ -57,10 +205,17 @@ class ScannerPrinterApp:
         # Port selection
         port_frame = tk.Frame(settings_frame)
         port_frame.pack(fill="x", pady=5)
-        tk.Label(port_frame, text="COM Port:").pack(side="left", padx=5)
-        self.port_entry = tk.Entry(port_frame, width=10)
-        self.port_entry.insert(0, self.port)
+        # Transport for addresses typed without a tcp:// or file:// prefix
+        self.transport_var = tk.StringVar(value=self.config.get("transport", "serial"))
+        tk.OptionMenu(port_frame, self.transport_var, *TRANSPORTS).pack(side="left")
+        tk.Label(port_frame, text="Port(s):").pack(side="left", padx=5)
+        self.port_entry = tk.Entry(port_frame, width=24)
+        self.port_entry.insert(0, format_printers(self.printers))
         self.port_entry.pack(side="left", padx=5)
+        tk.Label(
+            port_frame, text="(e.g. COM7,COM8=100x150 or 192.168.1.50:9100)",
+            font=("Arial", 7), fg="gray"
+        ).pack(side="left")
         
         # Baudrate selection
         baudrate_frame = tk.Frame(settings_frame)
@@ -69,6 +224,28 @@ class ScannerPrinterApp:
         self.baudrate_entry = tk.Entry(baudrate_frame, width=10)
         self.baudrate_entry.insert(0, str(self.baudrate))
         self.baudrate_entry.pack(side="left", padx=5)
+
+        # Flow control selection
+        tk.Label(baudrate_frame, text="Flow control:").pack(side="left", padx=5)
+        self.flow_control_var = tk.StringVar(value="none")
+        tk.OptionMenu(baudrate_frame, self.flow_control_var, "none", "rtscts", "xonxoff").pack(side="left")
+
+        # Stored layout: upload the label program once, then send only data
+        self.use_stored_form = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            settings_frame,
+            text="Store label layout in printer (send only carton data)",
+            variable=self.use_stored_form
+        ).pack(anchor="w")
+
+        # Send the label row by row while scanning; PRINT when the carton is full
+        self.stream_labels = tk.BooleanVar(value=self.config.get("stream_labels", False))
+        tk.Checkbutton(
+            settings_frame,
+            text="Send label while scanning (prints when the carton is full)",
+            variable=self.stream_labels,
+            command=lambda: save_config({"stream_labels": self.stream_labels.get()})
+        ).pack(anchor="w")
         
         # Test connection button
         test_btn = tk.Button(
@@ -79,7 +256,34 @@ class ScannerPrinterApp:
             fg="white"
         )
         test_btn.pack(pady=5)
+
+        # Probe every serial port for a printer
+        tk.Button(
+            settings_frame,
+            text="Find Printer",
+            command=lambda: self.find_printer(rescan=True)
+        ).pack(pady=2)
+
+        # Baud rate negotiation button
+        tk.Button(
+            settings_frame,
+            text="Negotiate Fastest Baudrate",
+            command=self.negotiate_baudrate
+        ).pack(pady=2)
         
+        # Serial / USB-CDC scanners read directly (comma separated ports)
+        scanner_frame = tk.Frame(settings_frame)
+        scanner_frame.pack(fill="x", pady=5)
+        tk.Label(scanner_frame, text="Scanner Ports:").pack(side="left", padx=5)
+        self.scanner_ports_entry = tk.Entry(scanner_frame, width=20)
+        self.scanner_ports_entry.insert(0, ",".join(self.config.get("scanner_ports", [])))
+        self.scanner_ports_entry.pack(side="left", padx=5)
+        tk.Button(
+            scanner_frame,
+            text="Connect Scanners",
+            command=self.connect_scanners
+        ).pack(side="left", padx=5)
+
         # Override section
         override_frame = tk.Frame(settings_frame)
         override_frame.pack(fill="x", pady=10)
@@ -129,6 +333,22 @@ class ScannerPrinterApp:
         )
         self.counter_label.pack(pady=5)
 
+        # Print queue depth
+        self.queue_label = tk.Label(
+            self.root,
+            text="Print queue: 0",
+            font=("Arial", 9),
+            fg="gray"
+        )
+        self.queue_label.pack()
+
+        # Timing stats: p50 / p95 per stage, label rate and link speed
+        stats_frame = tk.Frame(self.root)
+        stats_frame.pack(fill="x", padx=10)
+        self.stats_label = tk.Label(stats_frame, font=("Courier", 8), fg="gray", justify="left", anchor="w")
+        self.stats_label.pack(side="left", fill="x", expand=True)
+        tk.Button(stats_frame, text="Export Stats", font=("Arial", 8), command=self.export_stats).pack(side="right")
+
         # Scanner input frame
         input_frame = ttk.LabelFrame(self.root, text="Scanner Input", padding=10)
         input_frame.pack(fill="both", expand=True, padx=10, pady=5)
@@ -136,7 +356,7 @@ class ScannerPrinterApp:
         # Scanner input field (scanned barcode will appear here)
         tk.Label(
             input_frame, 
-            text="Scanned Value (auto-captured when scanner reads):", 
+            text="Type a S/N and press Enter (scans are captured anywhere in the window):", 
             font=("Arial", 10)
         ).pack(anchor="w", pady=5)
         
@@ -146,7 +366,7 @@ class ScannerPrinterApp:
             width=40
         )
         self.scanner_input.pack(fill="x", pady=5)
-        self.scanner_input.bind('<KeyRelease>', self.on_scanner_input)
+        self.scanner_input.bind('<Return>', self.on_scanner_input)
         
         # # Manual input label
         # tk.Label(
@@ -218,44 +438,6 @@ class ScannerPrinterApp:
         self.log("Application started. Ready to scan and print.")
         self.log(f"Scan items, than click PRINT once ready.")
 
-        # Load carton counter from file (persists between sessions)
-    def load_carton_counter(self):
-        try:
-            with open('carton_counter.txt', 'r') as f:
-                return int(f.read().strip())
-        except:
-            return 1
-
-    # Save carton counter to file
-    def save_carton_counter(self):
-        try:
-            with open('carton_counter.txt', 'w') as f:
-                f.write(str(self.carton_counter))
-        except Exception as e:
-            self.log(f"Warning: Could not save counter - {e}")
-    
-    # Extract S/N from barcode string
-    def extract_serial_number(self, barcode_string):
-        """
-        Extract S/N from barcode format:
-        "EBD S/N: HAA02-2544-336PCB S/No: HB25390000142PCB Rev: HT_EBD_V25EBD FW: 14"
-        Returns: "HAA02-2544-336"
-        """
-        import re
-        
-        # Pattern: "S/N: " followed by alphanumeric with hyphens
-        match = re.search(r'S/N:\s*([A-Z0-9\-]+)(?=PCB)', barcode_string)
-        
-        if match:
-            serial = match.group(1)
-            # Remove any trailing non-alphanumeric characters
-            serial = re.split(r'[^A-Z0-9\-]', serial)[0]
-            return serial
-        else:
-            # If pattern not found, return original string
-            self.log(f"Warning: Could not extract S/N from: {barcode_string}")
-            return barcode_string   
-
     # Toggle methods for overrides
     def toggle_carton_override(self):
         """Enable/disable carton ID override"""
@@ -275,12 +457,94 @@ class ScannerPrinterApp:
             self.override_date_entry.config(state="disabled", bg="#f0f0f0")
             self.log("Date override disabled")
 
+    def setup_log_history(self):
+        """Write the full log to a rotating file from a background thread"""
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=1_000_000, backupCount=5, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        log_queue = queue.Queue()
+        self.history = logging.getLogger("scanner_printer")
+        self.history.setLevel(logging.INFO)
+        self.history.propagate = False
+        self.history.addHandler(logging.handlers.QueueHandler(log_queue))
+        self.history_listener = logging.handlers.QueueListener(log_queue, handler)
+        self.history_listener.start()
+
     def log(self, message):
-        """Add message to log"""
-        from datetime import datetime
+        """Add message to log (shown on the next flush)"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert("end", f"[{timestamp}] {message}\n")
-        self.log_text.see("end")
+        self.pending_log.append(f"[{timestamp}] {message}\n")
+        self.history.info(message)
+
+    def flush_log(self):
+        """Show pending log lines in one insert and trim the view"""
+        if self.pending_log:
+            lines = []
+            while self.pending_log:
+                lines.append(self.pending_log.popleft())
+            self.log_text.insert("end", "".join(lines[-LOG_VIEW_LINES:]))
+            line_count = int(self.log_text.index("end-1c").split(".")[0])
+            if line_count > LOG_VIEW_LINES + 1:
+                self.log_text.delete("1.0", f"{line_count - LOG_VIEW_LINES}.0")
+            self.log_text.see("end")
+        self.root.after(LOG_FLUSH_MS, self.flush_log)
+
+    def pump_events(self):
+        """Handle events posted by worker threads, once per UI tick"""
+        # Schedule first so a modal dialog raised below does not stall the bus
+        self.root.after(UI_TICK_MS, self.pump_events)
+        self.events.dispatch({
+            LogEvent: lambda event: self.log(event.message),
+            DialogEvent: self.show_dialog,
+            JobEvent: self.on_job_event,
+            QueueDepthEvent: self.show_queue_depth,
+            BaudrateEvent: self.on_baudrate_negotiated,
+            PrinterFoundEvent: self.on_printer_found,
+            ServerSubmitEvent: self.on_server_submit,
+        })
+
+    def refresh_stats(self):
+        """Show p50 / p95 per stage, labels per hour and link speed"""
+        summary = metrics.summary()
+        cells = []
+        for stage in STAGES:
+            figures = summary["stages"][stage]
+            if figures["count"]:
+                cells.append(f"{stage} {figures['p50'] * 1000:.1f}/{figures['p95'] * 1000:.1f}")
+            else:
+                cells.append(f"{stage} -")
+        half = (len(cells) + 1) // 2
+        self.stats_label.config(text=(
+            f"p50/p95 ms  {'  '.join(cells[:half])}\n"
+            f"            {'  '.join(cells[half:])}\n"
+            f"{summary['labels_per_hour']:.0f} labels/h, link {summary['bytes_per_sec']:.0f} B/s"
+        ))
+        self.root.after(STATS_REFRESH_MS, self.refresh_stats)
+
+    def export_stats(self):
+        """Save the timing stats as Prometheus text or CSV"""
+        path = filedialog.asksaveasfilename(
+            title="Export timing stats",
+            defaultextension=".prom",
+            filetypes=[("Prometheus text", "*.prom"), ("CSV", "*.csv")]
+        )
+        if not path:
+            return
+        try:
+            metrics.write(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not write {path}: {e}")
+            return
+        self.log(f"Timing stats exported to {path}")
+
+    def show_dialog(self, event):
+        """Show a message box requested by a worker thread"""
+        show = {
+            "info": messagebox.showinfo,
+            "warning": messagebox.showwarning,
+        }.get(event.level, messagebox.showerror)
+        show(event.title, event.message)
 
     def update_counter(self):
         """Update counter and button state"""
@@ -301,88 +565,355 @@ class ScannerPrinterApp:
             )
 
     def on_scanner_input(self, event):
-        """Handle scanner input (usually ends with Enter)"""
-        value = self.scanner_input.get().strip()
-        if value and event.keysym == 'Return':
-           self.add_barcode()
-            # Scanner typically sends Enter after barcode
-            # self.log(f"Scanned value detected: {value}")
-            # # Auto-print option (uncomment if you want auto-print on scan)
-            # self.print_label()
-
-    def add_barcode(self):
-        """Add scanned barcode to list"""
-        value = self.scanner_input.get().strip()
+        """Add a serial typed into the entry when Enter is pressed"""
+        if self.scanner_input.get().strip():
+            self.add_barcode()
+
+    def install_wedge(self, widget):
+        """Route key presses in widget and its children through the wedge decoder"""
+        if widget is self.root:
+            self.root.bind_class(WEDGE_TAG, "<KeyPress>", self.on_wedge_key)
+        widget.bindtags((WEDGE_TAG,) + widget.bindtags())
+        for child in widget.winfo_children():
+            self.install_wedge(child)
+
+    def on_wedge_key(self, event):
+        """Collect a key press; scans are queued, typing is passed on"""
+        events = self.wedge.key(event.char, event.time / 1000)
+        if self.handle_wedge(events, event.widget):
+            return None
+        return "break"
+
+    def poll_wedge(self):
+        """Release scans and typing once the keys have stopped"""
+        events = self.wedge.poll()
+        if events:
+            self.handle_wedge(events, self.root.focus_get())
+        self.root.after(WEDGE_POLL_MS, self.poll_wedge)
+
+    def handle_wedge(self, events, widget):
+        """
+        Act on WedgeDecoder output
+
+        Returns:
+            bool: True if the key being handled should reach the widget
+        """
+        passthrough = False
+        for kind, text in events:
+            if kind == "scan":
+                self.scans.put(("keyboard", text))
+            elif kind == "typed":
+                # Held back while the decoder timed it; insert it now
+                if isinstance(widget, tk.Entry):
+                    if widget.selection_present():
+                        widget.delete("sel.first", "sel.last")
+                    widget.insert("insert", text)
+                elif isinstance(widget, tk.Text):
+                    widget.insert("insert", text)
+            else:
+                passthrough = True
+        return passthrough
+
+    def add_barcode(self, value=None):
+        """
+        Add scanned barcode to list
+
+        Args:
+            value: Scan from a serial scanner; when omitted the text in
+                the scanner entry is used and cleared
+        """
+        from_entry = value is None
+        if from_entry:
+            value = self.scanner_input.get().strip()
         
         if not value:
             return
+
+        if self.submitting:
+            # Belongs to the next carton; queued until the server answers
+            self.scans.put(("keyboard", value))
+            if from_entry:
+                self.scanner_input.delete(0, "end")
+            return
        
+        # Stored forms already send only the data, so they are not streamed
+        self.station.streaming = (
+            self.stream_labels.get() and not self.use_stored_form.get() and self.client is None
+        )
+
         # Extract S/N before storing
-        extracted_sn = self.extract_serial_number(value)
-        
-        self.scanned_barcodes.append(extracted_sn)
+        try:
+            record = self.station.add_scan(value)
+        except CartonFullError as e:
+            if from_entry:
+                self.scanner_input.delete(0, "end")
+            self.root.bell()
+            self.log(f"⚠️ {e}")
+            messagebox.showwarning("Carton full", str(e))
+            return
+        except DuplicateSerialError as e:
+            # Reject double scans and boards already packed elsewhere
+            if from_entry:
+                self.scanner_input.delete(0, "end")
+            self.root.bell()
+            self.log(f"⚠️ Duplicate rejected: {e}")
+            messagebox.showwarning("Duplicate scan", str(e))
+            return
+        extracted_sn = record.serial
+        if not record.recognised:
+            self.log(f"Warning: Could not extract S/N from: {value}")
         index = len(self.scanned_barcodes)
         
         # Display extracted S/N in listbox
         self.barcode_listbox.insert("end", f"{index:02d}. {extracted_sn}")
         self.barcode_listbox.see("end")
-        self.scanner_input.delete(0, "end")
+        if from_entry:
+            self.scanner_input.delete(0, "end")
         self.update_counter()
 
         # Log both original and extracted
         self.log(f"Scanned: {value[:50]}...")  # Show first 50 chars
         self.log(f"Extracted S/N: {extracted_sn} ({index}/{self.max_barcodes})")
+
+        # The label is already on the printer; only PRINT is left
+        if self.station.streaming and self.station.is_full():
+            self.print_label()
         
     def delete_selected(self, event):
         """Delete selected barcode (right-click)"""
         selection = self.barcode_listbox.curselection()
-        if not selection:
+        if not selection or self.submitting:
             return
             
         idx = selection[0]
-        deleted = self.scanned_barcodes.pop(idx)
+        deleted = self.station.remove(idx)
 
-     # Refresh list
-        self.barcode_listbox.delete(0, "end")
-        for i, barcode in enumerate(self.scanned_barcodes, 1):
-            self.barcode_listbox.insert("end", f"{i:02d}. {barcode}")
+        # Remove the row and renumber only the rows below it
+        self.barcode_listbox.delete(idx)
+        for i in range(idx, len(self.scanned_barcodes)):
+            self.barcode_listbox.delete(i)
+            self.barcode_listbox.insert(i, f"{i + 1:02d}. {self.scanned_barcodes[i]}")
             
         self.update_counter()
         self.log(f"Deleted: {deleted}")    
 
+    def connect_scanners(self):
+        """(Re)start reader threads for the serial scanner ports"""
+        self.stop_scanners()
+        ports = [p.strip() for p in self.scanner_ports_entry.get().split(",") if p.strip()]
+        for port in ports:
+            reader = SerialScannerReader(port, self.scans)
+            reader.start()
+            self.scanner_readers.append(reader)
+        save_config({"scanner_ports": ports})
+        if ports:
+            self.log(f"Reading scanners on: {', '.join(ports)}")
+
+    def stop_scanners(self):
+        """Stop all serial scanner readers"""
+        for reader in self.scanner_readers:
+            reader.stop()
+        self.scanner_readers = []
+
+    def poll_scans(self):
+        """Move complete scans from serial scanners into the carton"""
+        if self.submitting:
+            # Kept for the next carton until the server takes this one
+            self.root.after(50, self.poll_scans)
+            return
+        try:
+            while True:
+                _, scan = self.scans.get_nowait()
+                self.add_barcode(scan)
+        except queue.Empty:
+            pass
+        self.root.after(50, self.poll_scans)
+
+    def apply_printer_settings(self):
+        """Read port settings from the form and apply them to the printer pool"""
+        if self.client is not None:
+            return
+        transport = self.transport_var.get()
+        printers = parse_printers(self.port_entry.get())
+        for printer in printers:
+            printer["port"] = make_address(printer["port"], transport)
+        if not printers:
+            self.log(f"Warning: no printer port given, using {format_printers(self.printers)}")
+            printers = self.printers
+        try:
+            baudrate = int(self.baudrate_entry.get().strip())
+        except ValueError:
+            # Keep the last working rate rather than guessing 9600
+            self.log(f"Warning: invalid baudrate, using {self.baudrate}")
+            self.baudrate_entry.delete(0, "end")
+            self.baudrate_entry.insert(0, str(self.baudrate))
+            baudrate = self.baudrate
+        if baudrate != self.baudrate:
+            # A rate typed by hand replaces the negotiated ones
+            self.printer_rates.clear()
+            self.baudrate = baudrate
+        for printer in printers:
+            if printer["port"] in self.printer_rates:
+                printer["baudrate"] = self.printer_rates[printer["port"]]
+        flow_control = self.flow_control_var.get()
+        if flow_control == "none":
+            flow_control = None
+
+        self.port = printers[0]["port"]
+        if printers != self.printers or transport != self.config.get("transport", "serial"):
+            self.config["transport"] = transport
+            save_config({"port": self.port, "printers": printers, "transport": transport})
+        self.printers = printers
+        self.pool.configure(printers, self.baudrate, flow_control)
+
     def test_connection(self):
         """Test printer connection"""
-        self.port = self.port_entry.get().strip()
-        try:
-            self.baudrate = int(self.baudrate_entry.get().strip())
-        except:
-            self.baudrate = 9600
+        if self.client is not None:
+            self.test_server()
+            return
+        self.apply_printer_settings()
             
-        self.log(f"Testing connection to {self.port} at {self.baudrate} baud...")
-        
+        members = list(self.pool.printers)
+        events = self.events
+
         def test():
-            try:
-                printer = TSCPrinter(port=self.port, baudrate=self.baudrate)
-                if printer.connect():
-                    printer.disconnect()
-                    self.log("✅ Connection successful!")
-                    messagebox.showinfo("Success", f"Connected to {self.port} successfully!")
-                else:
-                    self.log("❌ Connection failed!")
-                    messagebox.showerror("Error", f"Failed to connect to {self.port}")
-            except Exception as e:
-                self.log(f"❌ Error: {e}")
-                messagebox.showerror("Error", f"Connection error: {e}")
-                
+            failed = []
+            for member in members:
+                port = member.session.port
+                events.log(f"Testing connection to {port} at {member.session.baudrate} baud...")
+                try:
+                    if member.session.ensure_connected():
+                        status = member.session.status(force=True)
+                        if status is not None:
+                            events.log(f"✅ {port}: printer answered, status: {status.describe()}")
+                            if "://" not in port:
+                                remember(ProbeResult(port, member.session.baudrate, status))
+                        elif member.session.printer.conn.answers_queries:
+                            events.log(f"❌ {port}: port opened but no printer answered the status query")
+                            failed.append(port)
+                        else:
+                            events.log(f"✅ {port}: connection successful!")
+                    else:
+                        events.log(f"❌ {port}: connection failed!")
+                        failed.append(port)
+                except Exception as e:
+                    events.log(f"❌ {port}: error: {e}")
+                    failed.append(port)
+            if failed:
+                events.post(DialogEvent("error", "Error", f"Failed to connect to {', '.join(failed)}"))
+            else:
+                ports = ", ".join(member.session.port for member in members)
+                events.post(DialogEvent("info", "Success", f"Connected to {ports} successfully!"))
+
         threading.Thread(target=test, daemon=True).start()
 
-    def format_carton_id(self):
-        """Format: CYYWW-XXX (e.g. C2544-001)"""
-        from datetime import datetime
-        now = datetime.now()
-        year = now.strftime("%y")
-        week = now.strftime("%U")
-        return f"C{year}{week}-{self.carton_counter:03d}"
+    def single_serial_printer(self):
+        """True when one printer on a plain serial port is configured"""
+        return len(self.printers) == 1 and "://" not in self.printers[0]["port"]
+
+    def find_printer(self, rescan=False):
+        """
+        Locate the printer on a background thread
+
+        Args:
+            rescan: Probe every serial port instead of trying the last
+                known good port first
+        """
+        scanners = set(self.config.get("scanner_ports", []))
+        # Printers already in the pool are asked over their live session;
+        # probing their port would change its baud rate under the session
+        # or collide with a job in flight
+        sessions = [m.session for m in self.pool.printers if "://" not in m.session.port]
+        current = self.port
+        events = self.events
+
+        # Pool printers that answer, and their ports. Silent ones are closed
+        # so the exclusive probe can open them; there is no working link to
+        # disturb there
+        def ask_sessions():
+            found = []
+            answering = set()
+            for session in sessions:
+                status = session.status()
+                if status is not None:
+                    found.append(ProbeResult(session.port, session.baudrate, status))
+                    answering.add(session.port)
+                else:
+                    session.close()
+            return found, answering
+
+        def search():
+            if rescan:
+                events.log("Looking for a printer on all serial ports...")
+                found, answering = ask_sessions()
+                found += discover(exclude=scanners | answering)
+                for result in found:
+                    events.log(f"Printer on {result.port} at {result.baudrate} baud ({result.status.describe()})")
+                # Stay on the current printer if it is one of them
+                found.sort(key=lambda result: result.port != current)
+                result = found[0] if found else None
+                if result:
+                    remember(result)
+            else:
+                found, answering = ask_sessions()
+                if found:
+                    result = found[0]
+                    remember(result)
+                else:
+                    result = find_printer(exclude=scanners)
+            events.post(PrinterFoundEvent(result))
+
+        threading.Thread(target=search, daemon=True).start()
+
+    def on_printer_found(self, event):
+        """Point the pool at the printer discovery found"""
+        result = event.result
+        if result is None:
+            self.log("❌ No printer answered on any serial port")
+            return
+        if (result.port, result.baudrate) == (self.port, self.baudrate) and self.single_serial_printer():
+            self.log(f"✅ Printer on {result.port} at {result.baudrate} baud")
+            return
+        self.log(f"✅ Printer found on {result.port} at {result.baudrate} baud, switching to it")
+        self.transport_var.set("serial")
+        self.port_entry.delete(0, "end")
+        self.port_entry.insert(0, result.port)
+        self.baudrate_entry.delete(0, "end")
+        self.baudrate_entry.insert(0, str(result.baudrate))
+        self.apply_printer_settings()
+
+    def negotiate_baudrate(self):
+        """Switch printer and port to the fastest common baud rate"""
+        if self.client is not None:
+            self.log("Baud rate is set on the print server (print_server.py --baud)")
+            return
+        self.apply_printer_settings()
+        members = list(self.pool.printers)
+
+        def negotiate():
+            for member in members:
+                port = member.session.port
+                self.events.log(f"Negotiating baudrate on {port} (currently {member.session.baudrate})...")
+                rate = member.session.negotiate_baudrate()
+                if rate is None:
+                    self.events.log(f"❌ {port} did not answer status queries, baudrate unchanged")
+                    continue
+                self.events.post(BaudrateEvent(rate, port))
+
+        threading.Thread(target=negotiate, daemon=True).start()
+
+    def on_baudrate_negotiated(self, event):
+        """Show the negotiated rate in the settings form"""
+        rate = event.rate
+        self.printer_rates[event.port] = rate
+        for printer in self.printers:
+            if printer["port"] == event.port:
+                printer["baudrate"] = rate
+        self.baudrate = rate
+        self.baudrate_entry.delete(0, "end")
+        self.baudrate_entry.insert(0, str(rate))
+        save_config({"port": self.port, "baudrate": rate, "printers": self.printers})
+        self.log(f"✅ {event.port} link running at {rate} baud (saved)")
 
     def print_label(self):
         """Print label with scanned/manual input"""
@@ -396,125 +927,237 @@ class ScannerPrinterApp:
             messagebox.showwarning("Not ready", "Please scan at least 1 item to print!")
             return
 
-        self.log(f"Printing {self.scanned_barcodes} QR codes...")
-        
         # Get settings
-        self.port = self.port_entry.get().strip()
+        self.apply_printer_settings()
+
+        # Check for carton ID override
+        carton_id = None
+        if self.use_carton_override.get() and self.override_carton_entry.get().strip():
+            carton_id = self.override_carton_entry.get().strip()
+            self.log(f"Using override Carton ID: {carton_id}")
+        
+        # Check for date override
+        date_packed = None
+        if self.use_date_override.get() and self.override_date_entry.get().strip():
+            date_packed = self.override_date_entry.get().strip()
+            self.log(f"Using override Date: {date_packed}")
+
+        if self.client is not None:
+            self.print_via_server(carton_id, date_packed)
+            return
+
+        # Render the label and hand it to the spooler; the operator can keep scanning
+        form = self.form if self.use_stored_form.get() else None
+        item_count = len(self.scanned_barcodes)
         try:
-            self.baudrate = int(self.baudrate_entry.get().strip())
-        except:
-            self.baudrate = 9600
+            job = self.station.close_carton(carton_id, date_packed, form)
+        except ValueError as e:
+            self.log(f"❌ {e}")
+            messagebox.showerror("Error", str(e))
+            return
+
+        if job is None:
+            self.log("❌ Print queue is full, wait for the printer to catch up")
+            messagebox.showwarning("Queue full", "Print queue is full, please wait and press PRINT again.")
+            return
+
+        self.log(f"Queued carton {job.carton_id} ({item_count} items)")
+        self.update_queue_depth()
+
+        if carton_id is not None:
+            self.log("No carton ID allocated (override used)")
+
+        self.reset_carton_view()
+
+    def reset_carton_view(self):
+        """Clear for the next carton while this one prints"""
+        self.barcode_listbox.delete(0, "end")
+        self.update_counter()
+        self.scanner_input.delete(0, "end")
+        self.scanner_input.focus_set()
+
+    # Client mode: the print server numbers, renders and prints the carton
+    def print_via_server(self, carton_id, date_packed):
+        """Send the open carton's scans to the print server on a worker thread"""
+        if self.submitting:
+            self.log("Still sending the last carton to the print server")
+            return
+        scans = [record.raw for record in self.station.records]
+        station = self.config.get("station") or socket.gethostname()
+        client = self.client
+        events = self.events
 
-        def print_job():
+        def submit():
             try:
-                printer = TSCPrinter(port=self.port, baudrate=self.baudrate)
-                
-                if not printer.connect():
-                    self.log("❌ Failed to connect to printer")
-                    messagebox.showerror("Error", "Failed to connect to printer")
-                    return
-                
-                self.log("✅ Connected to printer")
-                
-                # Get carton ID and timestamp
-                from datetime import datetime
-                # Check for carton ID override
-                if self.use_carton_override.get() and self.override_carton_entry.get().strip():
-                    carton_id = self.override_carton_entry.get().strip()
-                    self.log(f"Using override Carton ID: {carton_id}")
-                else:
-                    carton_id = self.format_carton_id()
-                
-                # Check for date override
-                if self.use_date_override.get() and self.override_date_entry.get().strip():
-                    date_packed = self.override_date_entry.get().strip()
-                    self.log(f"Using override Date: {date_packed}")
-                else:
-                    date_packed = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                # Clear buffer
-                printer.send_command("CLS")
-                time.sleep(0.1)
-                
-                # Set label size (100mm x 150mm)
-                printer.send_command("SIZE 100 mm, 150 mm, 2 mm")
-                time.sleep(0.1)
-                
-                # Set print settings
-                printer.send_command("SPEED 4")
-                time.sleep(0.1)
-                printer.send_command("DENSITY 8")
-                time.sleep(0.1)
-                printer.send_command("DIRECTION 0")
-                time.sleep(0.1)
-                
-                # Print header - Carton ID
-                printer.send_command(f'TEXT 50,30,"3",0,1,2,"Carton ID: {carton_id}"')
-                time.sleep(0.1)
+                job = client.submit(scans, carton_id, date_packed, station)
+            except PrintServerError as e:
+                events.post(ServerSubmitEvent(error=f"Print server refused carton: {e}"))
+            except OSError as e:
+                events.post(ServerSubmitEvent(error=f"Print server {client.url} unreachable: {e}"))
+            else:
+                events.post(ServerSubmitEvent(job))
 
-                # Print header - Date Packed
-                printer.send_command(f'TEXT 50,100,"3",0,1,2,"Date Packed: {date_packed}"')
-                time.sleep(0.1)
+        self.submitting = True
+        self.log(f"Sending {len(scans)} items to the print server...")
+        threading.Thread(target=submit, daemon=True).start()
 
-                # Print header - QR Code of Carton ID
-                printer.send_command(f'QRCODE 650,20,M,5,A,0,M2,S3,"{carton_id}"')
-                time.sleep(0.1)
+    def on_server_submit(self, event):
+        """Clear the carton once the server has it, or keep it for a retry (Tk thread)"""
+        self.submitting = False
+        if event.error:
+            self.log(f"❌ {event.error}")
+            messagebox.showerror("Error", event.error)
+            return
+        job = event.job
+        self.station.clear()
+        with self.server_jobs_lock:
+            self.server_jobs[job["job_id"]] = job
+        self.log(
+            f"Queued carton {job['carton_id']} on {job['printer']} "
+            f"(job {job['job_id']}, {job['items']} items)"
+        )
+        self.reset_carton_view()
 
-                # Print horizontal line separator
-                printer.send_command('BAR 50,170,750,4')
-                time.sleep(0.1)
-                
-                # Print table of scanned values as TEXT 
-                item_count = len(self.scanned_barcodes)
-
-                for i in range(item_count):
-                    row = i // 2  
-                    col = i % 2
-                    x = 50 + (col * 380)    
-                    y = 200 + (row * 85) 
-                    
-                    # Get actual scanned value
-                    scanned_value = self.scanned_barcodes[i]
-                    item_number = i + 1
-
-                    display_text = f"{item_number:02d}. {scanned_value}"
-                    
-                    # Print scanned value as TEXT (not QR code)
-                    printer.send_command(f'TEXT {x},{y},"3",0,1,1,"{display_text}"')
-                    time.sleep(0.05)
-                
-                # Execute print
-                printer.send_command("PRINT 1,1")
-                
-                self.log("✅ Print command sent successfully!")
-                
-                # Increment carton counter for next print
-                if not self.use_carton_override.get():
-                    self.carton_counter += 1
-                    self.save_carton_counter()
-                    self.log(f"Carton counter incremented to: {self.carton_counter}")
+    def test_server(self):
+        """Check the print server answers and show its queue"""
+        client = self.client
+        events = self.events
+
+        def test():
+            events.log(f"Testing print server at {client.url}...")
+            try:
+                status = client.status()
+            except (PrintServerError, OSError) as e:
+                events.log(f"❌ Print server: {e}")
+                events.post(DialogEvent("error", "Error", f"Print server unreachable: {e}"))
+                return
+            names = ", ".join(p["name"] for p in status["printers"]) or "no printers"
+            events.log(f"✅ Print server answered: {names}, {status['depth']} queued")
+            events.post(QueueDepthEvent(status["depth"], status["printers"]))
+            events.post(DialogEvent("info", "Success", f"Connected to print server ({names})"))
+
+        threading.Thread(target=test, daemon=True).start()
+
+    def start_server_poll(self):
+        """
+        Follow the print server's queue and this station's jobs
+
+        Returns:
+            tuple: (thread, stop event)
+        """
+        client = self.client
+        events = self.events
+        jobs = self.server_jobs
+        lock = self.server_jobs_lock
+        stop_event = threading.Event()
+
+        def poll():
+            reachable = True
+            while not stop_event.wait(SERVER_POLL_SECONDS):
+                try:
+                    status = client.status()
+                    events.post(QueueDepthEvent(status["depth"], status["printers"]))
+                    with lock:
+                        pending = list(jobs.items())
+                    for job_id, job in pending:
+                        try:
+                            state = client.job(job_id)
+                        except PrintServerError as e:
+                            if e.status == 404:
+                                # Forgotten by the server (restarted)
+                                with lock:
+                                    jobs.pop(job_id, None)
+                                continue
+                            raise
+                        report_server_job(job, state)
+                except (PrintServerError, OSError) as e:
+                    if reachable:
+                        events.log(f"❌ Print server {client.url} unreachable: {e}")
+                    reachable = False
+                    continue
+                if not reachable:
+                    events.log(f"✅ Print server {client.url} reachable again")
+                reachable = True
+
+        def report_server_job(job, state):
+            carton_id = state["carton_id"]
+            if state["status"] == "sent":
+                events.log(f"✅ Carton {carton_id} printed on {state['printer']} ({state['items']} items)")
+            elif state["status"] == "failed":
+                error_msg = f"Failed to print carton {carton_id}"
+                events.log(f"❌ {error_msg}")
+                events.post(DialogEvent("error", "Error", error_msg))
+            elif state["status"] == "held" and state["detail"] != job.get("detail"):
+                events.log(f"⏸ Carton {carton_id} held: {state['printer']} {state['detail']}")
+            with lock:
+                if state["status"] in ("sent", "failed"):
+                    jobs.pop(state["job_id"], None)
                 else:
-                    self.log("Carton counter NOT incremented (override used)")
-                printer.disconnect()
-                
-                # ✅ MODIFIED: Show success message
-                self.root.after(0, lambda: messagebox.showinfo(
-                    "Success", 
-                    f"Carton {carton_id} printed!\n{self.max_barcodes} items in table format"
-                ))
-                
-                # Clear scanner input after successful print
-                if messagebox.askyesno("Continue?", "Clear and scan another batch?"):
-                    self.scanned_barcodes.clear()
-                    self.barcode_listbox.delete(0, "end")
-                    self.update_counter()
-                    self.scanner_input.delete(0, "end")
-                    self.scanner_input.focus_set()
-                
-            except Exception as e:
-                error_msg = f"Print error: {e}"
-                self.log(f"❌ {error_msg}")
-                self.root.after(0, lambda: messagebox.showerror("Error", error_msg))
+                    jobs[state["job_id"]] = state
+
+        thread = threading.Thread(target=poll, daemon=True)
+        thread.start()
+        return thread, stop_event
+
+    # Spooler callbacks run on the spooler thread: record, then post to the bus
+    def on_job_sent(self, job):
+        """Spooler callback: label reached the printer"""
+        self.station.job_sent(job)
+        if job.partial:
+            return
+        member = self.pool.printer(job.printer)
+        throughput = member.session.throughput() if member else (0.0, 0, 0.0)
+        self.events.post(JobEvent("sent", job, throughput=throughput))
+        self.events.post(QueueDepthEvent(self.pool.depth(), self.pool.stats()))
+
+    def on_job_failed(self, job):
+        """Spooler callback: label could not be sent"""
+        self.station.job_failed(job)
+        if job.partial:
+            self.events.log(f"Streaming carton {job.carton_id} to {job.printer} failed, it will be sent whole")
+            return
+        self.events.post(JobEvent("failed", job))
+        self.events.post(QueueDepthEvent(self.pool.depth(), self.pool.stats()))
+
+    def on_job_held(self, job, status):
+        """Spooler callback: printer not ready, job kept in the queue"""
+        self.station.job_held(job, status)
+        self.events.post(JobEvent("held", job, status=status))
+        self.events.post(QueueDepthEvent(self.pool.depth(), self.pool.stats()))
+
+    def on_job_event(self, event):
+        """Report a spooler outcome in the log (Tk thread)"""
+        job = event.job
+        if event.kind == "sent":
+            rate, size, seconds = event.throughput
+            self.log(
+                f"✅ Carton {job.carton_id} printed on {job.printer} ({job.item_count} items, "
+                f"{size} bytes in {seconds:.2f} s, link {rate:.0f} B/s)"
+            )
+        elif event.kind == "failed":
+            error_msg = f"Failed to print carton {job.carton_id}; scan its {job.item_count} items again"
+            self.log(f"❌ {error_msg}")
+            messagebox.showerror("Error", error_msg)
+        elif event.kind == "held":
+            self.log(f"⏸ Carton {job.carton_id} held: {job.printer} {event.status.describe()}")
+
+    def update_queue_depth(self):
+        """Show number of labels waiting for the printers"""
+        if self.client is not None:
+            return
+        self.show_queue_depth(QueueDepthEvent(self.pool.depth(), self.pool.stats()))
+
+    def show_queue_depth(self, event):
+        """Show the queue depth, per printer when there are several"""
+        text = f"Print queue: {event.depth}"
+        if event.printers and len(event.printers) > 1:
+            parts = []
+            for p in event.printers:
+                state = f"{p['rate']:.0f} B/s" if p["healthy"] else f"DOWN: {p['problem']}"
+                parts.append(f"{p['name']} {p['depth']} ({state}, {p['sent']} sent)")
+            text += "  |  " + "  |  ".join(parts)
+        self.queue_label.config(text=text)
+
         # # Print in background thread
         # def print_job():
         #     try:
@@ -587,8 +1230,6 @@ class ScannerPrinterApp:
         #         error_msg = f"Print error: {e}"
         #         self.log(f"❌ {error_msg}")
         #         self.root.after(0, lambda: messagebox.showerror("Error", error_msg))
-        
-        threading.Thread(target=print_job, daemon=True).start()
 
 
 def main():
@@ -0,0 +1,244 @@
+"""
+Headless Scan-and-Print
+Reads scans from stdin, a file/device or serial scanners and prints each carton
+label as soon as the carton is full. No Tk required.
+
+Example:
+    python scanprint.py --port COM7 --baud 9600 --items-per-carton 20 < scans.txt
+"""
+
+import argparse
+import sys
+from label_form import StoredForm
+from label_template import DEFAULT_TEMPLATE, load_template
+from latency_metrics import metrics
+from packing_station import DuplicateSerialError, PackingStation, legacy_counter
+from carton_allocator import LOCAL_FILE, SHARED_FILE, CartonIdAllocator
+from printer_discovery import find_printer
+from printer_pool import PrinterPool, parse_printers
+from printer_transport import TRANSPORTS, make_address
+from scanner_input import iter_scans, start_scanners
+from serial_index import INDEX_PATH, PackedSerialIndex
+from packing_ledger import LEDGER_PATH, PackingLedger
+from ui_events import EventBus, JobEvent, LogEvent
+
+
+def parse_label_size(text):
+    """Parse 'WIDTHxHEIGHT' in mm, e.g. '100x150'"""
+    try:
+        width, height = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT in mm, got {text!r}")
+    return width, height
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless carton scan-and-print")
+    parser.add_argument("--port", default="COM7",
+                        help="printer address, or several comma separated: a serial port, "
+                             "tcp://HOST[:9100] or file://PATH "
+                             "(ADDRESS=WIDTHxHEIGHT to name the label stock loaded); "
+                             "'auto' finds a printer on the serial ports")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="serial",
+                        help="transport for --port addresses given without a tcp:// or file:// prefix")
+    parser.add_argument("--baud", type=int, default=9600, help="printer baud rate")
+    parser.add_argument("--flow-control", choices=("rtscts", "xonxoff"), help="serial flow control")
+    parser.add_argument("--label-size", type=parse_label_size, help="label size in mm, e.g. 100x150")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="label template file")
+    parser.add_argument("--items-per-carton", type=int, default=20, help="items that fill a carton")
+    parser.add_argument("--input", default="-", help="scan source: '-' for stdin or a device/file path")
+    parser.add_argument("--scanner", action="append", default=[], metavar="PORT",
+                        help="read a serial/USB-CDC scanner on PORT (repeat for several)")
+    parser.add_argument("--scanner-baud", type=int, default=9600, help="scanner baud rate")
+    parser.add_argument("--stored-form", action="store_true", help="store the layout in printer memory")
+    parser.add_argument("--stream", action="store_true",
+                        help="send each label row as it is scanned, so only PRINT is left when the carton fills")
+    parser.add_argument("--serial-index", default=INDEX_PATH,
+                        help="index of packed serials used to reject duplicates")
+    parser.add_argument("--ledger", default=LEDGER_PATH, help="packing ledger database")
+    parser.add_argument("--station", help="station name recorded in the ledger (default: host name)")
+    parser.add_argument("--carton-id-file", default=SHARED_FILE,
+                        help="carton ID allocation file shared by all stations")
+    parser.add_argument("--station-id-file", default=LOCAL_FILE,
+                        help="this station's reserved block of carton IDs")
+    parser.add_argument("--carton-id-block", type=int, default=10,
+                        help="carton IDs reserved per visit to the shared file")
+    parser.add_argument("--discard-partial", action="store_true",
+                        help="do not print a partly filled carton at end of input")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="collect per-stage timings and export them to PATH "
+                             "(CSV if it ends in .csv, else Prometheus text)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                        help="seconds between metrics file updates")
+    return parser
+
+
+def run(args, scans, out=sys.stdout):
+    """
+    Pack scans into cartons and print them
+
+    Args:
+        args: Parsed command line arguments
+        scans: Iterable of scanned lines
+        out: Stream for progress messages
+
+    Returns:
+        int: Process exit code
+    """
+    params = {}
+    if args.label_size:
+        params["width"], params["height"] = args.label_size
+    template = load_template(args.template, **params)
+
+    failed = []
+    station = None
+
+    # Progress from the scan loop and the spooler thread goes through one
+    # event bus, printed in order by a console thread
+    events = EventBus()
+
+    def show_job(event):
+        job = event.job
+        if event.kind == "sent":
+            print(f"Printed carton {job.carton_id} on {job.printer} ({job.item_count} items)", file=out, flush=True)
+        elif event.kind == "failed":
+            failed.append(job.carton_id)
+            print(f"Failed to print carton {job.carton_id}; scan its items again", file=out, flush=True)
+        elif event.kind == "held":
+            print(f"Carton {job.carton_id} held: {job.printer} {event.status.describe()}", file=out, flush=True)
+
+    exporter = None
+    if args.metrics_file:
+        metrics.enable()
+        exporter, exporter_stop = metrics.start_export(args.metrics_file, args.metrics_interval)
+
+    console, console_stop = events.start_consumer({
+        LogEvent: lambda event: print(event.message, file=out, flush=True),
+        JobEvent: show_job,
+    })
+
+    def on_sent(job):
+        station.job_sent(job)
+        if not job.partial:
+            events.post(JobEvent("sent", job))
+
+    def on_failed(job):
+        station.job_failed(job)
+        if job.partial:
+            events.log(f"Streaming carton {job.carton_id} failed, it will be sent whole")
+        else:
+            events.post(JobEvent("failed", job))
+
+    def on_held(job, status):
+        station.job_held(job, status)
+        events.post(JobEvent("held", job, status=status))
+
+    printers = parse_printers(args.port)
+    for printer in printers:
+        printer["port"] = make_address(printer["port"], args.transport)
+    pool = PrinterPool(
+        printers,
+        baudrate=args.baud,
+        flow_control=args.flow_control,
+        on_sent=on_sent,
+        on_failed=on_failed,
+        on_held=on_held,
+        log=events.log
+    )
+    serial_index = PackedSerialIndex(args.serial_index)
+    ledger = PackingLedger(args.ledger, station=args.station)
+    allocator = CartonIdAllocator(
+        shared_path=args.carton_id_file,
+        local_path=args.station_id_file,
+        block_size=args.carton_id_block,
+        seed=legacy_counter(ledger)
+    )
+    station = PackingStation(
+        pool,
+        template=template,
+        items_per_carton=args.items_per_carton,
+        allocator=allocator,
+        serial_index=serial_index,
+        ledger=ledger,
+        streaming=args.stream and not args.stored_form
+    )
+    form = StoredForm(template) if args.stored_form else None
+    pool.start()
+
+    def close_carton():
+        """Queue the open carton's label; on failure the carton stays open"""
+        # Wait for room in the queue instead of dropping the carton
+        try:
+            job = station.close_carton(form=form, block=True)
+        except ValueError as e:
+            events.log(f"Cannot print carton: {e}")
+            return False
+        if job is None:
+            stock = template.stock or "this"
+            events.log(f"Cannot print carton: no printer takes {stock} labels")
+            return False
+        events.log(f"Queued carton {job.carton_id} ({job.item_count} items)")
+        return True
+
+    try:
+        for line in scans:
+            scan = line.strip()
+            if not scan:
+                continue
+            if station.is_full() and not close_carton():
+                events.log(f"Carton still open and full, scan rejected: {scan}")
+                failed.append(scan)
+                continue
+            try:
+                record = station.add_scan(scan)
+            except DuplicateSerialError as e:
+                events.log(f"Duplicate rejected: {e}")
+                continue
+            note = "" if record.recognised else " (S/N not recognised, stored as scanned)"
+            events.log(f"{len(station.items):02d}/{station.items_per_carton} {record.serial}{note}")
+            if station.is_full():
+                close_carton()
+
+        if station.items and not args.discard_partial and not close_carton():
+            events.log(f"Carton with {len(station.items)} items was not printed")
+            failed.append(None)
+    except KeyboardInterrupt:
+        events.log("Interrupted, finishing queued labels...")
+    finally:
+        pool.stop()
+        pool.close()
+        serial_index.close()
+        ledger.close()
+        console_stop.set()
+        console.join()
+        if exporter:
+            exporter_stop.set()
+            exporter.join()
+
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.port == "auto":
+        found = find_printer(exclude=args.scanner)
+        if not found:
+            print("No printer answered on any serial port")
+            return 1
+        print(f"Printer found on {found.port} at {found.baudrate} baud")
+        args.port, args.baud = found.port, found.baudrate
+    if args.scanner:
+        scans, readers = start_scanners(args.scanner, baudrate=args.scanner_baud)
+        try:
+            return run(args, iter_scans(scans))
+        finally:
+            for reader in readers:
+                reader.stop()
+    if args.input == "-":
+        return run(args, sys.stdin)
+    with open(args.input, "r", encoding="utf-8", errors="replace") as scans:
+        return run(args, scans)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
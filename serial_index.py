@@ -0,0 +1,170 @@
+"""
+Serial Index Module
+Remembers every serial already packed so duplicates are caught at scan time
+"""
+
+import dbm
+import hashlib
+import math
+import os
+import threading
+
+INDEX_PATH = 'packed_serials'
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings
+
+    A negative answer is certain; a positive one may be a false positive
+    at roughly the configured error rate.
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001):
+        """
+        Args:
+            capacity: Number of items the filter is sized for
+            error_rate: Target false positive rate at capacity
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, item):
+        """Add an item to the filter"""
+        bits = self.bits
+        for pos in self._positions(item):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        for pos in self._positions(item):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def save(self, path):
+        """Write the filter to path (atomically)"""
+        header = f"{self.capacity} {self.error_rate} {self.count}\n".encode('ascii')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a filter written by save()
+
+        Returns:
+            BloomFilter, or None if the file is missing or damaged
+        """
+        try:
+            with open(path, 'rb') as f:
+                capacity, error_rate, count = f.readline().split()
+                bloom = cls(int(capacity), float(error_rate))
+                bits = f.read()
+        except (OSError, ValueError):
+            return None
+        if len(bits) != len(bloom.bits):
+            return None
+        bloom.bits = bytearray(bits)
+        bloom.count = int(count)
+        return bloom
+
+
+class PackedSerialIndex:
+    """
+    Persistent serial -> carton ID index with a Bloom filter in front
+
+    Almost every scan is a serial that was never packed; the in-memory
+    Bloom filter answers those without touching the disk. Only filter
+    hits are confirmed against the on-disk dbm store.
+    """
+
+    def __init__(self, path=INDEX_PATH, capacity=1_000_000, error_rate=0.001):
+        """
+        Args:
+            path: Base path of the index (the dbm store and path + '.bloom')
+            capacity: Initial Bloom filter capacity; doubled as history grows
+            error_rate: Bloom filter false positive rate
+        """
+        self.path = path
+        self.bloom_path = path + '.bloom'
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._db = dbm.open(path, 'c')
+        self._dirty = 0
+        self._bloom = BloomFilter.load(self.bloom_path)
+        if self._bloom is None or self._bloom.count != len(self._db):
+            self._rebuild(max(capacity, 2 * len(self._db)))
+
+    def lookup(self, serial):
+        """
+        Find the carton a serial was packed in
+
+        Args:
+            serial: Serial number
+
+        Returns:
+            str: Carton ID, or None if the serial was never packed
+        """
+        with self._lock:
+            if serial not in self._bloom:
+                return None
+            carton_id = self._db.get(serial.encode('utf-8'))
+        return carton_id.decode('utf-8') if carton_id is not None else None
+
+    def add_carton(self, carton_id, serials):
+        """
+        Record the serials packed in a carton
+
+        Args:
+            carton_id: Carton ID
+            serials: Serial numbers in the carton
+        """
+        with self._lock:
+            value = carton_id.encode('utf-8')
+            for serial in serials:
+                key = serial.encode('utf-8')
+                if key in self._db:
+                    self._db[key] = value
+                    continue
+                self._db[key] = value
+                self._bloom.add(serial)
+            self._dirty += 1
+            if self._bloom.count > self._bloom.capacity:
+                self._rebuild(2 * self._bloom.capacity)
+            elif self._dirty >= 50:
+                self._save_bloom()
+
+    def close(self):
+        """Save the Bloom filter and close the store"""
+        with self._lock:
+            self._save_bloom()
+            self._db.close()
+
+    def _save_bloom(self):
+        if hasattr(self._db, 'sync'):
+            self._db.sync()
+        self._bloom.save(self.bloom_path)
+        self._dirty = 0
+
+    def _rebuild(self, capacity):
+        bloom = BloomFilter(capacity, self.error_rate)
+        for key in self._db.keys():
+            bloom.add(key.decode('utf-8'))
+        self._bloom = bloom
+        self._save_bloom()
@@ -0,0 +1,54 @@
+"""
+Station Configuration Module
+Persists per-station printer settings (port, negotiated baud rate)
+"""
+
+import json
+import os
+
+CONFIG_FILE = 'station_config.json'
+
+
+def load_config(path=CONFIG_FILE):
+    """
+    Load saved station settings
+
+    Args:
+        path: Settings file path
+
+    Returns:
+        dict: Saved settings (empty if the file is missing or unreadable)
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Warning: could not read {path}: {e}")
+        return {}
+    return config if isinstance(config, dict) else {}
+
+
+def save_config(updates, path=CONFIG_FILE):
+    """
+    Merge updates into the saved settings
+
+    The file is replaced atomically so a crash cannot truncate it.
+
+    Args:
+        updates: dict of settings to store
+        path: Settings file path
+
+    Returns:
+        dict: Settings after the update
+    """
+    config = load_config(path)
+    config.update(updates)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return config
@@ -0,0 +1,67 @@
+import pytest
+
+from carton_allocator import CartonIdAllocator
+from packing_station import DuplicateSerialError, PackingStation
+from serial_index import PackedSerialIndex
+
+
+class StubSpooler:
+    """Keeps submitted jobs; the test decides whether they are sent"""
+
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.jobs = []
+
+    def submit(self, job, block=False):
+        if self.accept:
+            self.jobs.append(job)
+        return self.accept
+
+
+@pytest.fixture
+def station(tmp_path):
+    index = PackedSerialIndex(str(tmp_path / "packed"))
+    allocator = CartonIdAllocator(
+        shared_path=str(tmp_path / "ids.json"),
+        local_path=str(tmp_path / "station.json")
+    )
+    station = PackingStation(StubSpooler(), allocator=allocator, serial_index=index)
+    yield station
+    index.close()
+
+
+def pack(station, serials):
+    for serial in serials:
+        station.add_scan(serial)
+    return station.close_carton()
+
+
+def test_serials_are_indexed_when_the_label_is_sent(station):
+    job = pack(station, ["SN0001", "SN0002"])
+    assert station.serial_index.lookup("SN0001") is None
+    # Still refused while the label is queued
+    with pytest.raises(DuplicateSerialError):
+        station.add_scan("SN0001")
+
+    station.job_sent(job)
+    assert station.serial_index.lookup("SN0001") == job.carton_id
+    with pytest.raises(DuplicateSerialError):
+        station.add_scan("SN0002")
+
+
+def test_failed_label_releases_its_serials(station):
+    job = pack(station, ["SN0001", "SN0002"])
+    station.job_failed(job)
+
+    assert station.serial_index.lookup("SN0001") is None
+    station.add_scan("SN0001")
+    station.add_scan("SN0002")
+    assert station.items == ["SN0001", "SN0002"]
+
+
+def test_full_queue_keeps_the_carton_open(station):
+    station.spooler.accept = False
+    assert pack(station, ["SN0001"]) is None
+    assert station.items == ["SN0001"]
+    station.spooler.accept = True
+    assert station.close_carton() is not None
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from carton_allocator import CartonIdAllocator
+from packing_station import PackingStation
+from print_server import PrintClient, PrintServer, PrintServerError
+from printer_pool import PrinterPool
+from serial_index import PackedSerialIndex
+
+
+@pytest.fixture
+def server(tmp_path):
+    """PrintServer on a free localhost port, printing to a file"""
+    labels = tmp_path / "labels.prn"
+    print_server = None
+    pool = PrinterPool(
+        [f"file://{labels}"],
+        on_sent=lambda job: print_server.on_sent(job),
+        on_failed=lambda job: print_server.on_failed(job),
+        on_held=lambda job, status: print_server.on_held(job, status),
+        log=lambda message: None
+    )
+    index = PackedSerialIndex(str(tmp_path / "packed"))
+    station = PackingStation(
+        pool,
+        allocator=CartonIdAllocator(
+            shared_path=str(tmp_path / "ids.json"),
+            local_path=str(tmp_path / "station.json")
+        ),
+        serial_index=index
+    )
+    print_server = PrintServer(pool, station)
+    pool.start()
+
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    task = loop.create_task(print_server.serve("127.0.0.1:0", None, ready))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    print_server.labels = labels
+    yield print_server
+
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(5)
+    loop.close()
+    pool.stop(timeout=5)
+    pool.close()
+    index.close()
+
+
+@pytest.fixture
+def client(server):
+    client = PrintClient(server.addresses[0])
+    yield client
+    client.close()
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_submit_prints_the_carton(server, client):
+    job = client.submit(["SN0001", "SN0002"], station="line-1")
+    assert job["items"] == 2
+    assert job["station"] == "line-1"
+    assert job["carton_id"].startswith("C")
+
+    wait_for(lambda: client.job(job["job_id"])["status"] == "sent")
+    label = server.labels.read_bytes()
+    assert job["carton_id"].encode() in label
+    assert b"SN0002" in label
+
+
+def test_status_reports_the_queue(client):
+    status = client.status()
+    assert status["depth"] == 0
+    assert [printer["healthy"] for printer in status["printers"]] == [True]
+
+
+def test_duplicate_serial_is_refused(client):
+    job = client.submit(["SN0001"])
+    wait_for(lambda: client.job(job["job_id"])["status"] == "sent")
+    with pytest.raises(PrintServerError) as refused:
+        client.submit(["SN0001"])
+    assert refused.value.status == 409
+
+
+def test_bad_requests(client):
+    with pytest.raises(PrintServerError) as refused:
+        client.submit([])
+    assert refused.value.status == 400
+    with pytest.raises(PrintServerError) as missing:
+        client.job(12345)
+    assert missing.value.status == 404
+
+
+def test_batch_reports_each_carton(client):
+    results = client.submit_many([{"scans": ["SN0001"]}, {"scans": ["SN0001"]}, {"scans": ["SN0002"]}])
+    assert "job_id" in results[0]
+    assert results[1]["status_code"] == 409
+    assert results[2]["carton_id"] != results[0]["carton_id"]
+
+
+def test_repeated_request_id_queues_once(server, client):
+    request = {"scans": ["SN0001"], "request_id": "retry-1"}
+    first = client._request("POST", "/jobs", request)
+    again = client._request("POST", "/jobs", request)
+    assert again == first
+    wait_for(lambda: client.job(first["job_id"])["status"] == "sent")
+    assert server.labels.read_bytes().count(b"PRINT") == 1
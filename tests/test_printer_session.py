@@ -0,0 +1,61 @@
+import printer_session
+from printer_session import STATUS_MISS_LIMIT, PrinterSession
+
+
+class StubPrinter:
+    """Connected printer whose status replies are set by the test"""
+
+    def __init__(self):
+        self.reply = None
+        self.queries = 0
+
+    def is_connected(self):
+        return True
+
+    def status(self):
+        self.queries += 1
+        return self.reply
+
+    def disconnect(self):
+        pass
+
+
+def make_session():
+    session = PrinterSession(port="COM99")
+    session.printer = StubPrinter()
+    return session
+
+
+def test_one_miss_does_not_stop_status_checks():
+    session = make_session()
+    session.status()
+    session.printer.reply = "ready"
+    assert session.status() == "ready"
+    assert session.status_supported is True
+
+
+def test_misses_in_a_row_stop_status_checks_until_retry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(printer_session.time, "monotonic", lambda: now[0])
+    session = make_session()
+    for _ in range(STATUS_MISS_LIMIT):
+        session.status()
+    assert session.status_supported is False
+    queries = session.printer.queries
+    assert session.status() is None
+    assert session.printer.queries == queries
+
+    # Printer switched on: asked again after the retry interval
+    session.printer.reply = "ready"
+    now[0] += printer_session.STATUS_RETRY + 1
+    assert session.status() == "ready"
+    assert session.status_supported is True
+
+
+def test_force_asks_a_printer_taken_not_to_answer():
+    session = make_session()
+    for _ in range(STATUS_MISS_LIMIT):
+        session.status()
+    session.printer.reply = "ready"
+    assert session.status() is None
+    assert session.status(force=True) == "ready"
@@ -0,0 +1,137 @@
+import os
+import socket
+import struct
+import threading
+
+import pytest
+
+from printer_transport import FileTransport, TcpTransport, open_transport
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(4)
+    sock.settimeout(5)
+    yield sock
+    sock.close()
+
+
+def serve(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def receive_all(conn):
+    data = b""
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_tcp_full_write(listener):
+    received = []
+
+    def printer():
+        conn, _ = listener.accept()
+        with conn:
+            received.append(receive_all(conn))
+
+    thread = serve(printer)
+    transport = open_transport(f"tcp://127.0.0.1:{listener.getsockname()[1]}")
+    job = b"CLS\r\n" + b"TEXT 10,10,\"3\",0,1,1,\"X\"\r\n" * 1000 + b"PRINT 1,1\r\n"
+    transport.write(job)
+    transport.close()
+    thread.join(5)
+    assert received == [job]
+
+
+def test_tcp_partial_write_is_not_resent(listener):
+    def printer():
+        conn, _ = listener.accept()
+        conn.recv(1000)
+        # Reset the connection in the middle of the job
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        conn.close()
+
+    thread = serve(printer)
+    transport = TcpTransport("127.0.0.1", listener.getsockname()[1])
+    transport.open()
+    with pytest.raises(OSError):
+        transport.write(b"PRINT 1,1\r\n" * 5_000_000)
+    thread.join(5)
+    assert not transport.is_open
+    listener.settimeout(0.3)
+    with pytest.raises(socket.timeout):
+        listener.accept()
+
+
+def test_tcp_reconnects_before_sending_after_idle_close(listener):
+    received = []
+
+    def printer():
+        conn, _ = listener.accept()
+        conn.close()
+        conn, _ = listener.accept()
+        with conn:
+            received.append(receive_all(conn))
+
+    thread = serve(printer)
+    transport = TcpTransport("127.0.0.1", listener.getsockname()[1])
+    transport.open()
+    threading.Event().wait(0.2)
+    transport.write(b"PRINT 1,1\r\n")
+    transport.close()
+    thread.join(5)
+    assert received == [b"PRINT 1,1\r\n"]
+
+
+def test_tcp_answers_queries(listener):
+    def printer():
+        conn, _ = listener.accept()
+        with conn:
+            if conn.recv(3) == b"\x1b!?":
+                conn.sendall(b"\x00")
+            conn.recv(1)
+
+    thread = serve(printer)
+    transport = TcpTransport("127.0.0.1", listener.getsockname()[1])
+    transport.open()
+    assert transport.answers_queries
+    assert not transport.supports_baudrate
+    transport.write(b"\x1b!?")
+    assert transport.drain(1)
+    assert transport.read(1, timeout=2) == b"\x00"
+    transport.close()
+    thread.join(5)
+
+
+def test_file_transport_appends_jobs(tmp_path):
+    path = tmp_path / "labels.prn"
+    transport = open_transport(f"file://{path}")
+    assert not transport.answers_queries
+    transport.write(b"CLS\r\n")
+    transport.flush()
+    transport.write(b"PRINT 1,1\r\n")
+    assert transport.drain(1)
+    assert transport.read(1, timeout=0.1) == b""
+    transport.close()
+    assert path.read_bytes() == b"CLS\r\nPRINT 1,1\r\n"
+    assert not transport.is_open
+
+
+def test_file_transport_spools_one_file_per_job(tmp_path):
+    spool = tmp_path / "spool"
+    transport = FileTransport(str(spool) + os.sep)
+    transport.open()
+    for job in (b"job 1", b"job 2"):
+        transport.write(job)
+        transport.flush()
+    transport.close()
+    names = sorted(os.listdir(spool))
+    assert [name.endswith(".prn") for name in names] == [True, True]
+    assert [(spool / name).read_bytes() for name in names] == [b"job 1", b"job 2"]
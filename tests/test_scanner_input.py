@@ -0,0 +1,60 @@
+from scanner_input import WedgeDecoder
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def feed(decoder, keys, gap):
+    """Press keys gap seconds apart; '' stands for a Shift press"""
+    events = []
+    for i, char in enumerate(keys):
+        events += decoder.key(char, i * gap)
+    return [(kind, text) for kind, text in events if kind != "key"]
+
+
+def scanner_keys(text):
+    """Keys a wedge scanner sends: Shift before each capital, then Enter"""
+    keys = []
+    for char in text:
+        if char.isupper():
+            keys.append("")
+        keys.append(char)
+    return keys + ["\r"]
+
+
+def test_shift_does_not_split_a_scan():
+    decoder = WedgeDecoder(clock=Clock())
+    assert feed(decoder, scanner_keys("HAA02-2544-336"), 0.004) == [("scan", "HAA02-2544-336")]
+
+
+def test_shift_passes_through():
+    decoder = WedgeDecoder(clock=Clock())
+    assert decoder.key("", 0.0) == [("key", "")]
+
+
+def test_slow_typing_with_shift_is_typed():
+    clock = Clock()
+    decoder = WedgeDecoder(clock=clock)
+    events = feed(decoder, ["", "A", "b"], 0.2)
+    clock.now = 1.0
+    events += decoder.poll()
+    assert events == [("typed", "A"), ("typed", "b")]
+
+
+def test_short_fast_run_is_typed():
+    decoder = WedgeDecoder(min_length=6, clock=Clock())
+    events = decoder.key("a", 0.0) + decoder.key("b", 0.01) + decoder.key("\r", 0.02)
+    assert events == [("typed", "ab"), ("key", "\r")]
+
+
+def test_scan_without_terminator_ends_on_pause():
+    clock = Clock()
+    decoder = WedgeDecoder(clock=clock)
+    assert feed(decoder, list("SN123456"), 0.005) == []
+    clock.now = 1.0
+    assert decoder.poll() == [("scan", "SN123456")]
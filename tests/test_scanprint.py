@@ -0,0 +1,41 @@
+import io
+import json
+
+import scanprint
+from carton_ids import iso_week_key
+
+
+def parse(tmp_path, printer, *extra):
+    return scanprint.build_parser().parse_args([
+        "--port", printer,
+        "--items-per-carton", "2",
+        "--serial-index", str(tmp_path / "packed"),
+        "--ledger", str(tmp_path / "ledger.db"),
+        "--carton-id-file", str(tmp_path / "ids.json"),
+        "--station-id-file", str(tmp_path / "station.json"),
+        *extra,
+    ])
+
+
+def test_prints_full_cartons(tmp_path):
+    out = io.StringIO()
+    labels = tmp_path / "labels.prn"
+    args = parse(tmp_path, f"file://{labels}")
+    assert scanprint.run(args, ["SN0001", "SN0002", "SN0003"], out) == 0
+    assert labels.read_bytes().count(b"PRINT") == 2
+
+
+def test_no_printer_for_the_label_stock_keeps_running(tmp_path):
+    out = io.StringIO()
+    args = parse(tmp_path, f"file://{tmp_path / 'labels.prn'}=50x30")
+    assert scanprint.run(args, ["SN0001", "SN0002", "SN0003"], out) == 1
+    assert "no printer takes" in out.getvalue()
+    assert "scan rejected: SN0003" in out.getvalue()
+
+
+def test_week_out_of_carton_numbers_keeps_running(tmp_path):
+    (tmp_path / "ids.json").write_text(json.dumps({"week": iso_week_key(), "next": 1000}))
+    out = io.StringIO()
+    args = parse(tmp_path, f"file://{tmp_path / 'labels.prn'}")
+    assert scanprint.run(args, ["SN0001", "SN0002"], out) == 1
+    assert "Cannot print carton: Not enough carton numbers" in out.getvalue()
@@ -1,27 +1,173 @@
 """
 TSC Printer Interface Module
-Handles serial communication with TSC TTP-244 Pro printer
+Handles communication with TSC TTP-244 Pro printer over serial, TCP or a file sink
 """
 
-import serial
 import time
+from latency_metrics import metrics
+from printer_transport import open_transport
+
+
+class TSPLJob:
+    """
+    Buffer of TSPL commands sent to the printer as one contiguous write
+
+    Commands are encoded and terminated with CR/LF as they are added, so
+    the finished job is a single bytes object ready for the port.
+    """
+
+    def __init__(self, commands=None):
+        """
+        Args:
+            commands: Optional iterable of TSPL command strings (or bytes)
+        """
+        self._buffer = bytearray()
+        if commands:
+            self.extend(commands)
+
+    def add(self, command):
+        """
+        Append one TSPL command to the job
+
+        Args:
+            command: TSPL command string, or already-encoded bytes
+        """
+        if isinstance(command, str):
+            command = command.encode('utf-8')
+        self._buffer += command
+        if not command.endswith(b'\r\n'):
+            self._buffer += b'\r\n'
+        return self
+
+    def extend(self, commands):
+        """Append several TSPL commands to the job"""
+        for command in commands:
+            self.add(command)
+        return self
+
+    def to_bytes(self):
+        """Return the whole job as one bytes buffer"""
+        return bytes(self._buffer)
+
+    def __len__(self):
+        return len(self._buffer)
+
+
+class PrinterStatus:
+    """Decoded reply to the TSPL <ESC>!? real-time status query"""
+
+    HEAD_OPEN = 0x01
+    PAPER_JAM = 0x02
+    PAPER_OUT = 0x04
+    RIBBON_OUT = 0x08
+    PAUSED = 0x10
+    PRINTING = 0x20
+    OTHER_ERROR = 0x80
+
+    ERROR_MASK = HEAD_OPEN | PAPER_JAM | PAPER_OUT | RIBBON_OUT | OTHER_ERROR
+
+    def __init__(self, code):
+        """
+        Args:
+            code: Status byte returned by the printer
+        """
+        self.code = code
+
+    @property
+    def head_open(self):
+        return bool(self.code & self.HEAD_OPEN)
+
+    @property
+    def paper_jam(self):
+        return bool(self.code & self.PAPER_JAM)
+
+    @property
+    def paper_out(self):
+        return bool(self.code & self.PAPER_OUT)
+
+    @property
+    def ribbon_out(self):
+        return bool(self.code & self.RIBBON_OUT)
+
+    @property
+    def paused(self):
+        return bool(self.code & self.PAUSED)
+
+    @property
+    def printing(self):
+        return bool(self.code & self.PRINTING)
+
+    @property
+    def has_error(self):
+        return bool(self.code & self.ERROR_MASK)
+
+    @property
+    def ready(self):
+        """True if the printer can take a new job (it may still be printing)"""
+        return not self.has_error and not self.paused
+
+    def describe(self):
+        """Human readable summary, e.g. 'paper out, paused'"""
+        names = [
+            (self.head_open, "head open"),
+            (self.paper_jam, "paper jam"),
+            (self.paper_out, "paper out"),
+            (self.ribbon_out, "ribbon out"),
+            (self.code & self.OTHER_ERROR, "printer error"),
+            (self.paused, "paused"),
+            (self.printing, "printing"),
+        ]
+        text = ", ".join(name for flag, name in names if flag)
+        return text or "ready"
+
+    def __repr__(self):
+        return f"PrinterStatus(0x{self.code:02X}: {self.describe()})"
+
 
 class TSCPrinter:
     """Interface for TSC label printers using TSPL commands"""
     
-    def __init__(self, port="COM7", baudrate=9600, timeout=2):
+    STATUS_QUERY = b'\x1b!?'
+
+    # Rates the TTP-244 Pro serial port supports, fastest first, with the
+    # code the TSPL SET COM1 command uses for each
+    BAUDRATE_CODES = {
+        115200: "115",
+        57600: "57",
+        38400: "38",
+        19200: "19",
+        9600: "96",
+    }
+
+    def __init__(self, port="COM7", baudrate=9600, timeout=2, init_delay=0.5,
+                 flow_control=None, status_timeout=0.5, exclusive=False):
         """
         Initialize printer connection parameters
         
         Args:
-            port: Serial port (e.g., 'COM7' on Windows)
-            baudrate: Communication speed (default 9600)
+            port: Printer address: serial port (e.g., 'COM7' on Windows),
+                'tcp://host[:9100]' or 'file://path' (see printer_transport)
+            baudrate: Communication speed (default 9600, serial only)
             timeout: Serial timeout in seconds
+            init_delay: Seconds to wait after opening a serial port
+            flow_control: None, 'rtscts' (hardware) or 'xonxoff' (software)
+            status_timeout: Seconds to wait for a status query reply
+            exclusive: Fail to connect if another process holds the serial port
         """
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
-        self.serial_conn = None
+        self.init_delay = init_delay
+        self.flow_control = flow_control
+        self.status_timeout = status_timeout
+        self.exclusive = exclusive
+        self.conn = None
+
+        # Transmission statistics for send_job()
+        self.bytes_sent = 0
+        self.send_seconds = 0.0
+        self.last_job_bytes = 0
+        self.last_job_seconds = 0.0
         
     def connect(self):
         """
@@ -31,15 +177,15 @@ class TSCPrinter:
             bool: True if connected successfully, False otherwise
         """
         try:
-            self.serial_conn = serial.Serial(
-                port=self.port,
+            self.conn = open_transport(
+                self.port,
                 baudrate=self.baudrate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=self.timeout
+                timeout=self.timeout,
+                flow_control=self.flow_control,
+                exclusive=self.exclusive
             )
-            time.sleep(0.5)  # Give printer time to initialize
+            if self.init_delay and self.conn.settle_time:
+                time.sleep(self.init_delay)  # Give printer time to initialize
             return True
         except Exception as e:
             print(f"Connection error: {e}")
@@ -47,8 +193,8 @@ class TSCPrinter:
     
     def disconnect(self):
         """Close printer connection"""
-        if self.serial_conn and self.serial_conn.is_open:
-            self.serial_conn.close()
+        if self.conn and self.conn.is_open:
+            self.conn.close()
     
     def send_command(self, command):
         """
@@ -60,19 +206,245 @@ class TSCPrinter:
         Returns:
             bool: True if sent successfully
         """
-        if not self.serial_conn or not self.serial_conn.is_open:
+        if not self.is_connected():
             print("Printer not connected")
             return False
         
         try:
             # Add line ending and encode
             cmd_bytes = (command + '\r\n').encode('utf-8')
-            self.serial_conn.write(cmd_bytes)
+            started = metrics.start()
+            self.conn.write(cmd_bytes)
+            metrics.stop("write", started)
+            metrics.add_bytes(len(cmd_bytes))
             return True
         except Exception as e:
             print(f"Send error: {e}")
             return False
     
+    def send_job(self, job, drain_timeout=None):
+        """
+        Send a complete TSPL job in a single write and wait for it to drain
+
+        Args:
+            job: TSPLJob, bytes buffer, or iterable of TSPL command strings
+            drain_timeout: Seconds to wait for the output buffer to empty
+                (defaults to the serial timeout)
+
+        Returns:
+            bool: True if the whole job was written to the port. The
+            printer does not confirm it: this only means the local output
+            buffer drained.
+        """
+        if not self.is_connected():
+            print("Printer not connected")
+            return False
+
+        if isinstance(job, TSPLJob):
+            data = job.to_bytes()
+        elif isinstance(job, (bytes, bytearray)):
+            data = bytes(job)
+        else:
+            data = TSPLJob(job).to_bytes()
+
+        try:
+            started = time.perf_counter()
+            self.conn.write(data)
+            self.conn.flush()
+            ok = self._drain(self.timeout if drain_timeout is None else drain_timeout)
+        except Exception as e:
+            print(f"Send error: {e}")
+            return False
+
+        if ok:
+            self.last_job_bytes = len(data)
+            self.last_job_seconds = time.perf_counter() - started
+            if metrics.enabled:
+                metrics.observe("write", self.last_job_seconds)
+                metrics.add_bytes(self.last_job_bytes)
+            self.bytes_sent += self.last_job_bytes
+            self.send_seconds += self.last_job_seconds
+        return ok
+
+    def throughput(self):
+        """
+        Measured link speed over all jobs sent on this connection
+
+        Returns:
+            float: Bytes per second (0 before the first job)
+        """
+        if not self.send_seconds:
+            return 0.0
+        return self.bytes_sent / self.send_seconds
+
+    def _drain(self, timeout):
+        """Wait until the driver reports no bytes left to transmit"""
+        if not self.conn.drain(timeout):
+            print("Send error: timed out waiting for the output buffer to drain")
+            return False
+        return True
+
+    def query(self, request, size=1, terminator=None, timeout=None):
+        """
+        Send a query command and read the printer's reply
+
+        Args:
+            request: Query bytes (e.g. b'\x1b!?')
+            size: Number of reply bytes to read when no terminator is given
+            terminator: Read until this byte sequence instead of a fixed size
+            timeout: Seconds to wait for the reply (defaults to status_timeout)
+
+        Returns:
+            bytes: Reply (empty if the printer did not answer or the link
+            cannot carry replies), or None on error
+        """
+        if not self.is_connected():
+            print("Printer not connected")
+            return None
+
+        if not self.conn.answers_queries:
+            return b''
+
+        try:
+            self.conn.reset_input()
+            self.conn.write(request)
+            self.conn.flush()
+            timeout = self.status_timeout if timeout is None else timeout
+            if terminator:
+                return self.conn.read_until(terminator, timeout)
+            return self.conn.read(size, timeout)
+        except Exception as e:
+            print(f"Query error: {e}")
+            return None
+
+    def status(self):
+        """
+        Query printer state with the TSPL <ESC>!? command
+
+        Returns:
+            PrinterStatus, or None if the printer did not answer
+        """
+        reply = self.query(self.STATUS_QUERY)
+        if not reply:
+            return None
+        return PrinterStatus(reply[0])
+
+    def list_files(self, timeout=2):
+        """
+        List files stored in printer memory with the TSPL ~!F query
+
+        Returns:
+            list: File names, or None if the printer did not answer
+        """
+        reply = self.query(b'~!F', terminator=b'\x1a', timeout=timeout)
+        if not reply:
+            return None
+        names = reply.rstrip(b'\x1a').replace(b'\n', b'\r').split(b'\r')
+        return [name.decode('ascii', 'replace').strip() for name in names if name.strip()]
+
+    def wait_ready(self, timeout=30, poll_interval=0.25):
+        """
+        Poll printer status until it can accept a job
+
+        Args:
+            timeout: Seconds to keep polling
+            poll_interval: Seconds between status queries
+
+        Returns:
+            PrinterStatus: Last status read (check .ready), or None if the
+            printer never answered
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.status()
+            if status is None or status.ready or time.monotonic() >= deadline:
+                return status
+            time.sleep(poll_interval)
+
+    def probe_baudrate(self, rates=None):
+        """
+        Find the rate the printer is currently listening on
+
+        Each candidate rate is tried with a status query; the first one
+        that gets an answer is kept.
+
+        Args:
+            rates: Rates to try (defaults to the current rate, then BAUDRATE_CODES)
+
+        Returns:
+            int: Working baud rate, or None if the printer never answered
+        """
+        if not self.is_connected():
+            print("Printer not connected")
+            return None
+        if not self.conn.supports_baudrate:
+            print(f"{self.port} has no baud rate to probe")
+            return None
+
+        candidates = [self.baudrate] + list(rates or self.BAUDRATE_CODES)
+        for rate in dict.fromkeys(candidates):
+            self.conn.set_baudrate(rate)
+            if self.status() is not None:
+                self.baudrate = rate
+                return rate
+        self.conn.set_baudrate(self.baudrate)
+        return None
+
+    def set_baudrate(self, rate, settle=0.2):
+        """
+        Switch printer and port to a new rate with TSPL SET COM1
+
+        The new rate is checked with a status query; on failure the port
+        goes back to the previous rate.
+
+        Args:
+            rate: New baud rate (a key of BAUDRATE_CODES)
+            settle: Seconds to give the printer to switch
+
+        Returns:
+            bool: True if the link works at the new rate
+        """
+        code = self.BAUDRATE_CODES.get(rate)
+        if code is None or not self.conn or not self.conn.supports_baudrate:
+            print(f"Unsupported baud rate: {rate}")
+            return False
+
+        previous = self.baudrate
+        if not self.send_job([f"SET COM1 {code},N,8,1"]):
+            return False
+        time.sleep(settle)
+        self.conn.set_baudrate(rate)
+        if self.status() is not None:
+            self.baudrate = rate
+            return True
+
+        print(f"Printer did not answer at {rate} baud")
+        self.conn.set_baudrate(previous)
+        if self.status() is None:
+            # The printer may have switched anyway; look for it
+            self.probe_baudrate()
+        return False
+
+    def negotiate_baudrate(self, rates=None):
+        """
+        Move the link to the fastest rate both ends support
+
+        Args:
+            rates: Candidate rates (defaults to BAUDRATE_CODES, fastest first)
+
+        Returns:
+            int: Rate in use afterwards, or None if the printer never answered
+        """
+        current = self.probe_baudrate()
+        if current is None:
+            return None
+        for rate in sorted(rates or self.BAUDRATE_CODES, reverse=True):
+            if rate <= current:
+                break
+            if self.set_baudrate(rate):
+                break
+        return self.baudrate
+
     def is_connected(self):
         """Check if printer is connected"""
-        return self.serial_conn and self.serial_conn.is_open
\ No newline at end of file
+        return bool(self.conn and self.conn.is_open)
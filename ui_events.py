@@ -0,0 +1,202 @@
+"""
+UI Event Bus
+Worker threads (spooler, connection tests, scanners) post typed events to a
+queue; a single consumer handles them in order. The Tk GUI drains the bus on
+a fixed `after` tick so widgets are only touched from the Tk thread, and the
+headless tools serve the same events from a console thread.
+"""
+
+import queue
+import threading
+
+# Drain interval for the Tk loop (about 60 updates per second)
+UI_TICK_MS = 16
+
+
+class UIEvent:
+    """Base class for events posted to an EventBus"""
+
+    __slots__ = ()
+
+    # Only the newest event of a coalescing type is kept per batch
+    coalesce = False
+
+
+class LogEvent(UIEvent):
+    """Line for the status log"""
+
+    __slots__ = ("message",)
+
+    def __init__(self, message):
+        self.message = message
+
+
+class DialogEvent(UIEvent):
+    """Message box to show; level is 'info', 'warning' or 'error'"""
+
+    __slots__ = ("level", "title", "message")
+
+    def __init__(self, level, title, message):
+        self.level = level
+        self.title = title
+        self.message = message
+
+
+class JobEvent(UIEvent):
+    """
+    Spooler outcome for a print job
+
+    kind is 'sent', 'failed' or 'held'. Held jobs carry the PrinterStatus
+    that stopped them, sent jobs the link throughput measured when the job
+    finished (rate, bytes, seconds).
+    """
+
+    __slots__ = ("kind", "job", "status", "throughput")
+
+    def __init__(self, kind, job, status=None, throughput=None):
+        self.kind = kind
+        self.job = job
+        self.status = status
+        self.throughput = throughput
+
+
+class QueueDepthEvent(UIEvent):
+    """Number of labels waiting, with optional per-printer stats"""
+
+    __slots__ = ("depth", "printers")
+    coalesce = True
+
+    def __init__(self, depth, printers=None):
+        self.depth = depth
+        self.printers = printers
+
+
+class BaudrateEvent(UIEvent):
+    """Link to the printer on port moved to a new baud rate"""
+
+    __slots__ = ("rate", "port")
+
+    def __init__(self, rate, port=None):
+        self.rate = rate
+        self.port = port
+
+
+class PrinterFoundEvent(UIEvent):
+    """Printer discovery finished; result is a ProbeResult or None"""
+
+    __slots__ = ("result",)
+
+    def __init__(self, result):
+        self.result = result
+
+
+class ServerSubmitEvent(UIEvent):
+    """
+    Print server answered a carton submission
+
+    job is the server's job record when the carton was queued, error the
+    reason it was not (refused or server unreachable).
+    """
+
+    __slots__ = ("job", "error")
+
+    def __init__(self, job=None, error=None):
+        self.job = job
+        self.error = error
+
+
+class EventBus:
+    """Thread-safe queue of UIEvents with batched, coalescing delivery"""
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def post(self, event):
+        """Queue an event (safe from any thread)"""
+        self._queue.put(event)
+
+    def log(self, message):
+        """Shortcut for posting a LogEvent"""
+        self._queue.put(LogEvent(message))
+
+    def drain(self, limit=1000):
+        """
+        Take the events waiting on the bus
+
+        Events keep their posting order, except that for coalescing types
+        only the newest one is kept, at the end of the batch.
+
+        Args:
+            limit: Most events taken in one batch, so a burst cannot stall
+                the consumer
+
+        Returns:
+            list: Events to handle
+        """
+        events = []
+        latest = {}
+        for _ in range(limit):
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event.coalesce:
+                latest.pop(type(event), None)
+                latest[type(event)] = event
+            else:
+                events.append(event)
+        events.extend(latest.values())
+        return events
+
+    def dispatch(self, handlers, limit=1000):
+        """
+        Drain one batch and call the handler registered for each event type
+
+        Args:
+            handlers: Mapping of event class to callable(event); events
+                without a handler are dropped
+            limit: Most events handled in this batch
+
+        Returns:
+            int: Number of events handled
+        """
+        return self._handle(self.drain(limit), handlers)
+
+    @staticmethod
+    def _handle(events, handlers):
+        for event in events:
+            handler = handlers.get(type(event))
+            if handler is not None:
+                handler(event)
+        return len(events)
+
+    def serve(self, handlers, stop_event, poll=0.1):
+        """
+        Handle events until stop_event is set, then handle what is left
+
+        Used by the headless tools in place of the Tk tick.
+        """
+        while not stop_event.is_set():
+            try:
+                event = self._queue.get(timeout=poll)
+            except queue.Empty:
+                continue
+            self._handle([event] + self.drain(), handlers)
+        while self.dispatch(handlers):
+            pass
+
+    def start_consumer(self, handlers, poll=0.1):
+        """
+        Serve events from a background thread
+
+        Returns:
+            (thread, stop_event): set stop_event and join the thread to
+            flush the remaining events
+        """
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=self.serve, args=(handlers, stop_event, poll),
+            name="ui-events", daemon=True
+        )
+        thread.start()
+        return thread, stop_event